@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db, role_cache, engine, async_engine
+from app.core.pool_stats import engine_pool_status
+from app.core.role_cache import bump_rbac_version
 from app.middleware.auth import get_current_user
 from app.models.user import User
 
@@ -8,7 +10,7 @@ admin_router = APIRouter()
 
 @admin_router.get("/dashboard")
 async def get_admin_dashboard(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.role.name != "admin":
@@ -18,10 +20,37 @@ async def get_admin_dashboard(
 
 @admin_router.get("/reports")
 async def get_reports(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.role.name != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    return {"message": "Admin reports"}
\ No newline at end of file
+    return {"message": "Admin reports"}
+
+@admin_router.post("/rbac/reload")
+async def reload_role_permissions(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Call after changing roles or role permissions in the database.
+
+    Every worker reloads its role cache: this one at once, the others
+    within RBAC_CACHE_CHECK_INTERVAL seconds.
+    """
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    await db.run_sync(lambda session: bump_rbac_version(session.connection()))
+    await db.commit()
+    role_cache.invalidate()
+
+    return {"message": "Role permissions reloaded"}
+
+@admin_router.get("/db/pool")
+async def get_pool_stats(current_user: dict = Depends(get_current_user)):
+    """Connection pool usage and checkout wait times for this worker process."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return engine_pool_status(async_engine=async_engine.sync_engine, sync_engine=engine)
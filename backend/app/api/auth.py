@@ -1,44 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from datetime import timedelta
 
-from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token, create_refresh_token, verify_token
+from app.core.database import get_async_db, role_cache
+from app.core.security import verify_and_update_password, get_password_hash, create_access_token, create_refresh_token, verify_token
 from app.models.user import User, Role
 from app.schemas.auth import UserLogin, UserRegister, TokenResponse, UserResponse
 from app.schemas.user import UserCreate
 
 auth_router = APIRouter()
 
-async def get_user_by_email(db: Session, email: str):
-    """Get user by email with role and permissions."""
-    from sqlalchemy.orm import joinedload
-
-    stmt = select(User).options(joinedload(User.role)).where(User.email == email)
-    result = db.execute(stmt)
+async def get_user_by_email(db: AsyncSession, email: str):
+    """Get user by email. Role name and permissions come from role_cache."""
+    stmt = select(User).where(User.email == email)
+    result = await db.execute(stmt)
     return result.scalar_one_or_none()
 
-async def get_user_permissions(db: Session, user: User):
-    """Get user permissions based on role."""
-    if not user.role_id:
-        return []
-
-    from sqlalchemy import text
-
-    # Query permissions for user's role using raw SQL
-    result = db.execute(text("""
-        SELECT p.name
-        FROM permissions p
-        JOIN role_permissions rp ON p.id = rp.permission_id
-        WHERE rp.role_id = :role_id
-    """), {"role_id": str(user.role_id)}).fetchall()
-
-    return [row[0] for row in result]
+async def get_user_role(user: User):
+    """Get the user's role name and permissions from the process-wide role cache."""
+    return await role_cache.get(user.role_id)
 
 @auth_router.post("/register", response_model=UserResponse)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_async_db)):
     """Register a new user."""
     # Check if user already exists
     existing_user = await get_user_by_email(db, user_data.email)
@@ -49,7 +34,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
         )
 
     # Get default role (user)
-    default_role = db.execute(select(Role).where(Role.name == "user")).scalar_one_or_none()
+    default_role = (await db.execute(select(Role).where(Role.name == "user"))).scalar_one_or_none()
     if not default_role:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -60,7 +45,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     role_name = default_role.name
 
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     new_user = User(
         email=user_data.email,
         password_hash=hashed_password,
@@ -71,8 +56,8 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     # Use the input data directly to avoid SQLAlchemy session issues
     return UserResponse(
@@ -88,7 +73,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     )
 
 @auth_router.post("/login", response_model=TokenResponse)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """Login user and return JWT tokens."""
     # Get user by email
     user = await get_user_by_email(db, form_data.username)
@@ -99,12 +84,18 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
         )
 
     # Verify password
-    if not verify_password(form_data.password, user.password_hash):
+    valid, new_hash = await verify_and_update_password(form_data.password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
 
+    # Upgrade hashes made with an older bcrypt cost while we have the plaintext
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+
     # Check if user is active
     if not user.is_active:
         raise HTTPException(
@@ -112,25 +103,14 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             detail="Account is deactivated"
         )
 
-    # Get user role and permissions
-    role = None
-    if user.role_id:
-        from sqlalchemy import text
-        result = db.execute(text("SELECT name FROM roles WHERE id = :role_id"), {"role_id": str(user.role_id)}).fetchone()
-        if result:
-            # Create a simple role object
-            class SimpleRole:
-                def __init__(self, name):
-                    self.name = name
-            role = SimpleRole(result[0])
-
-    permissions = await get_user_permissions(db, user)
+    # Get user role and permissions (cached, no query)
+    role_name, permissions = await get_user_role(user)
 
     # Create tokens
     token_data = {
         "sub": str(user.id),
         "email": user.email,
-        "role": role.name if role else None,
+        "role": role_name,
         "permissions": permissions
     }
 
@@ -152,7 +132,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             first_name=user.first_name,
             last_name=user.last_name,
             phone=user.phone,
-            role=role.name if role else None,
+            role=role_name,
             is_active=user.is_active,
             is_verified=user.is_verified,
             created_at=user.created_at
@@ -160,28 +140,28 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     )
 
 @auth_router.post("/refresh", response_model=dict)
-async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_async_db)):
     """Refresh access token using refresh token."""
     try:
         payload = verify_token(refresh_token, "refresh")
         user_id = payload.get("sub")
 
         # Get user
-        user = db.get(User, user_id)
+        user = await db.get(User, user_id)
         if not user or not user.is_active:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found or inactive"
             )
 
-        # Get user permissions
-        permissions = await get_user_permissions(db, user)
+        # Get user role and permissions (cached, no query)
+        role_name, permissions = await get_user_role(user)
 
         # Create new access token
         token_data = {
             "sub": str(user.id),
             "email": user.email,
-            "role": user.role.name if user.role else None,
+            "role": role_name,
             "permissions": permissions
         }
 
@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, tuple_
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
-from app.core.database import get_db
+from app.core.database import get_async_db
+from app.core.pagination import DEFAULT_PAGE_SIZE, clamp_page_size, decode_cursor, encode_cursor
 from app.middleware.auth import get_current_user
-from app.models.user import User
+from app.models.booking import Booking, BookingStatus, new_booking_id
 import uuid
 
 bookings_router = APIRouter()
 
+# Requests are booked for a fixed length until the form asks for one (as in simple_app)
+DEFAULT_BOOKING_HOURS = 4
+
 class BookingRequestCreate(BaseModel):
     eventName: str
     location: str
@@ -31,23 +35,62 @@ class BookingRequestResponse(BaseModel):
     status: str
     createdAt: str
 
-# In-memory storage for booking requests (in a real app, this would be in the database)
-booking_requests = []
+def to_response(booking: Booking) -> BookingRequestResponse:
+    return BookingRequestResponse(
+        id=str(booking.id),
+        eventName=booking.event_name,
+        location=booking.event_location_address,
+        date=booking.start_datetime.strftime("%Y-%m-%d"),
+        time=booking.start_datetime.strftime("%H:%M"),
+        price=float(booking.hourly_rate),
+        description=booking.event_description or "",
+        userId=str(booking.user_id),
+        status=booking.status.value,
+        createdAt=booking.created_at.isoformat() if booking.created_at else ""
+    )
+
+def newest_first(stmt, cursor: Optional[str], limit: int):
+    """One page of stmt ordered by (created_at, id) descending, resuming after cursor."""
+    if cursor:
+        created_at, booking_id = decode_cursor(cursor)
+        try:
+            after = (datetime.fromisoformat(created_at), str(uuid.UUID(booking_id)))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+        stmt = stmt.where(tuple_(Booking.created_at, Booking.id) < after)
+    return stmt.order_by(Booking.created_at.desc(), Booking.id.desc()).limit(limit + 1)
+
+async def fetch_page(db: AsyncSession, stmt, cursor: Optional[str], limit: Optional[int]):
+    """Run a keyset-paginated booking query. Returns (responses, next_cursor)."""
+    page_size = clamp_page_size(limit)
+    rows = (await db.execute(newest_first(stmt, cursor, page_size))).scalars().all()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1].created_at.isoformat(), rows[-1].id)
+    return [to_response(booking) for booking in rows], next_cursor
 
 @bookings_router.get("/")
 async def get_bookings(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status_filter: Optional[BookingStatus] = Query(None, alias="status"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
 ):
-    # Return user's booking requests
-    user_requests = [req for req in booking_requests if req["userId"] == str(current_user.id)]
-    return {"bookings": user_requests, "user": current_user.email}
+    # The user's booking requests, newest first (idx_bookings_user_created)
+    stmt = select(Booking).where(Booking.user_id == current_user["user_id"])
+    if status_filter is not None:
+        stmt = stmt.where(Booking.status == status_filter)
+
+    bookings, next_cursor = await fetch_page(db, stmt, cursor, limit)
+    return {"bookings": bookings, "user": current_user["email"], "next_cursor": next_cursor}
 
 @bookings_router.post("/", response_model=BookingRequestResponse)
 async def create_booking_request(
     booking_data: BookingRequestCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
 ):
     """Create a new booking request"""
     try:
@@ -63,32 +106,55 @@ async def create_booking_request(
         if booking_data.price <= 0:
             raise HTTPException(status_code=400, detail="Price must be greater than 0")
 
-        # Create new booking request
-        new_request = {
-            "id": str(uuid.uuid4()),
-            "eventName": booking_data.eventName.strip(),
-            "location": booking_data.location.strip(),
-            "date": booking_data.date,
-            "time": booking_data.time,
-            "price": booking_data.price,
-            "description": booking_data.description or "",
-            "userId": str(current_user.id),
-            "status": "pending",
-            "createdAt": datetime.now().isoformat()
-        }
-
-        # Store the request (in a real app, save to database)
-        booking_requests.append(new_request)
-
-        return BookingRequestResponse(**new_request)
+        try:
+            start_datetime = datetime.strptime(f"{booking_data.date} {booking_data.time}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date or time format")
+
+        # Create new booking request; the bouncer is assigned when one accepts it
+        new_request = Booking(
+            id=new_booking_id(),
+            user_id=current_user["user_id"],
+            bouncer_id=None,
+            event_name=booking_data.eventName.strip(),
+            event_description=booking_data.description or "",
+            event_location_address=booking_data.location.strip(),
+            start_datetime=start_datetime,
+            end_datetime=start_datetime + timedelta(hours=DEFAULT_BOOKING_HOURS),
+            hourly_rate=booking_data.price,
+            total_amount=booking_data.price * DEFAULT_BOOKING_HOURS,
+            status=BookingStatus.PENDING,
+            # Set here so the response has it without reloading the row;
+            # whole seconds, as stored for simple_app's rows
+            created_at=datetime.utcnow().replace(microsecond=0)
+        )
+
+        db.add(new_request)
+        await db.commit()
+
+        return to_response(new_request)
 
     except HTTPException:
         raise
     except Exception as e:
+        await db.rollback()
         print(f"Error creating booking request: {e}")
         raise HTTPException(status_code=500, detail="Failed to create booking request")
 
 @bookings_router.get("/all")
-async def get_all_booking_requests():
-    """Get all booking requests for bouncer dashboard"""
-    return {"requests": booking_requests}
\ No newline at end of file
+async def get_all_booking_requests(
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status_filter: BookingStatus = Query(BookingStatus.PENDING, alias="status"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get booking requests for bouncer dashboard, one page at a time (idx_bookings_status_created)"""
+    # Every user's requests: bouncers and admins only
+    if current_user["role"] not in ("bouncer", "admin"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only bouncers can view all booking requests")
+
+    stmt = select(Booking).where(Booking.status == status_filter)
+
+    requests, next_cursor = await fetch_page(db, stmt, cursor, limit)
+    return {"requests": requests, "next_cursor": next_cursor}
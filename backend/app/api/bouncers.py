@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.middleware.auth import get_current_user
 from app.models.user import User
 
@@ -8,14 +8,14 @@ bouncers_router = APIRouter()
 
 @bouncers_router.get("/")
 async def get_bouncers(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     return {"message": "Bouncers endpoint", "user": current_user.email}
 
 @bouncers_router.get("/available")
 async def get_available_bouncers(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     return {"message": "Available bouncers endpoint"}
\ No newline at end of file
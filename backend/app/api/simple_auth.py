@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import timedelta
 
-from app.core.database import get_db
+from app.core.database import get_async_db, role_cache
 from app.core.security import verify_password, get_password_hash, create_access_token, create_refresh_token, verify_token
 from app.models.user import User, Role
 from app.schemas.auth import UserLogin, UserRegister, TokenResponse, UserResponse
@@ -12,14 +12,14 @@ from app.schemas.user import UserCreate
 
 simple_auth_router = APIRouter()
 
-async def get_user_by_email(db: Session, email: str):
+async def get_user_by_email(db: AsyncSession, email: str):
     """Get user by email with role."""
     stmt = select(User).where(User.email == email)
-    result = db.execute(stmt)
+    result = await db.execute(stmt)
     return result.scalar_one_or_none()
 
 @simple_auth_router.post("/login", response_model=TokenResponse)
-async def simple_login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def simple_login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """Simple login user and return JWT tokens without database updates."""
     # Get user by email
     user = await get_user_by_email(db, form_data.username)
@@ -30,7 +30,7 @@ async def simple_login(form_data: OAuth2PasswordRequestForm = Depends(), db: Ses
         )
 
     # Verify password
-    if not verify_password(form_data.password, user.password_hash):
+    if not await verify_password(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -43,11 +43,14 @@ async def simple_login(form_data: OAuth2PasswordRequestForm = Depends(), db: Ses
             detail="Account is deactivated"
         )
 
+    # Role name from the role cache; lazy loading is not available on async sessions
+    role_name, _ = await role_cache.get(user.role_id)
+
     # Create tokens
     token_data = {
         "sub": str(user.id),
         "email": user.email,
-        "role": user.role.name if user.role else None,
+        "role": role_name,
         "permissions": []  # Simple version without permissions
     }
 
@@ -65,7 +68,7 @@ async def simple_login(form_data: OAuth2PasswordRequestForm = Depends(), db: Ses
             first_name=user.first_name,
             last_name=user.last_name,
             phone=user.phone,
-            role=user.role.name if user.role else None,
+            role=role_name,
             is_active=user.is_active,
             is_verified=user.is_verified,
             created_at=user.created_at
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.middleware.auth import get_current_user
 from app.models.user import User
 
@@ -9,17 +10,17 @@ users_router = APIRouter()
 @users_router.get("/me")
 async def get_current_user_profile(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     return current_user
 
 @users_router.get("/")
 async def get_users(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.role.name != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    users = db.query(User).all()
+    users = (await db.execute(select(User))).scalars().all()
     return users
\ No newline at end of file
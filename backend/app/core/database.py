@@ -1,41 +1,113 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import StaticPool
 from .config import settings
+from .pool_stats import TimedAsyncAdaptedQueuePool, TimedQueuePool
+from .role_cache import RolePermissionCache
+from .sqlite_pool import DEFAULT_PRAGMAS
+
+
+def _aiosqlite_connector(database: str, **kwargs):
+    """async_creator opening aiosqlite connections whose worker thread is a daemon.
+
+    SQLAlchemy marks each new aiosqlite connection as a daemon, but from
+    aiosqlite 0.22 the connection holds its thread instead of being one,
+    so the flag misses it. A pooled connection's thread would then keep the
+    interpreter alive whenever the shutdown hook does not run (a TestClient
+    used without `with`, a script that never disposes the engine).
+    """
+    import aiosqlite  # SQLite deployments only
+
+    async def connect():
+        connection = aiosqlite.connect(database, **kwargs)
+        getattr(connection, "_thread", connection).daemon = True
+        return await connection
+    return connect
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # Same pragmas as simple_app's pool (WAL, NORMAL sync, busy_timeout, ...)
+    cursor = dbapi_connection.cursor()
+    for name, value in DEFAULT_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
 
 # Handle SQLite vs PostgreSQL URLs
 if settings.DATABASE_URL.startswith("sqlite"):
-    # SQLite configuration - using sync engine only for simplicity
+    # SQLite configuration: aiosqlite for the API, sync engine for scripts
+    async_url = settings.DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    in_memory = ":memory:" in settings.DATABASE_URL or settings.DATABASE_URL.rstrip("/") == "sqlite:"
+
+    if in_memory:
+        # One shared connection, or every checkout would see a new empty database
+        async_engine = create_async_engine(
+            async_url,
+            echo=settings.DB_ECHO,
+            poolclass=StaticPool,
+            async_creator=_aiosqlite_connector(":memory:", check_same_thread=False)
+        )
+    else:
+        # Queue of WAL connections: readers run alongside the single writer.
+        # aiosqlite defaults to NullPool, which reopens the file per session.
+        async_engine = create_async_engine(
+            async_url,
+            echo=settings.DB_ECHO,
+            poolclass=TimedAsyncAdaptedQueuePool,
+            pool_size=settings.SQLITE_POOL_SIZE,
+            max_overflow=0,
+            async_creator=_aiosqlite_connector(
+                make_url(async_url).database, timeout=DEFAULT_PRAGMAS["busy_timeout"] / 1000
+            )
+        )
     engine = create_engine(
         settings.DATABASE_URL,
-        echo=settings.DEBUG,
+        echo=settings.DB_ECHO,
         connect_args={"check_same_thread": False}  # Allow SQLite to work with multiple threads
     )
-    async_engine = None  # No async support for SQLite in this setup
+    if not in_memory:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
 else:
-    # PostgreSQL configuration
+    # PostgreSQL configuration. Each worker process has its own pools, so
+    # the server sees up to workers * 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    # connections; see GET /api/admin/db/pool for how full they run.
+    pool_options = dict(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE or -1,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    # asyncpg prepares every statement; this many are cached per connection
+    # (0 when running behind pgbouncer in transaction mode)
+    async_url = make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg").update_query_dict(
+        {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+    )
     async_engine = create_async_engine(
-        settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
-        echo=settings.DEBUG,
-        future=True
+        async_url,
+        echo=settings.DB_ECHO,
+        poolclass=TimedAsyncAdaptedQueuePool,
+        **pool_options
     )
     engine = create_engine(
         settings.DATABASE_URL,
-        echo=settings.DEBUG
+        echo=settings.DB_ECHO,
+        poolclass=TimedQueuePool,
+        **pool_options
     )
 
 # Session makers
-if async_engine:
-    AsyncSessionLocal = sessionmaker(
-        bind=async_engine,
-        class_=AsyncSession,
-        expire_on_commit=False
-    )
-else:
-    AsyncSessionLocal = None
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
 
-# Sync session maker (works for both SQLite and PostgreSQL)
+# Sync session maker (works for both SQLite and PostgreSQL), used by scripts
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -45,10 +117,11 @@ SessionLocal = sessionmaker(
 # Base class for models
 Base = declarative_base()
 
+# Role names and permissions, shared by login and token refresh
+role_cache = RolePermissionCache(async_engine, check_interval=settings.RBAC_CACHE_CHECK_INTERVAL)
+
 # Dependency to get async database session
 async def get_async_db():
-    if not AsyncSessionLocal:
-        raise RuntimeError("Async database sessions are not available with SQLite")
     async with AsyncSessionLocal() as session:
         try:
             yield session
@@ -61,4 +134,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
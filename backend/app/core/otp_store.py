@@ -0,0 +1,272 @@
+import asyncio
+import heapq
+from abc import ABC, abstractmethod
+import math
+import os
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Outcomes of OtpStore.verify()
+OTP_VERIFIED = "verified"
+OTP_INVALID = "invalid"      # wrong code, attempts remain
+OTP_LOCKED = "locked"        # wrong code and no attempts left; the OTP is gone
+OTP_MISSING = "missing"      # never issued, expired or already used
+
+
+class OtpCheck(NamedTuple):
+    status: str
+    attempts: int = 0
+
+
+class OtpStore(ABC):
+    """Short-lived one-time passwords plus per-subject issue rate limits.
+
+    Every entry expires on its own TTL, so abandoned OTPs do not pile up
+    waiting for a verification that never comes. Keys are chosen by the
+    caller (e.g. "email:<address>" or "phone:<session id>"). Rate limits are
+    fixed windows keyed by whatever identifies the requester
+    (e.g. "email:<address>" or "phone:<number>").
+    """
+
+    def __init__(self, ttl: float, max_attempts: int, rate_limit: int, rate_window: float):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+
+    @abstractmethod
+    async def put(self, key: str, otp: str, **fields: str):
+        """Store otp under key for ttl seconds, replacing any previous OTP."""
+
+    @abstractmethod
+    async def verify(self, key: str, otp: str, consume: bool = True) -> OtpCheck:
+        """Check otp against key. consume=False keeps a verified OTP (marked verified) until it expires."""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def hit_rate_limit(self, subject: str) -> int:
+        """Count one OTP issue for subject. Returns 0 if allowed, else seconds until it is."""
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class MemoryOtpStore(OtpStore):
+    """Single-process OtpStore backed by a dict and an expiry min-heap.
+
+    A background task pops expired entries off the heap every
+    sweep_interval seconds, and puts sweep first as well, so memory tracks
+    live OTPs only. At capacity the entries closest to expiry are evicted
+    to make room. All methods run on the event loop without awaiting, so
+    each one is atomic with respect to other requests.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600,
+        max_attempts: int = 3,
+        rate_limit: int = 5,
+        rate_window: float = 900,
+        capacity: int = 100000,
+        sweep_interval: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(ttl, max_attempts, rate_limit, rate_window)
+        self.capacity = capacity
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._entries: Dict[str, Dict[str, object]] = {}
+        self._expiry: List[Tuple[float, str]] = []  # min-heap of (expires, key)
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _set(self, key: str, entry: Dict[str, object]):
+        now = self._clock()
+        self._sweep(now)
+        if key not in self._entries:
+            while len(self._entries) >= self.capacity and self._expiry:
+                expires, oldest = heapq.heappop(self._expiry)
+                entry_now = self._entries.get(oldest)
+                if entry_now is not None and entry_now["expires"] == expires:
+                    del self._entries[oldest]
+        self._entries[key] = entry
+        heapq.heappush(self._expiry, (entry["expires"], key))
+
+        # Replaced entries leave stale heap items behind; compact occasionally
+        if len(self._expiry) > 2 * len(self._entries) + 1024:
+            self._expiry = [(value["expires"], entry_key) for entry_key, value in self._entries.items()]
+            heapq.heapify(self._expiry)
+
+    def _get(self, key: str) -> Optional[Dict[str, object]]:
+        entry = self._entries.get(key)
+        if entry is None or entry["expires"] <= self._clock():
+            return None
+        return entry
+
+    def _sweep(self, now: float) -> int:
+        removed = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires, key = heapq.heappop(self._expiry)
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires"] == expires:
+                del self._entries[key]
+                removed += 1
+        return removed
+
+    async def put(self, key: str, otp: str, **fields: str):
+        self._set(key, {"otp": otp, "attempts": 0, "expires": self._clock() + self.ttl, **fields})
+
+    async def verify(self, key: str, otp: str, consume: bool = True) -> OtpCheck:
+        entry = self._get(key)
+        if entry is None:
+            return OtpCheck(OTP_MISSING)
+
+        if entry["otp"] == otp:
+            if consume:
+                del self._entries[key]
+            else:
+                entry["verified"] = "1"
+            return OtpCheck(OTP_VERIFIED, entry["attempts"])
+
+        entry["attempts"] += 1
+        if entry["attempts"] >= self.max_attempts:
+            del self._entries[key]
+            return OtpCheck(OTP_LOCKED, entry["attempts"])
+        return OtpCheck(OTP_INVALID, entry["attempts"])
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def hit_rate_limit(self, subject: str) -> int:
+        key = "rate:" + subject
+        entry = self._get(key)
+        if entry is None:
+            self._set(key, {"count": 1, "expires": self._clock() + self.rate_window})
+            return 0
+        if entry["count"] >= self.rate_limit:
+            return max(1, math.ceil(entry["expires"] - self._clock()))
+        entry["count"] += 1
+        return 0
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self._sweep(self._clock())
+
+    async def start(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# KEYS[1] = otp hash; ARGV = otp, consume (1/0), max_attempts
+# Returns {status, attempts} with status 0 missing, 1 verified, 2 invalid, 3 locked
+_VERIFY_LUA = """
+local data = redis.call('HMGET', KEYS[1], 'otp', 'attempts')
+if not data[1] then
+    return {0, 0}
+end
+local attempts = tonumber(data[2]) or 0
+if data[1] == ARGV[1] then
+    if ARGV[2] == '1' then
+        redis.call('DEL', KEYS[1])
+    else
+        redis.call('HSET', KEYS[1], 'verified', '1')
+    end
+    return {1, attempts}
+end
+attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if attempts >= tonumber(ARGV[3]) then
+    redis.call('DEL', KEYS[1])
+    return {3, attempts}
+end
+return {2, attempts}
+"""
+
+# KEYS[1] = counter; ARGV = limit, window seconds. Returns 0 or seconds to wait.
+_RATE_LUA = """
+local count = tonumber(redis.call('GET', KEYS[1]) or '0')
+if count >= tonumber(ARGV[1]) then
+    local ttl = redis.call('TTL', KEYS[1])
+    if ttl < 1 then ttl = 1 end
+    return ttl
+end
+if redis.call('INCR', KEYS[1]) == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_REDIS_STATUSES = {0: OTP_MISSING, 1: OTP_VERIFIED, 2: OTP_INVALID, 3: OTP_LOCKED}
+
+
+class RedisOtpStore(OtpStore):
+    """OtpStore shared by every worker through Redis (or a compatible server).
+
+    Each OTP is a hash with a native key TTL, so Redis does the expiry and
+    no sweeper runs here. Verification and rate limiting are Lua scripts,
+    which keeps the attempt counter correct when two workers race on the
+    same OTP. Bound memory on the server with maxmemory and
+    maxmemory-policy volatile-ttl.
+    """
+
+    def __init__(self, url: str, ttl: float = 600, max_attempts: int = 3, rate_limit: int = 5, rate_window: float = 900, prefix: str = "otp:"):
+        super().__init__(ttl, max_attempts, rate_limit, rate_window)
+        import redis.asyncio as redis_asyncio
+
+        self.prefix = prefix
+        self._redis = redis_asyncio.from_url(url, decode_responses=True)
+        self._verify = self._redis.register_script(_VERIFY_LUA)
+        self._rate = self._redis.register_script(_RATE_LUA)
+
+    async def put(self, key: str, otp: str, **fields: str):
+        name = self.prefix + key
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(name)
+            pipe.hset(name, mapping={"otp": otp, "attempts": 0, **fields})
+            pipe.expire(name, math.ceil(self.ttl))
+            await pipe.execute()
+
+    async def verify(self, key: str, otp: str, consume: bool = True) -> OtpCheck:
+        status, attempts = await self._verify(keys=[self.prefix + key], args=[otp, "1" if consume else "0", self.max_attempts])
+        return OtpCheck(_REDIS_STATUSES[int(status)], int(attempts))
+
+    async def delete(self, key: str):
+        await self._redis.delete(self.prefix + key)
+
+    async def hit_rate_limit(self, subject: str) -> int:
+        return int(await self._rate(keys=[self.prefix + "rate:" + subject], args=[self.rate_limit, math.ceil(self.rate_window)]))
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def create_otp_store(url: Optional[str] = None) -> OtpStore:
+    """Build the OTP store from the environment.
+
+    OTP_STORE_URL selects Redis (e.g. redis://localhost:6379/0); when it is
+    unset, OTPs are kept in process memory, which only works with a single
+    worker.
+    """
+    url = url if url is not None else os.getenv("OTP_STORE_URL", "")
+    options = {
+        "ttl": float(os.getenv("OTP_EXPIRY_MINUTES", "10")) * 60,
+        "max_attempts": int(os.getenv("OTP_MAX_ATTEMPTS", "3")),
+        "rate_limit": int(os.getenv("OTP_RATE_LIMIT", "5")),
+        "rate_window": float(os.getenv("OTP_RATE_WINDOW_SECONDS", "900")),
+    }
+    if url:
+        return RedisOtpStore(url, **options)
+    return MemoryOtpStore(capacity=int(os.getenv("OTP_STORE_CAPACITY", "100000")), **options)
@@ -0,0 +1,76 @@
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def clamp_page_size(limit: Optional[int], default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    """Clamp a client-supplied page size into 1..maximum."""
+    if limit is None:
+        return default
+    return max(1, min(limit, maximum))
+
+
+def requested_page_size(limit: Optional[int], cursor: Optional[str]) -> Optional[int]:
+    """Page size for lists that page only when asked to: None (the whole list) without limit and cursor."""
+    if limit is None and cursor is None:
+        return None
+    return clamp_page_size(limit)
+
+
+def fetch_limit(page_size: Optional[int]) -> int:
+    """LIMIT for a keyset query: one row past the page to detect the next one, or -1 (no limit in SQLite)."""
+    return -1 if page_size is None else page_size + 1
+
+
+def encode_cursor(sort_value: Any, row_id: Any) -> str:
+    """Opaque cursor pointing just past the row with (sort_value, row_id)."""
+    raw = json.dumps([sort_value, str(row_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Decode a cursor produced by encode_cursor, raising 400 if it was tampered with."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if not isinstance(row_id, str):
+            raise ValueError("cursor id must be a string")
+        # Only scalars can be bound as a query parameter
+        if sort_value is not None and not isinstance(sort_value, (str, int, float)):
+            raise ValueError("cursor sort value must be a scalar")
+        return sort_value, row_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+
+
+def keyset_condition(cursor: Optional[str], sort_column: str, id_column: str) -> Tuple[str, List[Any]]:
+    """SQL condition (with a leading AND) and params selecting rows after cursor.
+
+    Pages are ordered by (sort_column DESC, id_column DESC); the row-value
+    comparison lets SQLite seek straight into a composite index on those
+    columns instead of scanning and discarding an OFFSET.
+    """
+    if not cursor:
+        return "", []
+    sort_value, row_id = decode_cursor(cursor)
+    return f"AND ({sort_column}, {id_column}) < (?, ?)", [sort_value, row_id]
+
+
+def keyset_page(rows: Sequence[Sequence[Any]], limit: Optional[int], sort_index: int, id_index: int = 0) -> Tuple[List[Sequence[Any]], Optional[str]]:
+    """Trim rows fetched with LIMIT fetch_limit(limit) to one page and build the next cursor.
+
+    Returns (page_rows, next_cursor). next_cursor is None on the last page,
+    and when limit is None (the whole list was fetched).
+    """
+    if limit is None:
+        return list(rows), None
+    page = list(rows[:limit])
+    if len(rows) <= limit:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor(last[sort_index], last[id_index])
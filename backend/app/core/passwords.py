@@ -0,0 +1,122 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+DEFAULT_ROUNDS = 12
+
+
+@lru_cache(maxsize=None)
+def _context(rounds: int) -> CryptContext:
+    # Pinning the desired cost range to exactly `rounds` makes passlib flag
+    # any stored hash with a different cost (higher or lower) for rehashing.
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=rounds,
+        bcrypt__min_desired_rounds=rounds,
+        bcrypt__max_desired_rounds=rounds,
+    )
+
+
+# These run inside the worker processes, so they must be module level.
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify(password: str, password_hash: str, rounds: int) -> bool:
+    return _context(rounds).verify(password, password_hash)
+
+
+def _verify_and_update(password: str, password_hash: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _context(rounds).verify_and_update(password, password_hash)
+
+
+def _warm_up(rounds: int) -> None:
+    _context(rounds)
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a pool of worker processes.
+
+    bcrypt is deliberately CPU-bound, so running it on the event loop
+    thread freezes every other request for the duration of each hash.
+    Here it runs in separate processes, which also lets logins scale
+    across cores instead of contending for the GIL.
+
+    At most max_pending operations are admitted at once. Beyond that the
+    caller gets 429 straight away rather than queueing work that would
+    finish long after the client has given up.
+    """
+
+    def __init__(self, rounds: int = DEFAULT_ROUNDS, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 8
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Operations admitted and not yet finished."""
+        return self._pending
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many concurrent password operations, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._pool(), fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool and retry once
+                self._executor = None
+                return await loop.run_in_executor(self._pool(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash a password at the configured cost."""
+        return await self._submit(_hash, password, self.rounds)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        """Verify a password against its hash."""
+        return await self._submit(_verify, password, password_hash, self.rounds)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password and return a replacement hash if its cost is out of date.
+
+        Returns (valid, new_hash). new_hash is None unless the password is
+        valid and the stored hash was made with a different bcrypt cost,
+        in which case the caller should store new_hash.
+        """
+        return await self._submit(_verify_and_update, password, password_hash, self.rounds)
+
+    async def start(self):
+        """Spawn the worker processes up front so the first logins don't pay for it."""
+        loop = asyncio.get_running_loop()
+        pool = self._pool()
+        await asyncio.gather(*(loop.run_in_executor(pool, _warm_up, self.rounds) for _ in range(self.workers)))
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
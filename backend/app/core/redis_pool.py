@@ -0,0 +1,81 @@
+import logging
+import time
+from typing import Optional
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class RedisPool:
+    """Lazily connected redis.asyncio client shared by one service.
+
+    Nothing connects at import or construction time; the pool is created on
+    the first client() call and connections are opened on demand. Idle
+    connections are PINGed before reuse (health_check_interval), and short
+    socket timeouts keep a dead server from stalling the event loop.
+
+    When a command fails, the caller reports it with mark_down(). client()
+    then returns None for `retry_after` seconds, so callers fall back to
+    their in-process path immediately instead of each waiting on a connect
+    timeout. After that, the next command is the probe.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = 50,
+        health_check_interval: int = 30,
+        connect_timeout: float = 1.0,
+        command_timeout: float = 2.0,
+        retry_after: float = 5.0,
+    ):
+        self.url = url
+        self.max_connections = max_connections
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        self.retry_after = retry_after
+        self._client: Optional[aioredis.Redis] = None
+        self._down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def client(self) -> Optional[aioredis.Redis]:
+        """The shared client, or None while Redis is marked down."""
+        if not self.available:
+            return None
+        if self._client is None:
+            pool = aioredis.ConnectionPool.from_url(
+                self.url,
+                decode_responses=True,
+                max_connections=self.max_connections,
+                health_check_interval=self.health_check_interval,
+                socket_connect_timeout=self.connect_timeout,
+                socket_timeout=self.command_timeout,
+            )
+            self._client = aioredis.Redis(connection_pool=pool)
+        return self._client
+
+    def mark_down(self, error: Exception):
+        if self.available:
+            logger.warning(f"Redis at {self.url} unavailable, using in-process fallback for {self.retry_after}s: {error}")
+        self._down_until = time.monotonic() + self.retry_after
+
+    async def ping(self) -> bool:
+        client = self.client()
+        if client is None:
+            return False
+        try:
+            return bool(await client.ping())
+        except RedisError as e:
+            self.mark_down(e)
+            return False
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import sqlite3
+from typing import Optional
+
+# Version counters for cached responses, one row per cache name. Writers
+# bump the counter in the same transaction as the data change, so every
+# worker process sharing the database sees the invalidation on its next
+# read, not only the process that made the change.
+CACHE_VERSIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS cache_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+"""
+
+
+def ensure_versions_table(conn: sqlite3.Connection):
+    conn.execute(CACHE_VERSIONS_SQL)
+
+
+def current_version(conn: sqlite3.Connection, name: str) -> int:
+    row = conn.execute("SELECT version FROM cache_versions WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def bump_version(conn: sqlite3.Connection, name: str):
+    """Invalidate every cached copy of name. Call inside the writing transaction."""
+    conn.execute("""
+        INSERT INTO cache_versions (name, version) VALUES (?, 1)
+        ON CONFLICT (name) DO UPDATE SET version = version + 1
+    """, (name,))
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the exact response bytes."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value matches etag.
+
+    If-None-Match uses the weak comparison (RFC 9110 13.1.2), so a W/ prefix
+    added by a proxy that re-encoded the body still counts as a match.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class CachedResponse:
+    __slots__ = ("version", "variant", "body", "etag")
+
+    def __init__(self, version: int, body: bytes, variant: str = ""):
+        self.version = version
+        self.variant = variant
+        self.body = body
+        self.etag = make_etag(body)
+
+
+class VersionedResponseCache:
+    """One pre-serialized response body, valid for a single cache_versions value.
+
+    get() only returns the entry while its version is current and it was
+    built for the same variant (e.g. the public base URL embedded in the
+    body). `lock` lets callers rebuild once per version instead of every
+    concurrent request rebuilding the same body after an invalidation.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = asyncio.Lock()
+        self._entry: Optional[CachedResponse] = None
+
+    def get(self, version: int, variant: str = "") -> Optional[CachedResponse]:
+        entry = self._entry
+        if entry is not None and entry.version == version and entry.variant == variant:
+            return entry
+        return None
+
+    def put(self, version: int, body: bytes, variant: str = "") -> CachedResponse:
+        entry = CachedResponse(version, body, variant)
+        # A slow rebuild must not replace a body built for a newer version
+        current = self._entry
+        if current is None or current.version <= version:
+            self._entry = entry
+        return entry
+
+    def clear(self):
+        self._entry = None
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Row in cache_versions (see app/core/response_cache.py) bumped whenever
+# roles or their permissions change
+RBAC_VERSION_NAME = "rbac"
+
+_VERSIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS cache_versions (
+        name VARCHAR(100) PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+
+def _current_version(conn: Connection) -> int:
+    row = conn.execute(
+        text("SELECT version FROM cache_versions WHERE name = :name"), {"name": RBAC_VERSION_NAME}
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def bump_rbac_version(conn: Connection):
+    """Invalidate every worker's role cache. Call inside the transaction that changes roles.
+
+    Takes a sync connection: Session.connection(), or AsyncSession.run_sync().
+    """
+    conn.execute(text(_VERSIONS_TABLE_SQL))
+    conn.execute(text("""
+        INSERT INTO cache_versions (name, version) VALUES (:name, 1)
+        ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1
+    """), {"name": RBAC_VERSION_NAME})
+
+
+class RolePermissionCache:
+    """Every role's name and permission names, loaded once per process.
+
+    Login and token refresh used to join role_permissions for each request,
+    although roles change a few times a year. The whole table is small, so
+    it is read in one query and kept until the rbac version in
+    cache_versions moves. The version is checked at most once every
+    `check_interval` seconds, on a connection of its own, so a request
+    never waits on more than the user query. invalidate() drops the cache
+    in this process at once; other workers reload within check_interval.
+    """
+
+    def __init__(self, engine: AsyncEngine, check_interval: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.engine = engine
+        self.check_interval = check_interval
+        self._clock = clock
+        self._roles: Optional[Dict[str, Tuple[str, List[str]]]] = None
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self.loads = 0
+
+    async def get(self, role_id) -> Tuple[Optional[str], List[str]]:
+        """Return (role name, permission names) for role_id, or (None, []) if unknown."""
+        if role_id is None:
+            return None, []
+        roles = await self._current()
+        return roles.get(str(role_id), (None, []))
+
+    def invalidate(self):
+        """Reload on next use in this process."""
+        self._roles = None
+        self._version = None
+
+    async def _current(self) -> Dict[str, Tuple[str, List[str]]]:
+        roles = self._roles
+        if roles is not None and self._clock() - self._checked_at < self.check_interval:
+            return roles
+
+        # One reload at a time; requests that queued behind it reuse its result
+        async with self._lock:
+            if self._roles is not None and self._clock() - self._checked_at < self.check_interval:
+                return self._roles
+            async with self.engine.begin() as conn:
+                await conn.run_sync(self._refresh)
+            self._checked_at = self._clock()
+            return self._roles
+
+    def _refresh(self, conn: Connection):
+        conn.execute(text(_VERSIONS_TABLE_SQL))
+        version = _current_version(conn)
+        if self._roles is None or version != self._version:
+            self._roles = self._load(conn)
+            self._version = version
+            self.loads += 1
+
+    @staticmethod
+    def _load(conn: Connection) -> Dict[str, Tuple[str, List[str]]]:
+        rows = conn.execute(text("""
+            SELECT r.id, r.name, p.name
+            FROM roles r
+            LEFT JOIN role_permissions rp ON rp.role_id = r.id
+            LEFT JOIN permissions p ON p.id = rp.permission_id
+        """)).fetchall()
+
+        roles: Dict[str, Tuple[str, List[str]]] = {}
+        for role_id, role_name, permission in rows:
+            entry = roles.setdefault(str(role_id), (role_name, []))
+            if permission is not None:
+                entry[1].append(permission)
+        return roles
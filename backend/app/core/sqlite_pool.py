@@ -0,0 +1,130 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Pragmas applied to every pooled connection.
+# journal_mode=WAL lets readers run concurrently with the single writer,
+# synchronous=NORMAL is durable under WAL without an fsync per commit,
+# a negative cache_size is in KiB (64 MiB page cache) and mmap_size maps
+# the first 256 MiB of the database file into memory.
+DEFAULT_PRAGMAS: Dict[str, object] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+
+class SQLitePool:
+    """Long-lived SQLite connections, one per thread.
+
+    Opening a connection means opening the file, parsing the schema and
+    starting with a cold page cache, so connections are created once per
+    thread and reused for the lifetime of the process.
+    """
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, object]] = None):
+        self.db_path = db_path
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        # Each connection is only ever used by the thread that opened it;
+        # check_same_thread is off so close_all() can run from any thread.
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.pragmas.get("busy_timeout", 5000) / 1000,
+            check_same_thread=False,
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """Hand a connection back after a unit of work.
+
+        Anything the caller did not commit is rolled back so the next
+        user of this thread's connection starts from a clean transaction.
+        """
+        if conn.in_transaction:
+            conn.rollback()
+
+    def close_all(self):
+        """Close every connection opened by this pool."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class AsyncSQLite:
+    """Awaitable SQLite access that never blocks the event loop.
+
+    Reads run on a bounded pool of reader threads, each with its own pooled
+    connection, so they proceed in parallel under WAL. Writes are serialized
+    on one dedicated writer thread, which matches SQLite's single-writer
+    model and avoids SQLITE_BUSY retries between our own workers.
+
+    Units of work passed to run() receive the thread's connection and are
+    committed when they return or rolled back when they raise.
+    """
+
+    def __init__(self, pool: SQLitePool, read_workers: int = 4):
+        self.pool = pool
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="sqlite-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-write")
+
+    def _call(self, fn: Callable[..., Any], args: Sequence[Any]) -> Any:
+        conn = self.pool.connection()
+        try:
+            result = fn(conn, *args)
+            if conn.in_transaction:
+                conn.commit()
+            return result
+        finally:
+            self.pool.release(conn)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, write: bool = False) -> Any:
+        """Run fn(conn, *args) on a reader thread, or on the writer thread if write=True."""
+        executor = self._writer if write else self._readers
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self._call, fn, args)
+
+    async def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        """Run a single write statement and return the number of affected rows."""
+        return await self.run(lambda conn: conn.execute(sql, params).rowcount, write=True)
+
+    def shutdown(self):
+        """Stop the worker threads and close the pooled connections."""
+        for executor in (self._readers, self._writer):
+            executor.shutdown(wait=True)
+        self.pool.close_all()
+
+
+def create_pool(db_path: Optional[str] = None) -> SQLitePool:
+    """Create a pool for db_path, defaulting to SQLITE_DB_PATH or test_bouncer.db."""
+    return SQLitePool(db_path or os.getenv("SQLITE_DB_PATH", "test_bouncer.db"))
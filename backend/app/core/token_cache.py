@@ -0,0 +1,85 @@
+import hashlib
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of JWT payloads whose signature has already been checked.
+
+    A page load typically fires several API calls with the same bearer
+    token, and each one would otherwise repeat the same HMAC verification
+    and JSON decode. Entries are keyed by the SHA-256 digest of the token,
+    so raw credentials are never kept as dictionary keys. Each entry is
+    dropped at the token's own `exp`, so a cached payload is never served
+    after the token has expired. Tokens without `exp` are not cached.
+
+    Payloads are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, maxsize: int = 10000, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._expiry: List[Tuple[float, bytes]] = []  # min-heap of (exp, key)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def _evict_expired(self, now: float):
+        while self._expiry and self._expiry[0][0] <= now:
+            exp, key = heapq.heappop(self._expiry)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == exp:
+                del self._entries[key]
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Return the cached payload for token, or None if it must be verified."""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= self._clock():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, payload: Dict[str, Any]):
+        """Remember a payload that has just been verified."""
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+
+        key = self._key(token)
+        with self._lock:
+            now = self._clock()
+            if exp <= now:
+                return
+            self._evict_expired(now)
+
+            self._entries[key] = (payload, exp)
+            self._entries.move_to_end(key)
+            heapq.heappush(self._expiry, (exp, key))
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+            # LRU evictions leave stale heap items behind; compact occasionally
+            if len(self._expiry) > 2 * self.maxsize:
+                self._expiry = [(entry_exp, entry_key) for entry_key, (_, entry_exp) in self._entries.items()]
+                heapq.heapify(self._expiry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiry.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
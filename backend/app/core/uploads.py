@@ -0,0 +1,94 @@
+from tempfile import SpooledTemporaryFile
+
+from fastapi import HTTPException, Request, status
+from multipart.multipart import MultipartParser, parse_options_header
+
+# Parts up to this size stay in memory; larger ones roll over to a temp file
+SPOOL_MAX_SIZE = 1024 * 1024
+# Allowance for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+async def receive_upload(request: Request, max_size: int, field_name: str = "file") -> SpooledTemporaryFile:
+    """Stream one file field of a multipart/form-data request into a spooled temp file.
+
+    The body is parsed as it arrives, so memory use stays bounded by
+    SPOOL_MAX_SIZE whatever the upload size. The size limit is enforced
+    while streaming: a declared Content-Length over the limit is rejected
+    before reading, and otherwise reading stops at the first chunk that
+    crosses it. The caller owns the returned file and must close it.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a multipart/form-data upload")
+
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File is too large (max {max_size // (1024 * 1024)} MB)",
+    )
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise too_large
+
+    upload = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    state = {"header_field": b"", "header_value": b"", "headers": {}, "in_field": False, "found": False, "size": 0}
+
+    def on_part_begin():
+        state["headers"] = {}
+        state["in_field"] = False
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        is_target = disposition.get(b"name") == field_name.encode() and b"filename" in disposition
+        # Only the first matching part is kept
+        state["in_field"] = is_target and not state["found"]
+        state["found"] = state["found"] or is_target
+
+    def on_part_data(data, start, end):
+        if state["in_field"]:
+            state["size"] += end - start
+            if state["size"] <= max_size:
+                upload.write(data[start:end])
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if state["size"] > max_size or received > max_size + MULTIPART_OVERHEAD:
+                raise too_large
+            parser.write(chunk)
+        parser.finalize()
+        if state["size"] > max_size:
+            raise too_large
+        if not state["found"]:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"No file uploaded in field '{field_name}'")
+    except HTTPException:
+        upload.close()
+        raise
+    except Exception as e:
+        upload.close()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed multipart upload: {e}")
+
+    upload.seek(0)
+    return upload
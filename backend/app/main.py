@@ -5,16 +5,16 @@ from fastapi.security import HTTPBearer
 import socketio
 
 from app.core.config import settings
-from app.core.database import engine, SessionLocal
+from app.core.database import engine, async_engine, SessionLocal
+from app.core.security import password_hasher
 from app.middleware.auth import AuthMiddleware
-from app.middleware.rbac import RBACMiddleware
 from app.api.auth import auth_router
 from app.api.simple_auth import simple_auth_router
 from app.api.users import users_router
 from app.api.bookings import bookings_router
 from app.api.bouncers import bouncers_router
 from app.api.admin import admin_router
-from app.services.websocket import sio
+from app.services.websocket import sio, manager as connection_manager, realtime_redis, emitter
 
 app = FastAPI(
     title="Bouncer App API",
@@ -35,8 +35,8 @@ app.add_middleware(
 
 # Security middleware
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=settings.ALLOWED_HOSTS)
+# Token verification and route permissions in one pure-ASGI layer
 app.add_middleware(AuthMiddleware)
-app.add_middleware(RBACMiddleware)
 
 # Socket.IO integration
 socket_app = socketio.ASGIApp(sio, app)
@@ -49,6 +49,29 @@ app.include_router(bookings_router, prefix="/api/bookings", tags=["Bookings"])
 app.include_router(bouncers_router, prefix="/api/bouncers", tags=["Bouncers"])
 app.include_router(admin_router, prefix="/api/admin", tags=["Admin"])
 
+@app.on_event("startup")
+async def start_password_hasher():
+    await password_hasher.start()
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def close_database():
+    # aiosqlite runs a thread per pooled connection; close them with the app
+    await async_engine.dispose()
+
+@app.on_event("startup")
+async def start_connection_manager():
+    await connection_manager.start()
+
+@app.on_event("shutdown")
+async def stop_connection_manager():
+    await emitter.stop()
+    await connection_manager.stop()
+    await realtime_redis.close()
+
 @app.get("/")
 async def root():
     return {"message": "Bouncer App API", "version": "1.0.0"}
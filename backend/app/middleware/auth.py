@@ -1,14 +1,23 @@
 from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from starlette.responses import JSONResponse
-from typing import Optional
-import json
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.core.security import verify_token
+from app.middleware.rbac import ROUTE_PERMISSIONS, RoutePermissionMatcher
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    """Authentication middleware for JWT token validation."""
+class AuthMiddleware:
+    """Authentication and authorization middleware, as a plain ASGI app.
+
+    Verifies the bearer token once per request, resolves the permission the
+    route requires (see app/middleware/rbac.py) and checks it against the
+    token's permissions. The outcome is stored in scope["state"], where
+    route handlers read it as request.state and get_current_user reuses the
+    verified payload. Unlike BaseHTTPMiddleware it adds no tasks or memory
+    streams around the request, and response bodies, streaming ones
+    included, pass straight through.
+    """
 
     # Routes that don't require authentication
     EXEMPT_ROUTES = {
@@ -24,23 +33,27 @@ class AuthMiddleware(BaseHTTPMiddleware):
         "/api/auth/reset-password",
     }
 
-    async def dispatch(self, request: Request, call_next):
-        # Skip authentication for exempt routes
-        if request.url.path in self.EXEMPT_ROUTES:
-            return await call_next(request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Compiled once when the middleware stack is built
+        self.permissions = RoutePermissionMatcher(ROUTE_PERMISSIONS)
 
-        # Skip authentication for OPTIONS requests (CORS preflight)
-        if request.method == "OPTIONS":
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        # Extract token from Authorization header
-        authorization: str = request.headers.get("Authorization")
+        path = scope["path"]
+        method = scope["method"]
+        # Skip exempt routes and CORS preflight requests
+        if path in self.EXEMPT_ROUTES or method == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
 
+        authorization = Headers(scope=scope).get("Authorization")
         if not authorization:
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": "Authorization header missing"}
-            )
+            await self._reject(scope, receive, send, status.HTTP_401_UNAUTHORIZED, {"detail": "Authorization header missing"})
+            return
 
         try:
             # Extract Bearer token
@@ -50,40 +63,52 @@ class AuthMiddleware(BaseHTTPMiddleware):
 
             # Verify token and extract payload
             payload = verify_token(token, "access")
-
-            # Add user information to request state
-            request.state.user_id = payload.get("sub")
-            request.state.user_email = payload.get("email")
-            request.state.user_role = payload.get("role")
-            request.state.permissions = payload.get("permissions", [])
-
         except ValueError as e:
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": str(e)}
-            )
+            await self._reject(scope, receive, send, status.HTTP_401_UNAUTHORIZED, {"detail": str(e)})
+            return
         except HTTPException as e:
-            return JSONResponse(
-                status_code=e.status_code,
-                content={"detail": e.detail}
-            )
+            await self._reject(scope, receive, send, e.status_code, {"detail": e.detail})
+            return
         except Exception:
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": "Invalid token"}
-            )
-
-        return await call_next(request)
+            await self._reject(scope, receive, send, status.HTTP_401_UNAUTHORIZED, {"detail": "Invalid token"})
+            return
+
+        user_permissions = payload.get("permissions", [])
+        required_permission = self.permissions.required_permission(path, method)
+        if required_permission and required_permission not in user_permissions:
+            await self._reject(scope, receive, send, status.HTTP_403_FORBIDDEN, {
+                "detail": f"Insufficient permissions. Required: {required_permission}",
+                "required_permission": required_permission,
+                "user_permissions": user_permissions
+            })
+            return
+
+        # Read by handlers as request.state.<name>
+        state = scope.setdefault("state", {})
+        state["token_payload"] = payload
+        state["user_id"] = payload.get("sub")
+        state["user_email"] = payload.get("email")
+        state["user_role"] = payload.get("role")
+        state["permissions"] = user_permissions
+        state["required_permission"] = required_permission
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, status_code: int, content: dict):
+        await JSONResponse(status_code=status_code, content=content)(scope, receive, send)
 
 
 # Dependency for getting current user
 security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated user from JWT token."""
     try:
-        token = credentials.credentials
-        payload = verify_token(token, "access")
+        # AuthMiddleware has already verified the token on protected routes
+        payload = getattr(request.state, "token_payload", None)
+        if payload is None:
+            payload = verify_token(credentials.credentials, "access")
 
         return {
             "user_id": payload.get("sub"),
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.types import DECIMAL
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -15,13 +16,37 @@ class BookingStatus(str, enum.Enum):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
     REJECTED = "rejected"
+    # Written by simple_app, which shares the bookings table
+    ACCEPTED = "accepted"
+    SEE_LATER = "see_later"
+
+# Stored by value ('pending'), as simple_app writes it and as the
+# booking_status type in database_schema.sql declares it
+BookingStatusType = Enum(
+    BookingStatus,
+    name="booking_status",
+    values_callable=lambda statuses: [status.value for status in statuses]
+)
+
+# simple_app shares the bookings table on SQLite and writes ids as hyphenated
+# text and timestamps as CURRENT_TIMESTAMP; these types read and write the
+# same representation, so both apps' rows load and compare the same way
+BookingUUID = UUID(as_uuid=False).with_variant(String(36), "sqlite")
+BookingTimestamp = DateTime().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
+def new_booking_id() -> str:
+    return str(uuid.uuid4())
 
 class Booking(Base):
     __tablename__ = "bookings"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    bouncer_id = Column(UUID(as_uuid=True), ForeignKey("bouncer_profiles.id"), nullable=False)
+    id = Column(BookingUUID, primary_key=True, default=new_booking_id)
+    user_id = Column(BookingUUID, ForeignKey("users.id"), nullable=False)
+    # Empty while the request is open; set when a bouncer accepts it
+    bouncer_id = Column(BookingUUID, ForeignKey("bouncer_profiles.id"), nullable=True)
     event_name = Column(String(200), nullable=False)
     event_description = Column(Text)
     event_location_address = Column(Text, nullable=False)
@@ -30,21 +55,28 @@ class Booking(Base):
     hourly_rate = Column(DECIMAL(10, 2), nullable=False)
     total_amount = Column(DECIMAL(10, 2), nullable=False)
     special_requirements = Column(Text)
-    status = Column(Enum(BookingStatus), default=BookingStatus.PENDING)
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    status = Column(BookingStatusType, default=BookingStatus.PENDING)
+    created_at = Column(BookingTimestamp, server_default=func.now())
+    updated_at = Column(BookingTimestamp, server_default=func.now(), onupdate=func.now())
 
     # Relationships
     user = relationship("User", back_populates="bookings")
     bouncer = relationship("BouncerProfile", back_populates="bookings")
 
+    # Composite indexes backing keyset pagination of the booking lists
+    __table_args__ = (
+        Index("idx_bookings_status_created", "status", "created_at", "id"),
+        Index("idx_bookings_status_updated", "status", "updated_at", "id"),
+        Index("idx_bookings_user_created", "user_id", "created_at", "id"),
+    )
+
 class BookingStatusHistory(Base):
     __tablename__ = "booking_status_history"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    booking_id = Column(UUID(as_uuid=True), ForeignKey("bookings.id"), nullable=False)
-    old_status = Column(Enum(BookingStatus))
-    new_status = Column(Enum(BookingStatus), nullable=False)
+    booking_id = Column(BookingUUID, ForeignKey("bookings.id"), nullable=False)
+    old_status = Column(BookingStatusType)
+    new_status = Column(BookingStatusType, nullable=False)
     changed_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     reason = Column(Text)
     created_at = Column(DateTime, server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Boolean, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, String, Text, Boolean, ForeignKey, DateTime, JSON, BigInteger, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -17,6 +17,12 @@ class Notification(Base):
     is_read = Column(Boolean, default=False)
     data = Column(JSON)  # Additional data for the notification
     created_at = Column(DateTime, server_default=func.now())
+    # Per-user sequence number; clients use it as their last-seen cursor
+    seq = Column(BigInteger)
 
     # Relationships
-    user = relationship("User", back_populates="notifications")
\ No newline at end of file
+    user = relationship("User", back_populates="notifications")
+
+    __table_args__ = (
+        Index("idx_notifications_user_seq", "user_id", "seq", unique=True),
+    )
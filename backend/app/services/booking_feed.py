@@ -0,0 +1,344 @@
+"""Change feed for bookings, streamed to dashboards instead of polling.
+
+Every booking create or status change appends a row to booking_changes in
+the same write transaction as the change itself (record_booking_change).
+The row id is the event id: it only ever grows, so a client that remembers
+the last id it saw can resume from exactly that point after a reconnect,
+on any worker.
+
+BookingFeed runs one tail task per process. The task reads new rows by
+primary key and fans them out to the subscribers connected to that
+process. Writers in the same process wake it with notify(); writes made by
+other workers are picked up on the next poll_interval tick. However many
+dashboards are open, each worker runs one indexed query per tick.
+
+Only the newest `retention` rows are kept. A client whose last id is older
+than that is sent a reset and reloads its lists once. A subscriber that
+falls more than queue_size events behind is disconnected rather than
+buffered without bound; it resumes from its last id when it reconnects.
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.core.sqlite_pool import AsyncSQLite
+
+FEED_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS booking_changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        booking_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        old_status TEXT,
+        new_status TEXT,
+        user_id TEXT,
+        bouncer_user_id TEXT,
+        changed_by TEXT,
+        booking TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Row snapshot sent with each event, with the same fields as the booking
+# lists so a dashboard can move the booking between lists without refetching.
+# The bouncer is the owner of the service profile the booking was made
+# against, or the bouncer user who accepted it.
+_SNAPSHOT_SQL = """
+    SELECT
+        b.id, b.user_id, b.bouncer_id, b.event_name, b.event_description,
+        b.event_location_address, b.start_datetime, b.end_datetime,
+        b.hourly_rate, b.total_amount, b.special_requirements, b.status,
+        b.book_type, b.member_count, b.created_at, b.updated_at,
+        u.first_name, u.last_name, u.email, u.phone,
+        COALESCE(sp.user_id, bu.id)
+    FROM bookings b
+    LEFT JOIN users u ON u.id = CAST(b.user_id AS TEXT)
+    LEFT JOIN service_profiles sp ON sp.id = CAST(b.bouncer_id AS TEXT)
+    LEFT JOIN users bu ON bu.id = CAST(b.bouncer_id AS TEXT)
+    WHERE b.id = ?
+"""
+
+_CHANGE_COLUMNS = "id, booking_id, kind, old_status, new_status, user_id, bouncer_user_id, changed_by, booking, created_at"
+
+# Rows are pruned every this many events rather than on every insert
+_PRUNE_EVERY = 100
+
+# Roles that see every booking (the pending and see-later lists are shared)
+FEED_ALL_ROLES = ("bouncer", "admin")
+
+
+def ensure_feed_table(conn):
+    conn.execute(FEED_TABLE_SQL)
+
+
+def record_booking_change(conn, booking_id: str, kind: str, old_status: Optional[str], changed_by: str, retention: int = 10000) -> Optional[Dict]:
+    """Append a change event for booking_id. Call inside the write unit, after the change.
+
+    Returns the event as sent to subscribers, or None if the booking does not exist.
+    """
+    row = conn.execute(_SNAPSHOT_SQL, (booking_id,)).fetchone()
+    if row is None:
+        return None
+
+    booking = {
+        "id": row[0],
+        "user_id": row[1],
+        "bouncer_id": row[2],
+        "event_name": row[3],
+        "event_description": row[4],
+        "event_location": row[5],
+        "start_datetime": row[6],
+        "end_datetime": row[7],
+        "hourly_rate": row[8],
+        "total_amount": row[9],
+        "special_requirements": row[10],
+        "status": row[11],
+        "book_type": row[12],
+        "member_count": row[13],
+        "created_at": row[14],
+        "updated_at": row[15],
+        "user_info": {
+            "first_name": row[16] if row[16] else "Unknown",
+            "last_name": row[17] if row[17] else "",
+            "email": row[18] if row[18] else "N/A",
+            "phone": row[19] if row[19] else "N/A"
+        }
+    }
+    user_id = str(row[1]) if row[1] is not None else None
+    bouncer_user_id = row[20]
+
+    change_row = conn.execute(f"""
+        INSERT INTO booking_changes (booking_id, kind, old_status, new_status, user_id, bouncer_user_id, changed_by, booking)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        RETURNING {_CHANGE_COLUMNS}
+    """, (booking_id, kind, old_status, row[11], user_id, bouncer_user_id, changed_by, json.dumps(booking))).fetchone()
+
+    if change_row[0] % _PRUNE_EVERY == 0:
+        conn.execute("DELETE FROM booking_changes WHERE id <= ?", (change_row[0] - retention,))
+
+    return _to_event(change_row)
+
+
+def _to_event(row) -> Dict:
+    return {
+        "id": row[0],
+        "booking_id": row[1],
+        "kind": row[2],
+        "old_status": row[3],
+        "new_status": row[4],
+        "user_id": row[5],
+        "bouncer_user_id": row[6],
+        "changed_by": row[7],
+        "booking": json.loads(row[8]),
+        "created_at": row[9],
+    }
+
+
+def visible_to(event: Dict, user_id: str, role: Optional[str]) -> bool:
+    """Bouncers and admins see every booking; customers only their own."""
+    return role in FEED_ALL_ROLES or user_id in (event["user_id"], event["bouncer_user_id"])
+
+
+class _Subscriber:
+    __slots__ = ("user_id", "role", "queue", "overflowed")
+
+    def __init__(self, user_id: str, role: Optional[str], queue_size: int):
+        self.user_id = user_id
+        self.role = role
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+
+class BookingFeed:
+    """Tails booking_changes and fans new events out to this process's subscribers."""
+
+    def __init__(
+        self,
+        db: AsyncSQLite,
+        poll_interval: float = 1.0,
+        batch_size: int = 500,
+        queue_size: int = 1000,
+    ):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._subscribers: List[_Subscriber] = []
+        self._last_id: Optional[int] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscriber in self._subscribers:
+            subscriber.overflowed = True
+            self._put_end(subscriber)
+
+    def notify(self):
+        """Wake the tail task after committing a change, instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    # ---- database ----
+
+    @staticmethod
+    def _read_after(conn, after: int, limit: int) -> List:
+        return conn.execute(f"""
+            SELECT {_CHANGE_COLUMNS} FROM booking_changes
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        """, (after, limit)).fetchall()
+
+    @staticmethod
+    def _bounds(conn):
+        return conn.execute("SELECT MIN(id), MAX(id) FROM booking_changes").fetchone()
+
+    async def latest_id(self) -> int:
+        return (await self.db.run(self._bounds))[1] or 0
+
+    async def changes_since(self, after: int, user_id: str, role: Optional[str], limit: int = 500):
+        """Events after `after` visible to the user, oldest first.
+
+        Returns (events, next_id, reset_from). Pass next_id back as `after`
+        to continue. reset_from is None unless events after `after` were
+        already pruned, or `after` is ahead of the feed (the database was
+        replaced); the client must then reload its lists, and the returned
+        events continue from reset_from.
+        """
+        def read(conn):
+            oldest, newest = self._bounds(conn)
+            return oldest, newest or 0, self._read_after(conn, after, limit)
+
+        oldest, newest, rows = await self.db.run(read)
+        reset_from = None
+        if after > newest:
+            reset_from = newest
+        elif oldest is not None and after < oldest - 1:
+            reset_from = oldest - 1
+        next_id = rows[-1][0] if rows else after if reset_from is None else reset_from
+        events = [_to_event(row) for row in rows]
+        return [event for event in events if visible_to(event, user_id, role)], next_id, reset_from
+
+    # ---- fan-out ----
+
+    async def _tail(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            if not self._subscribers:
+                # Nobody to deliver to; the next subscriber re-reads the position
+                self._last_id = None
+                continue
+            if self._last_id is None:
+                continue
+
+            try:
+                while self._subscribers:
+                    rows = await self.db.run(self._read_after, self._last_id, self.batch_size)
+                    for row in rows:
+                        self._dispatch(_to_event(row))
+                        self._last_id = row[0]
+                    if len(rows) < self.batch_size:
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[FEED ERROR] Reading booking changes failed: {e}")
+
+    def _dispatch(self, event: Dict):
+        for subscriber in list(self._subscribers):
+            if subscriber.overflowed or not visible_to(event, subscriber.user_id, subscriber.role):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A client this far behind resumes from its last id on reconnect
+                subscriber.overflowed = True
+                self._put_end(subscriber)
+
+    @staticmethod
+    def _put_end(subscriber: _Subscriber):
+        while True:
+            try:
+                subscriber.queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                subscriber.queue.get_nowait()
+
+    async def subscribe(
+        self,
+        user_id: str,
+        role: Optional[str],
+        last_event_id: Optional[int] = None,
+        heartbeat: Optional[float] = None,
+    ) -> AsyncIterator[Optional[Dict]]:
+        """Yield events visible to the user, starting after last_event_id.
+
+        Without last_event_id only new events are sent. A yielded
+        {"kind": "reset", "id": ...} means events were missed; the client
+        should reload its lists and carry on from that id. With heartbeat
+        set, None is yielded after that many idle seconds so the caller can
+        keep the connection alive. The iterator ends if the subscriber falls
+        more than queue_size events behind.
+        """
+        subscriber = _Subscriber(user_id, role, self.queue_size)
+        # Register before reading the backlog: everything committed after
+        # the tail position is queued, everything before it is in the backlog
+        self._subscribers.append(subscriber)
+        try:
+            if self._last_id is None:
+                self._last_id = await self.latest_id()
+
+            caught_up = self._last_id
+            if last_event_id is None:
+                last_event_id = caught_up
+            else:
+                # Backlog up to the tail position; later events arrive on the queue
+                while True:
+                    events, next_id, reset_from = await self.changes_since(last_event_id, user_id, role, self.batch_size)
+                    if reset_from is not None:
+                        yield {"kind": "reset", "id": reset_from}
+                    for event in events:
+                        yield event
+                    if next_id == last_event_id or next_id >= caught_up:
+                        last_event_id = next_id
+                        break
+                    last_event_id = next_id
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                if event["id"] > last_event_id:
+                    last_event_id = event["id"]
+                    yield event
+        finally:
+            self._subscribers.remove(subscriber)
+
+
+def format_sse(event: Dict) -> str:
+    """One Server-Sent Events frame; the id is what the browser resends as Last-Event-ID."""
+    name = "reset" if event["kind"] == "reset" else "booking_change"
+    return f"id: {event['id']}\nevent: {name}\ndata: {json.dumps(event)}\n\n"
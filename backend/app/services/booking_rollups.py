@@ -0,0 +1,114 @@
+"""Per-bouncer, per-month booking rollups behind the bouncer dashboard.
+
+bouncer_monthly_stats holds one row per (bouncer user, month of
+start_datetime, status) with the booking count, revenue and hours for that
+bucket. Every dashboard figure is a sum over a handful of these rows, so the
+dashboard reads a single primary-key range instead of aggregating bookings.
+
+The rollup is maintained inside the same write transaction as the booking
+change: remove the booking's contribution with apply_booking_delta(..., -1)
+before modifying it and add it back with apply_booking_delta(..., +1)
+afterwards. rebuild_rollups() recomputes everything from bookings.
+
+All functions take a sqlite3 connection and leave committing to the caller.
+"""
+import sqlite3
+from typing import Dict, List, Tuple
+
+ROLLUP_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS bouncer_monthly_stats (
+        bouncer_user_id TEXT NOT NULL,
+        month TEXT NOT NULL,
+        status TEXT NOT NULL,
+        booking_count INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        hours REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (bouncer_user_id, month, status)
+    ) WITHOUT ROWID
+"""
+
+# A booking counts towards the bouncer owning the service profile it was
+# booked against. bookings.bouncer_id has NUMERIC affinity, hence the CAST
+# so the service_profiles primary key can be used for the join.
+_DELTA_SQL = """
+    INSERT INTO bouncer_monthly_stats (bouncer_user_id, month, status, booking_count, revenue, hours)
+    SELECT sp.user_id,
+           COALESCE(strftime('%Y-%m', b.start_datetime), ''),
+           COALESCE(b.status, ''),
+           :sign,
+           :sign * COALESCE(b.total_amount, 0),
+           :sign * COALESCE((julianday(b.end_datetime) - julianday(b.start_datetime)) * 24, 0)
+    FROM bookings b
+    JOIN service_profiles sp ON sp.id = CAST(b.bouncer_id AS TEXT)
+    WHERE b.id = :booking_id
+    ON CONFLICT (bouncer_user_id, month, status) DO UPDATE SET
+        booking_count = booking_count + excluded.booking_count,
+        revenue = revenue + excluded.revenue,
+        hours = hours + excluded.hours
+"""
+
+ACTIVE_STATUSES = ("accepted", "in_progress")
+MONTHLY_STATUSES = ("completed", "accepted", "in_progress")
+FINISHED_STATUSES = ("completed", "cancelled", "rejected")
+
+
+def ensure_rollup_table(conn: sqlite3.Connection) -> bool:
+    """Create the rollup table if needed, returning True if it was just created."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bouncer_monthly_stats'"
+    ).fetchone()
+    conn.execute(ROLLUP_TABLE_SQL)
+    return exists is None
+
+
+def apply_booking_delta(conn: sqlite3.Connection, booking_id: str, sign: int):
+    """Add (sign=1) or remove (sign=-1) one booking's contribution to the rollup."""
+    conn.execute(_DELTA_SQL, {"sign": sign, "booking_id": booking_id})
+
+
+def rebuild_rollups(conn: sqlite3.Connection) -> int:
+    """Recompute the whole rollup table from bookings. Returns the number of rollup rows."""
+    conn.execute(ROLLUP_TABLE_SQL)
+    conn.execute("DELETE FROM bouncer_monthly_stats")
+    conn.execute("""
+        INSERT INTO bouncer_monthly_stats (bouncer_user_id, month, status, booking_count, revenue, hours)
+        SELECT sp.user_id,
+               COALESCE(strftime('%Y-%m', b.start_datetime), ''),
+               COALESCE(b.status, ''),
+               COUNT(*),
+               SUM(COALESCE(b.total_amount, 0)),
+               SUM(COALESCE((julianday(b.end_datetime) - julianday(b.start_datetime)) * 24, 0))
+        FROM bookings b
+        JOIN service_profiles sp ON sp.id = CAST(b.bouncer_id AS TEXT)
+        GROUP BY 1, 2, 3
+    """)
+    return conn.execute("SELECT COUNT(*) FROM bouncer_monthly_stats").fetchone()[0]
+
+
+def summarize(rows: List[Tuple[str, str, int, float, float]], month: str) -> Dict[str, object]:
+    """Fold rollup rows into the figures shown on the dashboard."""
+    summary = {
+        "active_bookings": 0,
+        "monthly_bookings": 0,
+        "monthly_revenue": 0.0,
+        "monthly_hours": 0.0,
+        "completed_bookings": 0,
+        "finished_jobs": 0,
+        "status_breakdown": {},
+    }
+    breakdown = summary["status_breakdown"]
+
+    for row_month, status, count, revenue, hours in rows:
+        breakdown[status] = breakdown.get(status, 0) + count
+        if status in ACTIVE_STATUSES:
+            summary["active_bookings"] += count
+        if status == "completed":
+            summary["completed_bookings"] += count
+        if status in FINISHED_STATUSES:
+            summary["finished_jobs"] += count
+        if row_month == month and status in MONTHLY_STATUSES:
+            summary["monthly_bookings"] += count
+            summary["monthly_revenue"] += revenue
+            summary["monthly_hours"] += hours
+
+    return summary
@@ -0,0 +1,147 @@
+"""Coalesces Socket.IO emits per room into batch frames.
+
+Helpers in app/services/websocket.py emit through EmitScheduler.emit()
+instead of sio.emit(). Events for the same room, or the same set of rooms,
+that arrive within `window` seconds are sent as one emit:
+
+- A lone event goes out unchanged, under its own name.
+- Several events go out as one `batch_event` frame,
+  {"events": [{"event": name, "data": payload}, ...]}, in emit order.
+
+Either way each payload is encoded once per frame and published once on
+the message queue, however many sockets are in the room. A bulk status
+change therefore costs one emit per room per window instead of one per
+booking. Ordering is kept per room; events for different rooms in the
+same window may arrive in either order.
+
+Backpressure works at two levels:
+
+- Producers: once `max_pending` events are waiting, emit() flushes and
+  waits for the sends to finish, so a bulk update runs at delivery speed
+  instead of buffering without bound.
+- Slow consumers: when a frame is sent, any local socket whose Engine.IO
+  send queue holds more than `slow_client_packets` packets is skipped and
+  disconnected. The client reconnects and replays what it missed from
+  its notification cursor (see notification_outbox.py).
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+Room = Union[str, List[str], None]
+RoomKey = Optional[Tuple[str, ...]]
+
+
+class EmitScheduler:
+    def __init__(
+        self,
+        server: socketio.AsyncServer,
+        window: float = 0.02,
+        max_batch: int = 100,
+        max_pending: int = 10000,
+        slow_client_packets: int = 256,
+        batch_event: str = "batch",
+        namespace: str = "/",
+    ):
+        self.server = server
+        self.window = window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.slow_client_packets = slow_client_packets
+        self.batch_event = batch_event
+        self.namespace = namespace
+        self._pending: Dict[RoomKey, List[Tuple[str, Any]]] = {}
+        self._pending_count = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _room_key(room: Room) -> RoomKey:
+        if room is None:
+            return None
+        if isinstance(room, str):
+            return (room,)
+        return tuple(sorted(set(room)))
+
+    async def emit(self, event: str, data: Any, room: Room = None):
+        """Queue an event for room (a room name, a list of rooms, or None for everyone)."""
+        key = self._room_key(room)
+        if key == ():
+            return
+        if self.window <= 0:
+            await self._send(key, [(event, data)])
+            return
+
+        batch = self._pending.setdefault(key, [])
+        batch.append((event, data))
+        self._pending_count += 1
+
+        if self._pending_count >= self.max_pending:
+            # Hold the producer until what is queued has been handed to the sockets
+            await self._flush()
+        elif len(batch) >= self.max_batch:
+            self._spawn(self._send(key, self._take(key)))
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._on_timer)
+
+    async def stop(self):
+        """Send everything still queued; call on shutdown."""
+        await self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    # ---- flushing ----
+
+    def _take(self, key: RoomKey) -> List[Tuple[str, Any]]:
+        events = self._pending.pop(key)
+        self._pending_count -= len(events)
+        return events
+
+    def _on_timer(self):
+        self._timer = None
+        self._spawn(self._flush())
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._pending_count = self._pending, {}, 0
+        if pending:
+            await asyncio.gather(*(self._send(key, events) for key, events in pending.items()))
+
+    async def _send(self, key: RoomKey, events: List[Tuple[str, Any]]):
+        if len(events) == 1:
+            event, data = events[0]
+        else:
+            event = self.batch_event
+            data = {'events': [{'event': name, 'data': payload} for name, payload in events]}
+
+        room = None if key is None else key[0] if len(key) == 1 else list(key)
+        try:
+            slow = self._slow_sids(room)
+            await self.server.emit(event, data, room=room, skip_sid=slow or None)
+        except Exception as e:
+            logger.error(f"Error emitting {len(events)} event(s) to {room or 'everyone'}: {str(e)}")
+
+    def _slow_sids(self, room: Room) -> List[str]:
+        """Local sockets in room with a send backlog over the limit; they are disconnected."""
+        if not self.slow_client_packets:
+            return []
+        slow = []
+        for sid, eio_sid in self.server.manager.get_participants(self.namespace, room):
+            socket = self.server.eio.sockets.get(eio_sid)
+            if socket is not None and socket.queue.qsize() > self.slow_client_packets:
+                slow.append(sid)
+        for sid in slow:
+            logger.warning(f"Disconnecting slow Socket.IO client {sid}: over {self.slow_client_packets} packets unsent")
+            self._spawn(self.server.disconnect(sid, namespace=self.namespace))
+        return slow
@@ -0,0 +1,266 @@
+"""Outbound email queue stored in SQLite and drained by background workers.
+
+Request handlers only insert a row into mail_outbox (enqueue_mail) and
+return; they never talk to the mail server. MailQueue workers claim due
+messages in batches and send each batch over a long-lived, already
+authenticated SMTP session, so a burst of password resets costs one TLS
+handshake per worker rather than one per email.
+
+Delivery is at-least-once:
+- A claimed message is leased for lease_seconds. If the process dies
+  mid-send, the message becomes claimable again once the lease runs out.
+- Temporary failures are retried with exponential backoff, up to
+  max_attempts.
+- Permanent SMTP rejections (5xx) are marked failed straight away.
+"""
+import asyncio
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from app.core.sqlite_pool import AsyncSQLite
+
+OUTBOX_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS mail_outbox (
+        id INTEGER PRIMARY KEY,
+        recipient TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        html_body TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'sending', 'sent', 'failed')),
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        claimed_until REAL,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        sent_at TIMESTAMP
+    )
+"""
+
+# Message tuples handed to transports: (id, recipient, subject, html_body)
+Message = Tuple[int, str, str, str]
+
+
+def ensure_outbox_table(conn):
+    conn.execute(OUTBOX_TABLE_SQL)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mail_outbox_due ON mail_outbox (status, next_attempt_at)")
+
+
+def enqueue_mail(conn, recipient: str, subject: str, html_body: str) -> int:
+    """Queue one email. Call inside a write unit of work; returns the outbox id."""
+    cursor = conn.execute(
+        "INSERT INTO mail_outbox (recipient, subject, html_body, next_attempt_at) VALUES (?, ?, ?, ?)",
+        (recipient, subject, html_body, time.time()),
+    )
+    return cursor.lastrowid
+
+
+class PermanentMailError(Exception):
+    """The server rejected the message; retrying will not help."""
+
+
+class SmtpTransport:
+    """One reusable SMTP session. Not thread-safe: give each worker its own."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        sender: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        timeout: float = 30,
+        idle_timeout: float = 60,
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.password:
+            server.login(self.username or self.sender, self.password)
+        return server
+
+    def _session(self) -> smtplib.SMTP:
+        if self._server is not None:
+            if time.monotonic() - self._last_used > self.idle_timeout:
+                self.close()
+            else:
+                try:
+                    self._server.noop()
+                except smtplib.SMTPException:
+                    self.close()
+        if self._server is None:
+            self._server = self._connect()
+        self._last_used = time.monotonic()
+        return self._server
+
+    def _build(self, recipient: str, subject: str, html_body: str) -> str:
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg.attach(MIMEText(html_body, 'html'))
+        return msg.as_string()
+
+    def send_batch(self, messages: Sequence[Message]) -> List[Optional[Exception]]:
+        """Send messages over one session. Returns one error (or None) per message."""
+        results: List[Optional[Exception]] = []
+        for message_id, recipient, subject, html_body in messages:
+            try:
+                server = self._session()
+                server.sendmail(self.sender, [recipient], self._build(recipient, subject, html_body))
+                results.append(None)
+            except smtplib.SMTPRecipientsRefused as e:
+                results.append(PermanentMailError(str(e.recipients)))
+            except smtplib.SMTPAuthenticationError as e:
+                # Bad credentials are a configuration problem, not the message's fault
+                self.close()
+                results.append(e)
+            except smtplib.SMTPResponseException as e:
+                if 500 <= e.smtp_code < 600:
+                    results.append(PermanentMailError(f"{e.smtp_code} {e.smtp_error!r}"))
+                else:
+                    results.append(e)
+            except (smtplib.SMTPException, OSError) as e:
+                # Connection trouble: drop the session so the next message reconnects
+                self.close()
+                results.append(e)
+        return results
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+class MailQueue:
+    """Background workers that drain mail_outbox through SMTP transports."""
+
+    def __init__(
+        self,
+        db: AsyncSQLite,
+        transport_factory: Callable[[], SmtpTransport],
+        workers: int = 2,
+        batch_size: int = 20,
+        max_attempts: int = 5,
+        backoff_base: float = 5,
+        backoff_max: float = 600,
+        lease_seconds: float = 120,
+        poll_interval: float = 5,
+    ):
+        self.db = db
+        self.transport_factory = transport_factory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def notify(self):
+        """Wake idle workers after enqueueing, instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    def _claim(self, conn) -> List[Message]:
+        now = time.time()
+        return conn.execute("""
+            UPDATE mail_outbox
+            SET status = 'sending', claimed_until = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM mail_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND claimed_until < ?)
+                ORDER BY next_attempt_at
+                LIMIT ?
+            )
+            RETURNING id, recipient, subject, html_body
+        """, (now + self.lease_seconds, now, now, self.batch_size)).fetchall()
+
+    def _record(self, conn, messages: Sequence[Message], errors: Sequence[Optional[Exception]]):
+        now = time.time()
+        for (message_id, recipient, _, _), error in zip(messages, errors):
+            if error is None:
+                conn.execute("""
+                    UPDATE mail_outbox
+                    SET status = 'sent', sent_at = CURRENT_TIMESTAMP, claimed_until = NULL, last_error = NULL
+                    WHERE id = ?
+                """, (message_id,))
+                continue
+
+            attempts = conn.execute("SELECT attempts FROM mail_outbox WHERE id = ?", (message_id,)).fetchone()[0]
+            if isinstance(error, PermanentMailError) or attempts >= self.max_attempts:
+                print(f"[MAIL ERROR] Giving up on message {message_id} to {recipient}: {error}")
+                conn.execute("""
+                    UPDATE mail_outbox SET status = 'failed', claimed_until = NULL, last_error = ? WHERE id = ?
+                """, (str(error), message_id))
+            else:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+                print(f"[MAIL] Message {message_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+                conn.execute("""
+                    UPDATE mail_outbox
+                    SET status = 'pending', claimed_until = NULL, next_attempt_at = ?, last_error = ?
+                    WHERE id = ?
+                """, (now + delay, str(error), message_id))
+
+    async def _work(self, transport: SmtpTransport):
+        # The transport only ever runs on this worker's own thread, so close()
+        # waits behind a send_batch still in flight when the worker is stopped
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mail-worker")
+        try:
+            while True:
+                try:
+                    # Cleared before claiming, so a notify() that lands while
+                    # the claim runs is not lost until the next poll
+                    self._wakeup.clear()
+                    messages = await self.db.run(self._claim, write=True)
+                    if not messages:
+                        try:
+                            await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+
+                    errors = await loop.run_in_executor(executor, transport.send_batch, messages)
+                    await self.db.run(self._record, messages, errors, write=True)
+                    sent = sum(1 for error in errors if error is None)
+                    print(f"[MAIL] Sent {sent}/{len(messages)} queued emails")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Leased messages are picked up again once the lease expires
+                    print(f"[MAIL ERROR] Worker error: {e}")
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            await loop.run_in_executor(executor, transport.close)
+            executor.shutdown(wait=False)
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work(self.transport_factory())) for _ in range(self.workers)]
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
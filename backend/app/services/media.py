@@ -0,0 +1,192 @@
+"""User-uploaded images stored as content-addressed thumbnails.
+
+An upload is validated with Pillow and reduced to fixed-size square WebP
+thumbnails. Those are written to a MediaStore under the SHA-256 of the
+uploaded bytes, and database rows keep only the short reference
+"<kind>/<digest>" (e.g. "avatars/<digest>"). Because a given name always
+holds the same bytes, the files can be served with immutable cache
+headers, and uploading the same picture twice stores it once.
+
+Uploads can be handed over as bytes or as a file object, such as the
+spooled temp file from app.core.uploads, so large photos never have to be
+held in memory whole.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Dict, Optional, Sequence
+
+from fastapi import HTTPException, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+AVATAR_SIZES = (256, 64)
+PROFILE_PHOTO_SIZES = (512, 128)
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+_DATA_URL_RE = re.compile(r"^data:(image/[\w.+-]+);base64,(.*)$", re.DOTALL)
+_FILE_NAME_RE = re.compile(r"^([0-9a-f]{64})_(\d+)\.webp$")
+
+
+class MediaStore(ABC):
+    """Where media blobs live. Keys are relative paths such as "avatars/ab/<name>"."""
+
+    @abstractmethod
+    def write(self, key: str, data: bytes):
+        ...
+
+    @abstractmethod
+    def read(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+
+class LocalMediaStore(MediaStore):
+    """Files under a local directory, written atomically (temp file + rename)."""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid media key: {key}")
+        return path
+
+    def write(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+
+class ThumbnailStore:
+    """Square WebP thumbnails of one kind of image (avatars, profile photos, ...)."""
+
+    def __init__(
+        self,
+        store: MediaStore,
+        kind: str,
+        sizes: Sequence[int],
+        max_bytes: int = 10 * 1024 * 1024,
+        max_pixels: int = 40_000_000,
+    ):
+        self.store = store
+        self.kind = kind
+        self.sizes = tuple(sizes)
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+
+    @property
+    def reference_prefix(self) -> str:
+        return self.kind + "/"
+
+    def _storage_key(self, digest: str, size: int) -> str:
+        # Two-level fan-out keeps directories small
+        return f"{self.kind}/{digest[:2]}/{digest}_{size}.webp"
+
+    def decode_data_url(self, data_url: str) -> bytes:
+        """Decode a base64 data URL, raising 400 for anything that is not a sane image upload."""
+        match = _DATA_URL_RE.match(data_url.strip())
+        if not match:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image must be a base64 image data URL")
+        # Base64 inflates by 4/3, so reject oversized uploads before decoding them
+        if len(match.group(2)) > self.max_bytes * 4 // 3 + 4:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large")
+        try:
+            return base64.b64decode(match.group(2), validate=True)
+        except (binascii.Error, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image data is not valid base64")
+
+    def save(self, data: bytes) -> str:
+        return self.save_file(io.BytesIO(data))
+
+    def save_file(self, fileobj: BinaryIO) -> str:
+        """Store thumbnails for an uploaded image and return its reference. Blocking (Pillow + disk)."""
+        digest = hashlib.sha256()
+        fileobj.seek(0)
+        for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        if all(self.store.exists(self._storage_key(digest, size)) for size in self.sizes):
+            return self.reference_prefix + digest
+
+        fileobj.seek(0)
+        try:
+            with Image.open(fileobj) as image:
+                # Image.open only parses the header, so format and dimensions
+                # are checked before any pixel data is decoded
+                if image.format not in ALLOWED_FORMATS:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image must be JPEG, PNG, WebP or GIF")
+                if image.width * image.height > self.max_pixels:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image dimensions are too large")
+                # Lets the JPEG decoder downscale while decoding
+                image.draft("RGB", (max(self.sizes) * 2, max(self.sizes) * 2))
+                image.load()
+                image = ImageOps.exif_transpose(image)
+                image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+                for size in self.sizes:
+                    thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                    out = io.BytesIO()
+                    thumbnail.save(out, "WEBP", quality=85, method=4)
+                    self.store.write(self._storage_key(digest, size), out.getvalue())
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not a supported image")
+
+        return self.reference_prefix + digest
+
+    def read(self, file_name: str) -> Optional[bytes]:
+        """Bytes for a served file name such as "<digest>_256.webp", or None."""
+        match = _FILE_NAME_RE.match(file_name)
+        if not match or int(match.group(2)) not in self.sizes:
+            return None
+        return self.store.read(self._storage_key(match.group(1), int(match.group(2))))
+
+    def urls(self, reference: Optional[str], base_url: str) -> Dict[str, str]:
+        """Public URLs for a stored reference, keyed by thumbnail size.
+
+        Values that are not our references (legacy data URLs, external links)
+        are returned unchanged for every size.
+        """
+        if not reference:
+            return {str(size): "" for size in self.sizes}
+        if not reference.startswith(self.reference_prefix):
+            return {str(size): reference for size in self.sizes}
+        digest = reference[len(self.reference_prefix):]
+        return {str(size): f"{base_url.rstrip('/')}/media/{self.kind}/{digest}_{size}.webp" for size in self.sizes}
+
+
+def create_media_store(root: Optional[str] = None) -> LocalMediaStore:
+    """Media on local disk under MEDIA_ROOT (default: ./media)."""
+    return LocalMediaStore(root or os.getenv("MEDIA_ROOT", "media"))
+
+
+def create_avatar_store(store: Optional[MediaStore] = None, max_bytes: int = 10 * 1024 * 1024) -> ThumbnailStore:
+    return ThumbnailStore(store or create_media_store(), "avatars", AVATAR_SIZES, max_bytes=max_bytes)
+
+
+def create_profile_photo_store(store: Optional[MediaStore] = None, max_bytes: int = 10 * 1024 * 1024) -> ThumbnailStore:
+    return ThumbnailStore(store or create_media_store(), "profile-photos", PROFILE_PHOTO_SIZES, max_bytes=max_bytes)
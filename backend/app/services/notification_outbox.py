@@ -0,0 +1,193 @@
+"""Per-user outbox for realtime notifications.
+
+Every notification addressed to one user is written to the notifications
+table with a per-user sequence number (Notification.seq) before it is
+emitted. It therefore survives the user being offline, a worker restart
+or a Redis flush. The newest `buffer_size` entries per user are also kept
+in a ring buffer in Redis, next to the cursor the user last acknowledged.
+
+On connect, the client's cursor is compared with the ring buffer in one
+Redis round trip. The cursor comes from the auth payload or, failing
+that, from the last acknowledgement. Only entries newer than the cursor
+are replayed. The database is read only when Redis has no buffer for the
+user (first connect, expiry, flush or outage), and it is read with one
+indexed query. A replay never exceeds `buffer_size` entries. If the
+client is further behind than that, `truncated` tells it to reload its
+lists once instead of polling them.
+"""
+import asyncio
+import json
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from app.core.redis_pool import RedisPool
+from app.models.notification import Notification
+
+
+class NotificationOutbox:
+    def __init__(
+        self,
+        pool: RedisPool,
+        session_factory: Callable,
+        prefix: str = "sio",
+        buffer_size: int = 100,
+        ttl: int = 7 * 24 * 3600,
+    ):
+        self.pool = pool
+        self.session_factory = session_factory
+        self.prefix = prefix
+        self.buffer_size = buffer_size
+        self.ttl = ttl
+
+    def _key(self, user_id: str, part: str) -> str:
+        return f"{self.prefix}:outbox:{user_id}:{part}"
+
+    # ---- database (blocking, run in a thread) ----
+
+    def _insert(self, user_id: str, entry: Dict, title: str, message: str, notification_type: str) -> int:
+        """Store the notification under the user's next sequence number."""
+        with self.session_factory() as db:
+            for attempt in range(5):
+                seq = db.query(func.coalesce(func.max(Notification.seq), 0)).filter(
+                    Notification.user_id == uuid.UUID(str(user_id))
+                ).scalar() + 1
+                db.add(Notification(
+                    user_id=uuid.UUID(str(user_id)),
+                    seq=seq,
+                    title=title,
+                    message=message,
+                    type=notification_type,
+                    data={'event': entry['event'], 'payload': entry['data']},
+                ))
+                try:
+                    db.commit()
+                    return seq
+                except IntegrityError:
+                    # Another worker took this seq (unique user_id, seq); try the next one
+                    db.rollback()
+            raise RuntimeError(f"Could not allocate a notification sequence number for user {user_id}")
+
+    def _load_latest(self, user_id: str) -> List[Dict]:
+        """The user's newest buffer_size entries, oldest first."""
+        with self.session_factory() as db:
+            rows = db.query(Notification.seq, Notification.data).filter(
+                Notification.user_id == uuid.UUID(str(user_id)),
+                Notification.seq.isnot(None),
+            ).order_by(Notification.seq.desc()).limit(self.buffer_size).all()
+        return [
+            {'id': seq, 'event': (data or {}).get('event', 'notification'), 'data': (data or {}).get('payload', {})}
+            for seq, data in reversed(rows)
+        ]
+
+    # ---- public API ----
+
+    async def append(self, user_id: str, event: str, data: Dict, title: str, message: str, notification_type: str) -> Dict:
+        """Durably record an event for user_id. Returns the entry, whose 'id' is its cursor value."""
+        entry = {'event': event, 'data': data}
+        entry['id'] = await asyncio.to_thread(self._insert, user_id, entry, title, message, notification_type)
+
+        client = self.pool.client()
+        if client is not None:
+            try:
+                await self._push(client, user_id, entry)
+            except RedisError as e:
+                self.pool.mark_down(e)
+        return entry
+
+    async def _push(self, client, user_id: str, entry: Dict):
+        buffer_key = self._key(user_id, "buffer")
+        loaded_key = self._key(user_id, "loaded")
+        async with client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    # Only extend a buffer that was loaded from the database;
+                    # otherwise the next replay loads it, including this entry.
+                    # The version bump makes a refill that read the database
+                    # before this entry was committed give up.
+                    await pipe.watch(loaded_key)
+                    loaded = await pipe.exists(loaded_key)
+                    pipe.multi()
+                    pipe.incr(self._key(user_id, "version"))
+                    pipe.expire(self._key(user_id, "version"), self.ttl)
+                    if loaded:
+                        pipe.rpush(buffer_key, json.dumps(entry))
+                        pipe.ltrim(buffer_key, -self.buffer_size, -1)
+                        pipe.expire(buffer_key, self.ttl)
+                        pipe.expire(loaded_key, self.ttl)
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    async def ack(self, user_id: str, cursor: int):
+        """Remember the newest entry the user has seen, for connects that send no cursor."""
+        client = self.pool.client()
+        if client is None:
+            return
+        try:
+            await client.set(self._key(user_id, "cursor"), int(cursor), ex=self.ttl)
+        except RedisError as e:
+            self.pool.mark_down(e)
+
+    async def replay(self, user_id: str, cursor: Optional[int] = None) -> Tuple[List[Dict], int, bool]:
+        """Entries newer than cursor, oldest first. Returns (entries, latest id, truncated)."""
+        buffered = None
+        stored_cursor = None
+        version = None
+        client = self.pool.client()
+        if client is not None:
+            try:
+                # Everything the replay needs in one round trip
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.exists(self._key(user_id, "loaded"))
+                    pipe.lrange(self._key(user_id, "buffer"), 0, -1)
+                    pipe.get(self._key(user_id, "cursor"))
+                    pipe.get(self._key(user_id, "version"))
+                    loaded, raw, stored_cursor, version = await pipe.execute()
+                if loaded:
+                    buffered = [json.loads(item) for item in raw]
+            except RedisError as e:
+                self.pool.mark_down(e)
+                client = None
+
+        if buffered is None:
+            buffered = await asyncio.to_thread(self._load_latest, user_id)
+            if client is not None:
+                await self._refill(client, user_id, buffered, version)
+
+        if cursor is None:
+            cursor = int(stored_cursor or 0)
+        # A push racing with a refill can buffer an entry twice
+        buffered = sorted({entry['id']: entry for entry in buffered}.values(), key=lambda entry: entry['id'])
+        latest = buffered[-1]['id'] if buffered else 0
+        entries = [entry for entry in buffered if entry['id'] > cursor]
+        # Sequence numbers start at 1 with no gaps, so a buffer starting past
+        # cursor + 1 means entries the client has not seen were trimmed away
+        truncated = bool(buffered) and buffered[0]['id'] > cursor + 1
+        return entries, latest, truncated
+
+    async def _refill(self, client, user_id: str, entries: List[Dict], version: Optional[str]):
+        buffer_key = self._key(user_id, "buffer")
+        version_key = self._key(user_id, "version")
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                # If an entry was appended since the version was read, the
+                # database rows may predate it; skip and let the next connect retry
+                await pipe.watch(version_key)
+                if await pipe.get(version_key) != version:
+                    return
+                pipe.multi()
+                pipe.delete(buffer_key)
+                if entries:
+                    pipe.rpush(buffer_key, *(json.dumps(entry) for entry in entries))
+                    pipe.expire(buffer_key, self.ttl)
+                pipe.set(self._key(user_id, "loaded"), 1, ex=self.ttl)
+                await pipe.execute()
+        except WatchError:
+            pass
+        except RedisError as e:
+            self.pool.mark_down(e)
@@ -0,0 +1,354 @@
+"""Asynchronous SMS delivery across several providers.
+
+Providers are tried in order. If the current one has not answered within
+hedge_after seconds, or has failed, the next one is started while the first
+keeps running, and the first success wins. The losers are cancelled, so in
+the worst case a user receives the same OTP twice, which is preferable to
+a sign-up stuck behind a slow gateway.
+
+Each provider has a circuit breaker: after failure_threshold consecutive
+failures it is skipped for reset_timeout seconds and then a single probe
+request decides whether it is healthy again. All providers share one
+pooled httpx.AsyncClient, so TLS connections to the gateways are reused.
+"""
+import asyncio
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+OTP_MESSAGE = "Bouncer App OTP: {otp}. Valid for 10 minutes. Do not share this code."
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if self._clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def available(self) -> bool:
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self._probing)
+
+    def allow(self) -> bool:
+        """Claim permission to send. In half-open state only one probe is let through."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = self._clock()
+        self._probing = False
+
+    def abandon(self):
+        """The request was cancelled before it produced a verdict."""
+        self._probing = False
+
+
+class ProviderStats:
+    """Request counters and a rolling latency window for one provider."""
+
+    def __init__(self, window: int = 500):
+        self.sent = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.last_error: Optional[str] = None
+        self._latencies = deque(maxlen=window)
+
+    def record(self, seconds: float, success: bool, error: Optional[str] = None):
+        self._latencies.append(seconds)
+        if success:
+            self.sent += 1
+        else:
+            self.failed += 1
+            self.last_error = error
+
+    def snapshot(self) -> Dict[str, object]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "last_error": self.last_error,
+            "latency_ms": {"p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
+
+
+class SmsProvider(ABC):
+    name = "provider"
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def send(self, client: httpx.AsyncClient, phone_number: str, otp: str) -> dict:
+        """Send otp and return {"success": bool, "provider": name, ...} like the original helpers."""
+
+
+class TwilioProvider(SmsProvider):
+    name = "twilio"
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str, api_base: str = "https://api.twilio.com"):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.api_base = api_base.rstrip("/")
+
+    @property
+    def configured(self) -> bool:
+        return all([self.account_sid, self.auth_token, self.from_number])
+
+    async def send(self, client: httpx.AsyncClient, phone_number: str, otp: str) -> dict:
+        print(f"[TWILIO] Attempting to send SMS to +{phone_number}")
+
+        # Add country code if not present
+        if not phone_number.startswith('+'):
+            phone_number = '+91' + phone_number  # Default to India
+
+        response = await client.post(
+            f"{self.api_base}/2010-04-01/Accounts/{self.account_sid}/Messages.json",
+            data={"To": phone_number, "From": self.from_number, "Body": OTP_MESSAGE.format(otp=otp)},
+            auth=(self.account_sid, self.auth_token),
+        )
+        response_data = response.json()
+
+        if response.status_code in (200, 201):
+            success_msg = f"SMS sent successfully via Twilio. SID: {response_data.get('sid')}"
+            print(f"[TWILIO SUCCESS] {success_msg}")
+            return {"success": True, "message": success_msg, "sid": response_data.get("sid"), "provider": self.name}
+
+        error_msg = f"Twilio API error: {response_data.get('message', response.status_code)}"
+        print(f"[TWILIO ERROR] {error_msg}")
+        return {"success": False, "error": error_msg, "code": response_data.get("code"), "provider": self.name}
+
+
+class Fast2SmsProvider(SmsProvider):
+    name = "fast2sms"
+
+    def __init__(self, api_key: str, sender_id: str = "FSTSMS", url: str = "https://www.fast2sms.com/dev/bulkV2"):
+        self.api_key = api_key
+        self.sender_id = sender_id
+        self.url = url
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    async def send(self, client: httpx.AsyncClient, phone_number: str, otp: str) -> dict:
+        print(f"[SEARCH] [FAST2SMS] Attempting to send SMS to {phone_number}")
+
+        payload = {
+            "authorization": self.api_key,
+            "sender_id": self.sender_id,
+            "message": f"[LOCK] {OTP_MESSAGE.format(otp=otp)}",
+            "language": "english",
+            "route": "v3",
+            "numbers": phone_number,
+        }
+        response = await client.post(self.url, data=payload)
+        response_data = response.json()
+
+        if response.status_code == 200 and response_data.get("return"):
+            success_msg = f"SMS sent successfully via Fast2SMS. Message ID: {response_data.get('message', 'N/A')}"
+            print(f"[SUCCESS] [FAST2SMS] {success_msg}")
+            return {"success": True, "message": success_msg, "response": response_data, "provider": self.name}
+
+        error_msg = response_data.get("message", "Fast2SMS API error")
+        print(f"[ERROR] [FAST2SMS] {error_msg}")
+        return {"success": False, "error": error_msg, "response": response_data, "provider": self.name}
+
+
+class SmsDispatcher:
+    """Hedged, circuit-broken delivery over an ordered list of providers."""
+
+    def __init__(
+        self,
+        providers: List[SmsProvider],
+        hedge_after: float = 2.0,
+        timeout: float = 10.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_connections: int = 20,
+    ):
+        self.providers = providers
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.breakers = {p.name: CircuitBreaker(failure_threshold, reset_timeout) for p in providers}
+        self.stats = {p.name: ProviderStats() for p in providers}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def _attempt(self, provider: SmsProvider, phone_number: str, otp: str) -> dict:
+        breaker = self.breakers[provider.name]
+        stats = self.stats[provider.name]
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(provider.send(self.client, phone_number, otp), self.timeout)
+        except asyncio.CancelledError:
+            breaker.abandon()
+            stats.cancelled += 1
+            raise
+        except asyncio.TimeoutError:
+            result = {"success": False, "error": f"{provider.name} timed out after {self.timeout}s", "provider": provider.name}
+        except (httpx.HTTPError, ValueError) as e:
+            result = {"success": False, "error": f"{provider.name} network error: {str(e)}", "provider": provider.name}
+        except Exception as e:
+            result = {"success": False, "error": f"Unexpected {provider.name} error: {str(e)}", "provider": provider.name}
+
+        stats.record(time.perf_counter() - started, result["success"], result.get("error"))
+        if result["success"]:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+            print(f"[SMS ERROR] {result['error']}")
+        return result
+
+    async def send(self, phone_number: str, otp: str) -> dict:
+        errors: Dict[str, str] = {}
+        queue = []
+        for provider in self.providers:
+            if not provider.configured:
+                errors[provider.name] = f"{provider.name} is not configured"
+            elif not self.breakers[provider.name].available():
+                errors[provider.name] = f"{provider.name} circuit open"
+            else:
+                queue.append(provider)
+
+        running: Dict[asyncio.Task, SmsProvider] = {}
+
+        def launch_next() -> bool:
+            while queue:
+                provider = queue.pop(0)
+                if self.breakers[provider.name].allow():
+                    if running:
+                        print(f"[SMS] Hedging with {provider.name}")
+                    running[asyncio.create_task(self._attempt(provider, phone_number, otp))] = provider
+                    return True
+                errors[provider.name] = f"{provider.name} circuit open"
+            return False
+
+        launch_next()
+        try:
+            while running:
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=self.hedge_after if queue else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Latency budget spent, start the next provider alongside
+                    launch_next()
+                    continue
+
+                for task in done:
+                    provider = running.pop(task)
+                    result = task.result()
+                    if result["success"]:
+                        return result
+                    errors[provider.name] = result.get("error")
+
+                # Something failed; fall back to the next provider right away
+                launch_next()
+        finally:
+            for task in running:
+                task.cancel()
+
+        # All providers failed
+        error_msg = "All SMS providers failed"
+        print(f"[SMS ERROR] {error_msg}")
+        failure = {"success": False, "error": error_msg, "provider": "none"}
+        for name, error in errors.items():
+            failure[f"{name}_error"] = error
+        return failure
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "hedge_after_seconds": self.hedge_after,
+            "providers": {
+                p.name: {
+                    "configured": p.configured,
+                    "circuit": self.breakers[p.name].state,
+                    "consecutive_failures": self.breakers[p.name].failures,
+                    **self.stats[p.name].snapshot(),
+                }
+                for p in self.providers
+            },
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_sms_dispatcher() -> SmsDispatcher:
+    """Twilio first, then Fast2SMS, configured from the environment.
+
+    TWILIO_API_BASE and FAST2SMS_API_URL override the gateway endpoints,
+    e.g. to point at fake_sms_provider.py during testing.
+    """
+    providers = [
+        TwilioProvider(
+            os.getenv("TWILIO_ACCOUNT_SID", ""),
+            os.getenv("TWILIO_AUTH_TOKEN", ""),
+            os.getenv("TWILIO_FROM_NUMBER", ""),
+            api_base=os.getenv("TWILIO_API_BASE", "https://api.twilio.com"),
+        ),
+        Fast2SmsProvider(
+            os.getenv("FAST2SMS_API_KEY", ""),
+            os.getenv("FAST2SMS_SENDER_ID", "FSTSMS"),
+            url=os.getenv("FAST2SMS_API_URL", "https://www.fast2sms.com/dev/bulkV2"),
+        ),
+    ]
+    return SmsDispatcher(
+        providers,
+        hedge_after=float(os.getenv("SMS_HEDGE_AFTER_SECONDS", "2.0")),
+        timeout=float(os.getenv("SMS_TIMEOUT_SECONDS", "10")),
+        failure_threshold=int(os.getenv("SMS_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("SMS_BREAKER_RESET_SECONDS", "30")),
+    )
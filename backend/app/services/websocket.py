@@ -1,73 +1,322 @@
 import socketio
-from typing import Dict, List
+from typing import Dict, List, Optional, Set
 import json
-import redis
+import os
+import socket
+import time
+import uuid
+import asyncio
+from datetime import datetime
+from redis.exceptions import RedisError, WatchError
 from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.redis_pool import RedisPool
 from app.core.security import verify_token
+from app.services.emit_scheduler import EmitScheduler
+from app.services.notification_outbox import NotificationOutbox
 import logging
 
 logger = logging.getLogger(__name__)
 
+def create_client_manager() -> Optional[socketio.AsyncManager]:
+    """Client manager for the Socket.IO server.
+
+    With SOCKETIO_MESSAGE_QUEUE set, every emit is also published on a Redis
+    channel and each worker delivers it to its own sockets in the target
+    room, so several uvicorn workers behave like one server. Without it,
+    emits only reach sockets connected to the emitting process.
+    """
+    if not settings.SOCKETIO_MESSAGE_QUEUE:
+        return None
+    return socketio.AsyncRedisManager(settings.SOCKETIO_MESSAGE_QUEUE, channel=settings.SOCKETIO_CHANNEL)
+
 # Create Socket.IO server
 sio = socketio.AsyncServer(
     cors_allowed_origins=settings.ALLOWED_HOSTS,
-    async_mode='asgi'
+    async_mode='asgi',
+    client_manager=create_client_manager()
 )
 
-# Redis client for session storage and pub/sub
-redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+# Helpers below emit through the scheduler, which coalesces events per room
+# into batch frames (see app/services/emit_scheduler.py). Replies to a single
+# sid still use sio.emit directly.
+emitter = EmitScheduler(
+    sio,
+    window=settings.SOCKETIO_EMIT_WINDOW_MS / 1000,
+    max_batch=settings.SOCKETIO_EMIT_MAX_BATCH,
+    max_pending=settings.SOCKETIO_EMIT_MAX_PENDING,
+    slow_client_packets=settings.SOCKETIO_SLOW_CLIENT_PACKETS,
+)
+
+def rooms_for_role(user_id: str, user_role: str) -> List[str]:
+    """Rooms a user joins on connect: a personal room plus role-based rooms."""
+    rooms = [f"user_{user_id}"]
+    if user_role == 'admin':
+        rooms.extend(['admin_room', 'all_bookings', 'all_notifications'])
+    elif user_role == 'bouncer':
+        rooms.extend(['bouncer_room', 'booking_requests'])
+    elif user_role == 'user':
+        rooms.append('user_room')
+    return rooms
 
 # In-memory storage for active connections (room management)
 class ConnectionManager:
+    """Connections of this process only. Used when running a single worker.
+
+    Every operation touches only the sid's own entries: a user's sockets are
+    a set, and each of the user's rooms carries a count of the sockets that
+    joined it, so a connect or disconnect costs O(rooms per socket) however
+    many sockets are open. Entries are dropped as soon as their count hits
+    zero, so memory is proportional to the live connections.
+    """
+
     def __init__(self):
-        self.active_connections: Dict[str, Dict] = {}  # sid -> user_info
-        self.user_rooms: Dict[str, List[str]] = {}     # user_id -> [room_names]
+        self.active_connections: Dict[str, Dict] = {}        # sid -> user_info
+        self.user_sids: Dict[str, Set[str]] = {}             # user_id -> {sids}
+        self.user_rooms: Dict[str, Dict[str, int]] = {}      # user_id -> {room_name: sockets in it}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
 
-    def add_connection(self, sid: str, user_id: str, user_role: str):
+    async def add_connection(self, sid: str, user_id: str, user_role: str):
         """Add a new connection."""
+        if sid in self.active_connections:
+            await self.remove_connection(sid)
+
+        rooms = rooms_for_role(user_id, user_role)
         self.active_connections[sid] = {
             'user_id': user_id,
-            'user_role': user_role
+            'user_role': user_role,
+            'rooms': rooms
         }
+        self.user_sids.setdefault(user_id, set()).add(sid)
 
-        if user_id not in self.user_rooms:
-            self.user_rooms[user_id] = []
-
-        # Join user to their personal room
-        self.user_rooms[user_id].append(f"user_{user_id}")
-
-        # Join role-based rooms
-        if user_role == 'admin':
-            self.user_rooms[user_id].extend(['admin_room', 'all_bookings', 'all_notifications'])
-        elif user_role == 'bouncer':
-            self.user_rooms[user_id].extend(['bouncer_room', 'booking_requests'])
-        elif user_role == 'user':
-            self.user_rooms[user_id].append('user_room')
+        room_counts = self.user_rooms.setdefault(user_id, {})
+        for room in rooms:
+            room_counts[room] = room_counts.get(room, 0) + 1
 
-    def remove_connection(self, sid: str):
+    async def remove_connection(self, sid: str):
         """Remove a connection."""
-        if sid in self.active_connections:
-            user_id = self.active_connections[sid]['user_id']
-            del self.active_connections[sid]
+        conn = self.active_connections.pop(sid, None)
+        if conn is None:
+            return
+        user_id = conn['user_id']
+
+        sids = self.user_sids[user_id]
+        sids.discard(sid)
+        if not sids:
+            del self.user_sids[user_id]
+
+        room_counts = self.user_rooms[user_id]
+        for room in conn['rooms']:
+            room_counts[room] -= 1
+            if not room_counts[room]:
+                del room_counts[room]
+        if not room_counts:
+            del self.user_rooms[user_id]
+
+    async def get_user_rooms(self, user_id: str) -> List[str]:
+        """Get rooms for a user."""
+        return list(self.user_rooms.get(user_id, ()))
 
-            # Check if user has other connections
-            user_still_connected = any(
-                conn['user_id'] == user_id
-                for conn in self.active_connections.values()
-            )
+    async def get_connection_info(self, sid: str) -> Dict:
+        """Get connection info for a session."""
+        return self.active_connections.get(sid, {})
 
-            if not user_still_connected and user_id in self.user_rooms:
-                del self.user_rooms[user_id]
+    async def is_user_connected(self, user_id: str) -> bool:
+        """True if the user has at least one open socket."""
+        return user_id in self.user_sids
+
+class RedisConnectionManager:
+    """Connections of every worker, kept in Redis.
+
+    Keys (all under `prefix`):
+        conn:<sid>            hash of user_id, user_role, worker
+        user:<user_id>:sids   set of the user's open sids, on any worker
+        user:<user_id>:rooms  set of rooms the user joined on connect
+        worker:<worker_id>    set of sids connected to that worker
+        workers               hash of worker_id -> last heartbeat (unix time)
+
+    Each worker refreshes its heartbeat every `heartbeat_interval` seconds.
+    A worker that misses three heartbeats (crashed, killed) has its
+    connections removed by whichever worker notices first, so the registry
+    does not keep users "online" forever.
+
+    This worker's own connections are mirrored in an in-process
+    ConnectionManager. While Redis is unreachable, lookups are answered
+    from it (covering this worker only), and on the first heartbeat after
+    Redis comes back the worker's entries are re-registered.
+    """
+
+    def __init__(self, pool: RedisPool, prefix: str = "sio", worker_id: Optional[str] = None, heartbeat_interval: float = 10.0):
+        self.pool = pool
+        self.prefix = prefix
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.heartbeat_interval = heartbeat_interval
+        self.local = ConnectionManager()
+        self._synced = True
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix,) + parts)
+
+    async def _call(self, operation, fallback=None):
+        """Run operation(client) against Redis; on failure return fallback and resync later."""
+        client = self.pool.client()
+        if client is not None:
+            try:
+                return await operation(client)
+            except RedisError as e:
+                self.pool.mark_down(e)
+        self._synced = False
+        return fallback
+
+    async def start(self):
+        await self._call(self._heartbeat)
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        await self._call(lambda client: self._forget_worker(client, self.worker_id))
+
+    async def _heartbeat(self, client):
+        await client.hset(self._key("workers"), self.worker_id, time.time())
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            synced = self._synced
+            self._synced = True
+            await self._call(self._heartbeat)
+            if not synced:
+                await self._call(self._resync)
+            await self._call(self.prune_dead_workers)
+
+    async def _resync(self, client):
+        """Make Redis match this worker's local connections after an outage."""
+        registered = await client.smembers(self._key("worker", self.worker_id))
+        for sid in registered - self.local.active_connections.keys():
+            await self._remove(client, sid)
+        for sid, conn in list(self.local.active_connections.items()):
+            await self._add(client, sid, conn['user_id'], conn['user_role'])
+        logger.info(f"Re-registered {len(self.local.active_connections)} connections of worker {self.worker_id}")
+
+    async def prune_dead_workers(self, client) -> int:
+        """Drop the connections of workers whose heartbeat stopped. Returns workers pruned."""
+        deadline = time.time() - 3 * self.heartbeat_interval
+        workers = await client.hgetall(self._key("workers"))
+        pruned = 0
+        for worker_id, last_seen in workers.items():
+            if worker_id != self.worker_id and float(last_seen) < deadline:
+                await self._forget_worker(client, worker_id)
+                logger.info(f"Removed connections of dead worker {worker_id}")
+                pruned += 1
+        return pruned
+
+    async def _forget_worker(self, client, worker_id: str):
+        for sid in await client.smembers(self._key("worker", worker_id)):
+            await self._remove(client, sid)
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key("worker", worker_id))
+            pipe.hdel(self._key("workers"), worker_id)
+            await pipe.execute()
+
+    async def _add(self, client, sid: str, user_id: str, user_role: str):
+        # One round trip for all four keys
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key("conn", sid), mapping={
+                'user_id': user_id,
+                'user_role': user_role,
+                'worker': self.worker_id
+            })
+            pipe.sadd(self._key("user", user_id, "sids"), sid)
+            pipe.sadd(self._key("user", user_id, "rooms"), *rooms_for_role(user_id, user_role))
+            pipe.sadd(self._key("worker", self.worker_id), sid)
+            await pipe.execute()
+
+    async def _remove(self, client, sid: str):
+        conn_key = self._key("conn", sid)
+        user_id, worker_id = await client.hmget(conn_key, 'user_id', 'worker')
+        if user_id is None:
+            return
+        sids_key = self._key("user", user_id, "sids")
+
+        async with client.pipeline(transaction=True) as pipe:
+            # WATCH makes the "was this the last socket" check and the room
+            # cleanup atomic with respect to a reconnect on another worker
+            while True:
+                try:
+                    await pipe.watch(sids_key)
+                    remaining = await pipe.scard(sids_key)
+                    last = remaining == 0 or (remaining == 1 and await pipe.sismember(sids_key, sid))
+                    pipe.multi()
+                    pipe.delete(conn_key)
+                    pipe.srem(sids_key, sid)
+                    pipe.srem(self._key("worker", worker_id), sid)
+                    if last:
+                        pipe.delete(self._key("user", user_id, "rooms"))
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    async def add_connection(self, sid: str, user_id: str, user_role: str):
+        """Add a new connection."""
+        await self.local.add_connection(sid, user_id, user_role)
+        await self._call(lambda client: self._add(client, sid, user_id, user_role))
+
+    async def remove_connection(self, sid: str):
+        """Remove a connection, and the user's rooms once their last socket is gone."""
+        await self.local.remove_connection(sid)
+        await self._call(lambda client: self._remove(client, sid))
 
-    def get_user_rooms(self, user_id: str) -> List[str]:
+    async def get_user_rooms(self, user_id: str) -> List[str]:
         """Get rooms for a user."""
-        return self.user_rooms.get(user_id, [])
+        rooms = await self._call(lambda client: client.smembers(self._key("user", user_id, "rooms")))
+        if rooms is None:
+            return await self.local.get_user_rooms(user_id)
+        return sorted(rooms)
 
-    def get_connection_info(self, sid: str) -> Dict:
+    async def get_connection_info(self, sid: str) -> Dict:
         """Get connection info for a session."""
-        return self.active_connections.get(sid, {})
-
-manager = ConnectionManager()
+        info = await self._call(lambda client: client.hgetall(self._key("conn", sid)))
+        if info is None:
+            return await self.local.get_connection_info(sid)
+        return info
+
+    async def is_user_connected(self, user_id: str) -> bool:
+        """True if the user has at least one open socket on any worker."""
+        count = await self._call(lambda client: client.scard(self._key("user", user_id, "sids")))
+        if count is None:
+            return await self.local.is_user_connected(user_id)
+        return count > 0
+
+# Shared by the connection registry and the notification outbox. Nothing
+# connects until first use, and if Redis is down the realtime service
+# keeps working on in-process state.
+realtime_redis = RedisPool(settings.SOCKETIO_MESSAGE_QUEUE or settings.REDIS_URL)
+
+def create_connection_manager():
+    """Shared registry in Redis when fanning out across workers, otherwise in-process."""
+    if settings.SOCKETIO_MESSAGE_QUEUE:
+        return RedisConnectionManager(realtime_redis, prefix=settings.SOCKETIO_CHANNEL)
+    return ConnectionManager()
+
+manager = create_connection_manager()
+
+# Notifications addressed to one user are stored durably and replayed on
+# connect from the client's last-seen cursor (app/services/notification_outbox.py)
+outbox = NotificationOutbox(
+    realtime_redis,
+    SessionLocal,
+    prefix=settings.SOCKETIO_CHANNEL,
+    buffer_size=settings.NOTIFICATION_BUFFER_SIZE
+)
 
 @sio.event
 async def connect(sid, environ, auth):
@@ -89,10 +338,10 @@ async def connect(sid, environ, auth):
             return False
 
         # Add connection to manager
-        manager.add_connection(sid, user_id, user_role)
+        await manager.add_connection(sid, user_id, user_role)
 
         # Join user to their rooms
-        rooms = manager.get_user_rooms(user_id)
+        rooms = await manager.get_user_rooms(user_id)
         for room in rooms:
             await sio.enter_room(sid, room)
 
@@ -105,8 +354,8 @@ async def connect(sid, environ, auth):
             'rooms': rooms
         }, room=sid)
 
-        # Notify about pending notifications
-        await send_pending_notifications(user_id)
+        # Replay what the user missed since the last notification they saw
+        await send_pending_notifications(user_id, sid, auth.get('last_notification_id'))
 
         return True
 
@@ -117,18 +366,18 @@ async def connect(sid, environ, auth):
 @sio.event
 async def disconnect(sid):
     """Handle client disconnection."""
-    conn_info = manager.get_connection_info(sid)
+    conn_info = await manager.get_connection_info(sid)
     if conn_info:
         user_id = conn_info.get('user_id')
         logger.info(f"User {user_id} disconnected: {sid}")
 
-    manager.remove_connection(sid)
+    await manager.remove_connection(sid)
 
 @sio.event
 async def join_booking_room(sid, data):
     """Join a specific booking room for real-time updates."""
     try:
-        conn_info = manager.get_connection_info(sid)
+        conn_info = await manager.get_connection_info(sid)
         if not conn_info:
             return {'error': 'Not authenticated'}
 
@@ -162,8 +411,14 @@ async def leave_booking_room(sid, data):
 
 # Helper functions for emitting events
 
-async def notify_booking_status_change(booking_id: str, old_status: str, new_status: str, changed_by: str):
-    """Notify about booking status changes."""
+async def notify_booking_status_change(booking_id: str, old_status: Optional[str], new_status: str, changed_by: str, change: Optional[Dict] = None):
+    """Notify about booking status changes.
+
+    `change` is the booking change feed event (app/services/booking_feed.py)
+    when there is one. Its id is sent as change_id, which clients can resume
+    the feed from after a reconnect. The event also goes to every bouncer
+    and to the customer, since their dashboard lists change with it.
+    """
     event_data = {
         'booking_id': booking_id,
         'old_status': old_status,
@@ -172,11 +427,18 @@ async def notify_booking_status_change(booking_id: str, old_status: str, new_sta
         'timestamp': str(datetime.utcnow())
     }
 
-    # Notify specific booking room
-    await sio.emit('booking_status_changed', event_data, room=f"booking_{booking_id}")
+    # Booking room and admin room; one emit so a socket in both gets it once
+    rooms = [f"booking_{booking_id}", 'admin_room']
+    if change is not None:
+        event_data['change_id'] = change['id']
+        event_data['kind'] = change['kind']
+        event_data['booking'] = change['booking']
+        rooms.append('booking_requests')
+        for user_id in (change['user_id'], change['bouncer_user_id']):
+            if user_id:
+                rooms.append(f"user_{user_id}")
 
-    # Notify admin room
-    await sio.emit('booking_status_changed', event_data, room='admin_room')
+    await emitter.emit('booking_status_changed', event_data, room=rooms)
 
 async def notify_new_booking_request(booking_id: str, bouncer_id: str, booking_data: dict):
     """Notify bouncer about new booking request."""
@@ -189,11 +451,14 @@ async def notify_new_booking_request(booking_id: str, bouncer_id: str, booking_d
         'timestamp': str(datetime.utcnow())
     }
 
-    # Notify specific bouncer
-    await sio.emit('new_booking_request', event_data, room=f"user_{bouncer_id}")
+    # Notify specific bouncer (kept for replay if they are offline)
+    await deliver_to_user(
+        bouncer_id, 'new_booking_request', event_data,
+        'New booking request', f"New booking request for {event_data['event_name']}", 'booking'
+    )
 
     # Notify all bouncers room
-    await sio.emit('new_booking_request', event_data, room='bouncer_room')
+    await emitter.emit('new_booking_request', event_data, room='bouncer_room')
 
 async def notify_new_message(conversation_id: str, sender_id: str, sender_name: str, message: str, recipients: List[str]):
     """Notify about new messages."""
@@ -205,9 +470,8 @@ async def notify_new_message(conversation_id: str, sender_id: str, sender_name:
         'timestamp': str(datetime.utcnow())
     }
 
-    # Notify all recipients
-    for recipient_id in recipients:
-        await sio.emit('new_message', event_data, room=f"user_{recipient_id}")
+    # Notify all recipients with one emit
+    await emitter.emit('new_message', event_data, room=[f"user_{recipient_id}" for recipient_id in recipients])
 
 async def send_notification(user_id: str, title: str, message: str, notification_type: str, data: dict = None):
     """Send notification to a specific user."""
@@ -219,23 +483,54 @@ async def send_notification(user_id: str, title: str, message: str, notification
         'timestamp': str(datetime.utcnow())
     }
 
-    await sio.emit('notification', event_data, room=f"user_{user_id}")
+    await deliver_to_user(user_id, 'notification', event_data, title, message, notification_type)
 
-async def send_pending_notifications(user_id: str):
-    """Send any pending notifications for a user."""
+async def deliver_to_user(user_id: str, event: str, event_data: dict, title: str, message: str, notification_type: str):
+    """Store an event in the user's outbox, then emit it to their sockets with its cursor id."""
     try:
-        # TODO: Fetch unread notifications from database
-        # This is a placeholder - implement actual database query
-        pass
+        entry = await outbox.append(user_id, event, event_data, title, message, notification_type)
+        event_data = dict(event_data, notification_id=entry['id'])
+    except Exception as e:
+        # Still deliver live; the user just cannot replay this one later
+        logger.error(f"Error storing {event} notification for user {user_id}: {str(e)}")
+
+    await emitter.emit(event, event_data, room=f"user_{user_id}")
+
+async def send_pending_notifications(user_id: str, sid: str, cursor: Optional[int] = None):
+    """Replay notifications newer than cursor to a newly connected socket, in one emit."""
+    try:
+        entries, latest, truncated = await outbox.replay(user_id, int(cursor) if cursor is not None else None)
+        if entries or truncated:
+            await sio.emit('pending_notifications', {
+                'notifications': entries,
+                'cursor': latest,
+                # More was missed than the outbox keeps: reload lists once
+                'truncated': truncated
+            }, room=sid)
     except Exception as e:
         logger.error(f"Error sending pending notifications: {str(e)}")
 
+@sio.event
+async def notifications_seen(sid, data):
+    """Client acknowledges every notification up to data['cursor']."""
+    try:
+        conn_info = await manager.get_connection_info(sid)
+        if not conn_info:
+            return {'error': 'Not authenticated'}
+
+        await outbox.ack(conn_info['user_id'], int(data['cursor']))
+        return {'success': True}
+
+    except Exception as e:
+        logger.error(f"Error saving notification cursor: {str(e)}")
+        return {'error': 'Failed to save cursor'}
+
 # Admin broadcast functions
 
 async def broadcast_to_role(role: str, event: str, data: dict):
     """Broadcast message to all users with a specific role."""
     room_name = f"{role}_room"
-    await sio.emit(event, data, room=room_name)
+    await emitter.emit(event, data, room=room_name)
 
 async def broadcast_system_maintenance(message: str, start_time: str, duration: int):
     """Broadcast system maintenance notification."""
@@ -247,4 +542,4 @@ async def broadcast_system_maintenance(message: str, start_time: str, duration:
     }
 
     # Broadcast to all connected users
-    await sio.emit('system_notification', event_data)
\ No newline at end of file
+    await emitter.emit('system_notification', event_data)
\ No newline at end of file
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Latency benchmark for simple_app under mixed read/write load.
+
+Seeds a throwaway copy of the SQLite database with bookings, then drives
+simple_app in-process (httpx ASGI transport, no network) with concurrent
+clients: list readers, dashboard readers, booking writers and a /health
+prober. Reports p50/p99 per endpoint. The /health numbers show how much
+database work is stalling the event loop.
+
+Usage:
+    python bench_async_db.py [--seconds 10] [--clients 32] [--seed 50000]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--db", default="test_bouncer.db", help="database to copy (default: test_bouncer.db)")
+parser.add_argument("--seconds", type=float, default=10.0, help="duration of the measured run")
+parser.add_argument("--clients", type=int, default=32, help="concurrent clients")
+parser.add_argument("--seed", type=int, default=50000, help="bookings to insert before the run")
+args = parser.parse_args()
+
+workdir = tempfile.mkdtemp(prefix="bench_db_")
+db_path = os.path.join(workdir, "bench.db")
+shutil.copy(args.db, db_path)
+os.environ["SQLITE_DB_PATH"] = db_path
+
+import httpx  # noqa: E402
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import simple_app  # noqa: E402
+
+USER_ID = str(uuid.uuid4())
+BOUNCER_ID = str(uuid.uuid4())
+PROFILE_ID = str(uuid.uuid4())
+# Mostly settled history with a thin slice of open requests, spread across
+# many customers, so list responses stay small and the query work dominates
+STATUSES = ["completed"] * 60 + ["accepted"] * 30 + ["rejected"] * 5 + ["see_later", "cancelled"] * 2 + ["pending"]
+CUSTOMERS = 200
+
+
+def seed(path, count):
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO users (id, email, password_hash, first_name, last_name) VALUES (?, ?, '-', 'Bench', 'User')",
+        [(USER_ID, f"bench-{USER_ID}@example.com"), (BOUNCER_ID, f"bench-{BOUNCER_ID}@example.com")],
+    )
+    conn.execute(
+        "INSERT INTO service_profiles (id, user_id, profile_type, name) VALUES (?, ?, 'individual', 'Bench')",
+        (PROFILE_ID, BOUNCER_ID),
+    )
+    now = datetime.now()
+    rows = []
+    for i in range(count):
+        start = now - timedelta(hours=i)
+        rows.append((
+            str(uuid.uuid4()), f"bench-customer-{i % CUSTOMERS}", PROFILE_ID if i % 3 else "00000000-0000-0000-0000-000000000000",
+            f"Bench event {i}", "", "Bench hall", start.isoformat(), (start + timedelta(hours=4)).isoformat(),
+            25, 100, f"Book Type: {'group' if i % 4 == 0 else 'individual'}", STATUSES[i % len(STATUSES)],
+            start.isoformat(), start.isoformat(),
+        ))
+    conn.executemany("""
+        INSERT INTO bookings (
+            id, user_id, bouncer_id, event_name, event_description,
+            event_location_address, start_datetime, end_datetime,
+            hourly_rate, total_amount, special_requirements, status,
+            created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run():
+    token = simple_app.create_access_token({"sub": USER_ID, "email": f"bench-{USER_ID}@example.com"})
+    bouncer_token = simple_app.create_access_token({"sub": BOUNCER_ID, "email": f"bench-{BOUNCER_ID}@example.com"})
+    user_headers = {"Authorization": f"Bearer {token}"}
+    bouncer_headers = {"Authorization": f"Bearer {bouncer_token}"}
+    booking = {"eventName": "Bench", "location": "Hall", "date": "2026-01-01", "time": "20:00", "price": 25, "bookType": "individual"}
+
+    # (label, method, path, kwargs) - weighted towards reads like real traffic
+    mix = [
+        ("GET /api/bookings/pending", "GET", "/api/bookings/pending", {"headers": bouncer_headers}),
+        ("GET /api/bookings/pending", "GET", "/api/bookings/pending", {"headers": bouncer_headers}),
+        ("GET /api/bookings/user", "GET", "/api/bookings/user", {"headers": user_headers}),
+        ("GET /api/bouncer/dashboard/metrics", "GET", "/api/bouncer/dashboard/metrics", {"headers": bouncer_headers}),
+        ("POST /api/bookings/", "POST", "/api/bookings/", {"headers": user_headers, "json": booking}),
+    ]
+    latencies = {label: [] for label, *_ in mix}
+    latencies["GET /health"] = []
+    errors = 0
+    deadline = time.perf_counter() + args.seconds
+
+    transport = httpx.ASGITransport(app=simple_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                label, method, path, kwargs = mix[i % len(mix)]
+                i += 1
+                started = time.perf_counter()
+                response = await client.request(method, path, **kwargs)
+                latencies[label].append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        async def prober():
+            # Probes are due every 5 ms; latency is measured from when the
+            # probe was due, so time spent waiting for a blocked loop counts
+            due = time.perf_counter()
+            while due < deadline:
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                await client.get("/health")
+                latencies["GET /health"].append(time.perf_counter() - due)
+                due = max(due + 0.005, time.perf_counter())
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(prober(), *(worker(n) for n in range(args.clients)))
+
+    return latencies, errors
+
+
+def main():
+    seed(db_path, args.seed)
+    try:
+        latencies, errors = asyncio.run(run())
+    finally:
+        simple_app.db.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"{args.clients} clients, {args.seconds:.0f}s, {args.seed} seeded bookings")
+    print(f"{total} requests ({total / args.seconds:.0f} req/s), {errors} errors\n")
+    print(f"{'endpoint':40} {'count':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for label, samples in latencies.items():
+        if samples:
+            print(f"{label:40} {len(samples):7d} {percentile(samples, 50) * 1000:9.1f} {percentile(samples, 99) * 1000:9.1f}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
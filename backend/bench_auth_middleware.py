@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Requests/sec through the auth middleware stack, before and after.
+
+Builds the same small FastAPI app twice:
+
+  before   the previous pair of BaseHTTPMiddleware subclasses, one
+           verifying the token and one checking the route permission
+           (reproduced here, with the current route matcher so only the
+           middleware structure differs)
+  after    app.middleware.auth.AuthMiddleware, a single pure-ASGI layer
+
+Each app is driven in-process through its ASGI interface, with no sockets,
+so the figures are the cost of the stack itself. Two routes are measured:
+
+  /health                     exempt, no token
+  /api/bookings/{booking_id}  bearer token, route permission check, and the
+                              get_current_user dependency, as real routes use
+
+Usage:
+    python bench_auth_middleware.py [--requests 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import io
+import sys
+import time
+import uuid
+
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from app.core.security import create_access_token, verify_token
+from app.middleware.auth import AuthMiddleware, get_current_user
+from app.middleware.rbac import ROUTE_PERMISSIONS, RoutePermissionMatcher
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+# ---------------------------------------------------------------- previous stack
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in AuthMiddleware.EXEMPT_ROUTES or request.method == "OPTIONS":
+            return await call_next(request)
+        authorization = request.headers.get("Authorization")
+        if not authorization:
+            return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Authorization header missing"})
+        try:
+            scheme, token = authorization.split()
+            if scheme.lower() != "bearer":
+                raise ValueError("Invalid authentication scheme")
+            payload = verify_token(token, "access")
+            request.state.user_id = payload.get("sub")
+            request.state.user_email = payload.get("email")
+            request.state.user_role = payload.get("role")
+            request.state.permissions = payload.get("permissions", [])
+        except ValueError as e:
+            return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": str(e)})
+        except HTTPException as e:
+            return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+        return await call_next(request)
+
+
+class LegacyRBACMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self._matcher = RoutePermissionMatcher(ROUTE_PERMISSIONS)
+
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in AuthMiddleware.EXEMPT_ROUTES or request.method == "OPTIONS":
+            return await call_next(request)
+        user_permissions = getattr(request.state, 'permissions', [])
+        required_permission = self._matcher.required_permission(request.url.path, request.method)
+        if required_permission and required_permission not in user_permissions:
+            return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": "Insufficient permissions"})
+        request.state.required_permission = required_permission
+        return await call_next(request)
+
+
+# ---------------------------------------------------------------- apps
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/api/bookings/{booking_id}")
+    async def get_booking(booking_id: str, current_user: dict = Depends(get_current_user)):
+        return {"id": booking_id, "user_id": current_user["user_id"]}
+
+    if stack == "before":
+        # Auth must wrap RBAC so the permissions are set when RBAC runs
+        app.add_middleware(LegacyRBACMiddleware)
+        app.add_middleware(LegacyAuthMiddleware)
+    else:
+        app.add_middleware(AuthMiddleware)
+    return app
+
+
+async def call(app, path: str, headers) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": headers, "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+    }
+    status_code = 0
+    body_sent = False
+    response_done = asyncio.Event()
+
+    async def receive():
+        # Like a server: the body once, then block until the response is done
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            response_done.set()
+
+    await app(scope, receive, send)
+    return status_code
+
+
+async def measure(app, path: str, headers, requests: int, concurrency: int) -> float:
+    # Warm up (route compilation, token cache, LRU)
+    for _ in range(50):
+        code = await call(app, path, headers)
+    if code != 200:
+        raise RuntimeError(f"{path} returned {code}")
+
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await call(app, path, headers)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+
+async def run(args):
+    token = create_access_token({
+        "sub": str(uuid.uuid4()), "email": "bench@example.com", "role": "user",
+        "permissions": ["read_own_bookings"],
+    })
+    auth_headers = [(b"authorization", f"Bearer {token}".encode()), (b"host", b"localhost")]
+    routes = [
+        ("/health", [(b"host", b"localhost")]),
+        (f"/api/bookings/{uuid.uuid4()}", auth_headers),
+    ]
+
+    print(f"{'route':<28} {'before req/s':>14} {'after req/s':>14} {'speedup':>9}")
+    for path, headers in routes:
+        before = await measure(build_app("before"), path, headers, args.requests, args.concurrency)
+        after = await measure(build_app("after"), path, headers, args.requests, args.concurrency)
+        label = "/api/bookings/{booking_id}" if path.startswith("/api/bookings/") else path
+        print(f"{label:<28} {before:>14,.0f} {after:>14,.0f} {after / before:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per route and stack")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight at once")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("AUTH MIDDLEWARE STACK BENCHMARK")
+    print("=" * 70)
+    asyncio.run(run(args))
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Logins/sec benchmark for the bcrypt process pool.
+
+Measures password verification throughput when bcrypt runs inline on the
+event loop (the old behaviour) and on PasswordHasher pools of 1..N worker
+processes, along with the event-loop stall each variant causes.
+
+Usage:
+    python bench_password_hashing.py [--rounds 12] [--logins 64] [--max-workers 8]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from passlib.context import CryptContext
+
+from app.core.passwords import PasswordHasher
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost (default: 12)")
+parser.add_argument("--logins", type=int, default=64, help="concurrent logins per run")
+parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="largest pool size to try")
+args = parser.parse_args()
+
+PASSWORD = "Benchmark@123"
+
+
+async def loop_lag(stop: asyncio.Event) -> float:
+    """Worst delay seen by a 10 ms ticker, i.e. how long the loop was blocked."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - started - 0.01)
+    return worst
+
+
+async def measure(verify) -> tuple:
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    assert all(results)
+    return args.logins / elapsed, await lag
+
+
+async def main():
+    password_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds).hash(PASSWORD)
+    print(f"{args.logins} concurrent logins, bcrypt cost {args.rounds}, {os.cpu_count()} CPUs\n")
+    print(f"{'mode':22} {'logins/s':>10} {'max loop stall ms':>19}")
+
+    inline = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+
+    async def inline_verify():
+        return inline.verify(PASSWORD, password_hash)
+
+    rate, lag = await measure(inline_verify)
+    print(f"{'inline (event loop)':22} {rate:10.1f} {lag * 1000:19.1f}")
+
+    workers = 1
+    while workers <= args.max_workers:
+        hasher = PasswordHasher(rounds=args.rounds, workers=workers, max_pending=args.logins)
+        await hasher.start()
+        try:
+            rate, lag = await measure(lambda: hasher.verify(PASSWORD, password_hash))
+        finally:
+            hasher.shutdown()
+        print(f"{f'pool, {workers} worker(s)':22} {rate:10.1f} {lag * 1000:19.1f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for RBAC route-permission lookup.
+
+Builds request paths for every route in ROUTE_PERMISSIONS (app/middleware/rbac.py)
+with each method it declares, filling path parameters with UUIDs, numeric
+ids and slugs. A few paths that match no route (or the wrong method) are
+added too. Every lookup is checked against the previous implementation,
+which normalized the path with re.sub and then built and matched a regex
+for each pattern route, and is then timed for:
+
+  regex      the previous per-request normalize + regex scan
+  trie       RoutePermissionMatcher walking the trie on every call
+  trie+lru   the same with the per-path LRU, as used by the middleware
+
+Usage:
+    python bench_rbac_routes.py [--rounds 2000] [--ids 50]
+"""
+import argparse
+import io
+import re
+import sys
+import time
+import uuid
+
+from app.middleware.rbac import ROUTE_PERMISSIONS, RoutePermissionMatcher
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+ROUTES = ROUTE_PERMISSIONS
+
+
+# ---------------------------------------------------------------- previous implementation
+
+def legacy_normalize_path(path):
+    uuid_pattern = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+    normalized = re.sub(uuid_pattern, '{id}', path, flags=re.IGNORECASE)
+    id_patterns = [
+        (r'/\d+(?=/|$)', '/{id}'),
+        (r'/[^/]+(?=/|$)', '/{id}')
+    ]
+    for pattern, replacement in id_patterns:
+        if '{id}' not in normalized:
+            normalized = re.sub(pattern, replacement, normalized, count=1)
+    return normalized
+
+
+def legacy_required_permission(path, method):
+    if path in ROUTES:
+        return ROUTES[path].get(method)
+    normalized_path = legacy_normalize_path(path)
+    if normalized_path in ROUTES:
+        return ROUTES[normalized_path].get(method)
+    for route_pattern, methods in ROUTES.items():
+        if '{' in route_pattern:
+            regex_pattern = route_pattern.replace('{booking_id}', r'[^/]+')
+            regex_pattern = regex_pattern.replace('{user_id}', r'[^/]+')
+            regex_pattern = regex_pattern.replace('{id}', r'[^/]+')
+            regex_pattern = f"^{regex_pattern}$"
+            if re.match(regex_pattern, path):
+                return methods.get(method)
+    return None
+
+
+# ---------------------------------------------------------------- workload
+
+def build_requests(ids: int):
+    values = [str(uuid.uuid4()) for _ in range(ids)] + [str(n) for n in range(ids)] + ["pending", "see-later"]
+    requests = []
+    for pattern, methods in ROUTES.items():
+        fills = values if "{" in pattern else [None]
+        for value in fills:
+            path = re.sub(r"\{[^}]+\}", value, pattern) if value else pattern
+            for method in list(methods) + ["OPTIONS"]:
+                requests.append((path, method))
+    # Paths no route covers
+    for path in ("/api/bookings/", "/api/unknown", "/api/bookings/a/b/c", "/api/admin/users/x/y", "/health"):
+        requests.append((path, "GET"))
+    return requests
+
+
+def time_lookups(lookup, requests, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for path, method in requests:
+            lookup(path, method)
+    return (time.perf_counter() - started) / (rounds * len(requests))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000, help="passes over the request set per variant")
+    parser.add_argument("--ids", type=int, default=50, help="distinct UUID and numeric ids per pattern route")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("RBAC ROUTE PERMISSION LOOKUP BENCHMARK")
+    print("=" * 70)
+
+    matcher = RoutePermissionMatcher(ROUTES)
+    requests = build_requests(args.ids)
+    print(f"Routes:    {len(ROUTES)} ({sum('{' in p for p in ROUTES)} with parameters)")
+    print(f"Requests:  {len(requests)} distinct path/method pairs x {args.rounds} rounds")
+
+    mismatches = [
+        (path, method, legacy_required_permission(path, method), matcher.required_permission(path, method))
+        for path, method in requests
+        if legacy_required_permission(path, method) != matcher.required_permission(path, method)
+    ]
+    if mismatches:
+        for mismatch in mismatches[:10]:
+            print(f"[FAIL] {mismatch[1]} {mismatch[0]}: regex={mismatch[2]!r} trie={mismatch[3]!r}")
+        sys.exit(1)
+    print("[OK] Trie agrees with the regex implementation on every request")
+
+    def trie_uncached(path, method):
+        methods = matcher._match(path)
+        return methods.get(method) if methods else None
+
+    legacy_rounds = max(1, args.rounds // 10)
+    results = [
+        ("regex", time_lookups(legacy_required_permission, requests, legacy_rounds)),
+        ("trie", time_lookups(trie_uncached, requests, args.rounds)),
+        ("trie+lru", time_lookups(matcher.required_permission, requests, args.rounds)),
+    ]
+
+    print("-" * 70)
+    print(f"{'variant':<10} {'ns/lookup':>12} {'lookups/s':>14} {'speedup':>9}")
+    baseline = results[0][1]
+    for name, per_lookup in results:
+        print(f"{name:<10} {per_lookup * 1e9:>12.0f} {1 / per_lookup:>14,.0f} {baseline / per_lookup:>8.1f}x")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
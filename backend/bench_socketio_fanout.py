@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""Cross-worker Socket.IO fan-out benchmark.
+
+Starts a local Redis stand-in (fake_redis_server.py, or a real Redis with
+--redis-url) and N worker processes, each serving app.services.websocket
+on its own port the way separate uvicorn workers would, with a throwaway
+SQLite database for the notification outbox. Bouncer clients
+connect round-robin across the workers over plain WebSocket, then worker 0
+calls notify_new_booking_request repeatedly. Every client should receive
+every event through bouncer_room, whichever worker it is connected to.
+
+Reports delivery ratio, end-to-end latency (p50/p95/p99) and delivered
+events per second, plus the connection registry size in Redis before and
+after the clients disconnect. With --in-process the workers run without
+SOCKETIO_MESSAGE_QUEUE, which shows the old behaviour: only clients on
+worker 0 receive anything.
+
+Emits are coalesced per room into batch frames (app/services/emit_scheduler.py)
+over --emit-window-ms; the frames line shows how many Socket.IO frames
+carried the deliveries. --emit-window-ms 0 sends one frame per event.
+
+Usage:
+    python bench_socketio_fanout.py [--workers 4] [--clients 200] [--events 500] [--rate 200]
+                                    [--redis-url redis://...] [--in-process] [--emit-window-ms 20]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+JWT_SECRET = "bench-socketio-fanout-secret"
+TARGET_BOUNCER = "00000000-0000-0000-0000-00000000b0b0"
+
+
+# ---------------------------------------------------------------- worker
+
+def serve(port: int):
+    """Run one worker: the Socket.IO server plus a small endpoint that emits."""
+    import uvicorn
+    import socketio
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+
+    from app.services import websocket
+
+    control = FastAPI()
+
+    class EmitRequest(BaseModel):
+        count: int
+        rate: float = 0
+
+    async def emit_events(count: int, rate: float):
+        started = time.perf_counter()
+        for i in range(count):
+            if rate:
+                delay = started + i / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await websocket.notify_new_booking_request(f"bench-{i}", TARGET_BOUNCER, {
+                "user_first_name": "Bench",
+                "user_last_name": "User",
+                # Send time rides along in the payload; all processes share one clock
+                "event_name": repr(time.time()),
+            })
+
+    @control.post("/_emit")
+    async def emit(request: EmitRequest):
+        asyncio.create_task(emit_events(request.count, request.rate))
+        return {"scheduled": request.count}
+
+    @control.on_event("startup")
+    async def start_manager():
+        await websocket.manager.start()
+
+    @control.on_event("shutdown")
+    async def stop_manager():
+        await websocket.emitter.stop()
+        await websocket.manager.stop()
+
+    app = socketio.ASGIApp(websocket.sio, control)
+    uvicorn.run(app, host="127.0.0.1", port=port, ws="wsproto", log_level="warning")
+
+
+# ---------------------------------------------------------------- client
+
+class BenchClient:
+    """Minimal Socket.IO client (Engine.IO v4 over WebSocket) built on wsproto."""
+
+    def __init__(self, index: int, port: int, token: str, latencies: list):
+        self.index = index
+        self.port = port
+        self.token = token
+        self.latencies = latencies
+        self.received = 0
+        self.frames = 0
+        self.connected = asyncio.Event()
+        self.error = None
+        self.writer = None
+
+    async def run(self):
+        from wsproto import ConnectionType, WSConnection
+        from wsproto.events import AcceptConnection, CloseConnection, Ping, Request, TextMessage
+
+        reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self.ws = WSConnection(ConnectionType.CLIENT)
+        self.writer.write(self.ws.send(Request(host=f"127.0.0.1:{self.port}", target="/socket.io/?EIO=4&transport=websocket")))
+        parts = []
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                self.ws.receive_data(data)
+                for event in self.ws.events():
+                    if isinstance(event, TextMessage):
+                        parts.append(event.data)
+                        if event.message_finished:
+                            self.on_packet("".join(parts))
+                            parts = []
+                    elif isinstance(event, Ping):
+                        self.writer.write(self.ws.send(event.response()))
+                    elif isinstance(event, CloseConnection):
+                        return
+                    elif isinstance(event, AcceptConnection):
+                        pass
+                await self.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def send(self, packet: str):
+        from wsproto.events import TextMessage
+        self.writer.write(self.ws.send(TextMessage(data=packet)))
+
+    def on_packet(self, packet: str):
+        now = time.time()
+        if packet.startswith("0"):
+            # Engine.IO open: connect to the default namespace with our token
+            self.send("40" + json.dumps({"token": self.token}))
+        elif packet == "2":
+            self.send("3")
+        elif packet.startswith("40"):
+            self.connected.set()
+        elif packet.startswith("44"):
+            self.error = packet[2:]
+            self.connected.set()
+        elif packet.startswith("42"):
+            self.frames += 1
+            event, data = json.loads(packet[2:])
+            events = [(item["event"], item["data"]) for item in data["events"]] if event == "batch" else [(event, data)]
+            for event, data in events:
+                if event == "new_booking_request":
+                    self.received += 1
+                    self.latencies.append(now - float(data["event_name"]))
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+# ---------------------------------------------------------------- driver
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Nothing listening on port {port}")
+            await asyncio.sleep(0.1)
+
+
+async def registry_size(redis_url: str, channel: str) -> int:
+    from redis import asyncio as aioredis
+    client = aioredis.from_url(redis_url, decode_responses=True)
+    try:
+        return len(await client.keys(f"{channel}:conn:*"))
+    finally:
+        await client.aclose()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(args):
+    import httpx
+
+    processes = []
+    channel = "bench-socketio"
+    redis_url = args.redis_url
+    if not redis_url and not args.in_process:
+        redis_port = free_port()
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "fake_redis_server.py"), "--port", str(redis_port)],
+            stdout=subprocess.DEVNULL,
+        ))
+        redis_url = f"redis://127.0.0.1:{redis_port}/0"
+        await wait_for_port(redis_port)
+
+    # The addressed bouncer's copy of each event goes to the notification
+    # outbox, so the workers share a throwaway SQLite database
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_socketio_"), "bench.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE notifications (
+                id UUID PRIMARY KEY, user_id UUID NOT NULL, title VARCHAR(200) NOT NULL,
+                message TEXT NOT NULL, type VARCHAR(50) NOT NULL, is_read BOOLEAN, data JSON,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP, seq BIGINT
+            )
+        """)
+        conn.execute("CREATE UNIQUE INDEX idx_notifications_user_seq ON notifications (user_id, seq)")
+    os.environ.update(DATABASE_URL=f"sqlite:///{db_path}", DEBUG="false")
+
+    env = dict(os.environ, JWT_SECRET_KEY=JWT_SECRET, SOCKETIO_CHANNEL=channel,
+               SOCKETIO_MESSAGE_QUEUE="" if args.in_process else redis_url,
+               SOCKETIO_EMIT_WINDOW_MS=str(args.emit_window_ms))
+    ports = [free_port() for _ in range(args.workers)]
+    for port in ports:
+        processes.append(subprocess.Popen(
+            [sys.executable, "-W", "ignore::DeprecationWarning", os.path.abspath(__file__), "--serve", str(port)], cwd=HERE, env=env,
+        ))
+
+    clients = []
+    try:
+        for port in ports:
+            await wait_for_port(port)
+
+        os.environ["JWT_SECRET_KEY"] = JWT_SECRET
+        from app.core.security import create_access_token
+
+        latencies = []
+        clients = [
+            BenchClient(i, ports[i % len(ports)], create_access_token({
+                "sub": f"00000000-0000-0000-0000-{i:012d}", "role": "bouncer", "email": f"bench-{i}@example.com",
+            }), latencies)
+            for i in range(args.clients)
+        ]
+        tasks = [asyncio.create_task(client.run()) for client in clients]
+        await asyncio.wait_for(asyncio.gather(*(client.connected.wait() for client in clients)), 30)
+        errors = [client.error for client in clients if client.error]
+        if errors:
+            raise RuntimeError(f"{len(errors)} clients were rejected: {errors[0]}")
+
+        mode = "in-process (no message queue)" if args.in_process else f"Redis fan-out via {redis_url}"
+        print(f"Mode:      {mode}")
+        print(f"Workers:   {args.workers}    clients: {args.clients}    events: {args.events} at "
+              f"{'max' if not args.rate else args.rate} /s    emit window: {args.emit_window_ms} ms")
+        if not args.in_process:
+            print(f"Registry:  {await registry_size(redis_url, channel)} connections in Redis")
+
+        expected = args.events * args.clients
+        started = time.time()
+        async with httpx.AsyncClient() as http:
+            await http.post(f"http://127.0.0.1:{ports[0]}/_emit", json={"count": args.events, "rate": args.rate})
+
+        # Wait until deliveries stop arriving
+        deadline = started + args.timeout
+        last_seen, idle_since = -1, time.time()
+        while time.time() < deadline:
+            await asyncio.sleep(0.1)
+            total = sum(client.received for client in clients)
+            if total >= expected:
+                break
+            if total != last_seen:
+                last_seen, idle_since = total, time.time()
+            elif total and time.time() - idle_since > 2:
+                break
+        elapsed = time.time() - started
+
+        delivered = sum(client.received for client in clients)
+        frames = sum(client.frames for client in clients)
+        print("-" * 70)
+        print(f"Delivered: {delivered}/{expected} ({100 * delivered / expected:.1f}%)")
+        print(f"Frames:    {frames} ({delivered / max(frames, 1):.1f} events per frame)")
+        for w, port in enumerate(ports):
+            on_worker = [client for client in clients if client.port == port]
+            got = sum(client.received for client in on_worker)
+            print(f"   worker {w}: {len(on_worker)} clients, {got}/{len(on_worker) * args.events} events")
+        if latencies:
+            print(f"Latency:   p50 {percentile(latencies, 0.50) * 1000:.1f} ms   "
+                  f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms   "
+                  f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms   "
+                  f"max {max(latencies) * 1000:.1f} ms   mean {statistics.mean(latencies) * 1000:.1f} ms")
+            print(f"Throughput: {delivered / elapsed:.0f} deliveries/s over {elapsed:.2f} s")
+
+        for client in clients:
+            client.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if not args.in_process:
+            # Disconnect handlers run on every worker; give them a moment
+            for _ in range(50):
+                remaining = await registry_size(redis_url, channel)
+                if not remaining:
+                    break
+                await asyncio.sleep(0.1)
+            print(f"Registry:  {remaining} connections left after disconnect")
+    finally:
+        for client in clients:
+            client.close()
+        # Workers first, so they can still clean up their registry entries in Redis
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="worker processes")
+    parser.add_argument("--clients", type=int, default=200, help="bouncer sockets, spread across workers")
+    parser.add_argument("--events", type=int, default=500, help="new_booking_request events emitted by worker 0")
+    parser.add_argument("--rate", type=float, default=200, help="events per second (0 = as fast as possible)")
+    parser.add_argument("--timeout", type=float, default=60, help="give up waiting for deliveries after this long")
+    parser.add_argument("--redis-url", default=None, help="use this Redis instead of starting fake_redis_server.py")
+    parser.add_argument("--in-process", action="store_true", help="run workers without the Redis message queue")
+    parser.add_argument("--emit-window-ms", type=int, default=20, help="emit coalescing window on the workers (0 = off)")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    print("=" * 70)
+    print("SOCKET.IO CROSS-WORKER FAN-OUT BENCHMARK")
+    print("=" * 70)
+    asyncio.run(run(args))
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
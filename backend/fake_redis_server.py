@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""Local stand-in for a Redis server
+
+Speaks enough of the Redis protocol (RESP2) for the realtime service:
+pub/sub for the Socket.IO fan-out, strings, hashes, sets and lists for
+the connection registry and pending notifications, MULTI/EXEC with
+WATCH, and key expiry. Everything lives in memory in a single asyncio
+loop, so each command (and each EXEC) is atomic just like on a real
+server. It is not a general Redis
+replacement: no persistence, no Lua, no sorted sets.
+
+Usage:
+    python fake_redis_server.py [--port 6390]
+
+Then point the app at it, e.g.:
+    SOCKETIO_MESSAGE_QUEUE=redis://127.0.0.1:6390/0
+"""
+import argparse
+import asyncio
+import fnmatch
+import time
+from typing import Dict, List, Optional, Set
+
+
+class ReplyError(Exception):
+    pass
+
+
+class Store:
+    def __init__(self):
+        self.data: Dict[bytes, object] = {}
+        self.expires: Dict[bytes, float] = {}
+        # Bumped on every write, for WATCH
+        self.versions: Dict[bytes, int] = {}
+        self.channels: Dict[bytes, Set["Client"]] = {}
+
+    def touch(self, key: bytes):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def get(self, key: bytes, kind: Optional[type] = None):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.time():
+            self.delete(key)
+        value = self.data.get(key)
+        if value is not None and kind is not None and not isinstance(value, kind):
+            raise ReplyError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def delete(self, key: bytes) -> bool:
+        self.expires.pop(key, None)
+        if self.data.pop(key, None) is None:
+            return False
+        self.touch(key)
+        return True
+
+    def container(self, key: bytes, kind: type):
+        value = self.get(key, kind)
+        if value is None:
+            value = self.data[key] = kind()
+        self.touch(key)
+        return value
+
+    def drop_if_empty(self, key: bytes):
+        if key in self.data and not self.data[key]:
+            self.delete(key)
+
+
+def encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, ReplyError):
+        return b"-" + str(value).encode() + b"\r\n"
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+    raise TypeError(f"Cannot encode {type(value)}")
+
+
+class Client:
+    def __init__(self, server: "FakeRedis", writer: asyncio.StreamWriter):
+        self.server = server
+        self.writer = writer
+        self.subscriptions: Set[bytes] = set()
+        self.queued: Optional[List[List[bytes]]] = None
+        self.watched: Dict[bytes, int] = {}
+        self.dirty = False
+
+    def send(self, data: bytes):
+        self.writer.write(data)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = Store()
+        self.commands = {
+            name[4:].upper().encode(): getattr(self, name)
+            for name in dir(self) if name.startswith("cmd_")
+        }
+
+    # ---- connection ----
+
+    def cmd_ping(self, client, *args):
+        if client.subscriptions:
+            return [b"pong", args[0] if args else b""]
+        return args[0] if args else "PONG"
+
+    def cmd_echo(self, client, message):
+        return message
+
+    def cmd_select(self, client, db):
+        return "OK"
+
+    def cmd_client(self, client, *args):
+        return "OK"
+
+    def cmd_quit(self, client):
+        return "OK"
+
+    def cmd_flushall(self, client, *args):
+        for key in list(self.store.data):
+            self.store.delete(key)
+        return "OK"
+
+    cmd_flushdb = cmd_flushall
+
+    def cmd_dbsize(self, client):
+        return len([key for key in list(self.store.data) if self.store.get(key) is not None])
+
+    # ---- keys and strings ----
+
+    def cmd_get(self, client, key):
+        return self.store.get(key, bytes)
+
+    def cmd_set(self, client, key, value, *options):
+        options = [option.upper() for option in options]
+        exists = self.store.get(key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return None
+        self.store.delete(key)
+        self.store.data[key] = value
+        self.store.touch(key)
+        for flag, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+            if flag in options:
+                self.store.expires[key] = time.time() + float(options[options.index(flag) + 1]) * scale
+        return "OK"
+
+    def cmd_del(self, client, *keys):
+        return sum(self.store.delete(key) for key in keys)
+
+    def cmd_exists(self, client, *keys):
+        return sum(self.store.get(key) is not None for key in keys)
+
+    def cmd_expire(self, client, key, seconds):
+        if self.store.get(key) is None:
+            return 0
+        self.store.expires[key] = time.time() + int(seconds)
+        return 1
+
+    def cmd_ttl(self, client, key):
+        if self.store.get(key) is None:
+            return -2
+        deadline = self.store.expires.get(key)
+        return -1 if deadline is None else max(0, round(deadline - time.time()))
+
+    def cmd_keys(self, client, pattern):
+        pattern = pattern.decode()
+        return [key for key in list(self.store.data)
+                if self.store.get(key) is not None and fnmatch.fnmatchcase(key.decode(), pattern)]
+
+    def cmd_incrby(self, client, key, amount):
+        value = int(self.store.get(key, bytes) or 0) + int(amount)
+        expires = self.store.expires.get(key)
+        self.cmd_set(client, key, str(value).encode())
+        if expires is not None:
+            self.store.expires[key] = expires
+        return value
+
+    def cmd_incr(self, client, key):
+        return self.cmd_incrby(client, key, b"1")
+
+    # ---- hashes ----
+
+    def cmd_hset(self, client, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise ReplyError("ERR wrong number of arguments for 'hset' command")
+        value = self.store.container(key, dict)
+        added = 0
+        for field, item in zip(pairs[::2], pairs[1::2]):
+            added += field not in value
+            value[field] = item
+        return added
+
+    def cmd_hget(self, client, key, field):
+        return (self.store.get(key, dict) or {}).get(field)
+
+    def cmd_hmget(self, client, key, *fields):
+        value = self.store.get(key, dict) or {}
+        return [value.get(field) for field in fields]
+
+    def cmd_hgetall(self, client, key):
+        value = self.store.get(key, dict) or {}
+        return [item for pair in value.items() for item in pair]
+
+    def cmd_hdel(self, client, key, *fields):
+        value = self.store.get(key, dict)
+        if not value:
+            return 0
+        removed = sum(value.pop(field, None) is not None for field in fields)
+        self.store.touch(key)
+        self.store.drop_if_empty(key)
+        return removed
+
+    def cmd_hlen(self, client, key):
+        return len(self.store.get(key, dict) or {})
+
+    # ---- sets ----
+
+    def cmd_sadd(self, client, key, *members):
+        value = self.store.container(key, set)
+        before = len(value)
+        value.update(members)
+        return len(value) - before
+
+    def cmd_srem(self, client, key, *members):
+        value = self.store.get(key, set)
+        if not value:
+            return 0
+        before = len(value)
+        value.difference_update(members)
+        self.store.touch(key)
+        self.store.drop_if_empty(key)
+        return before - len(value)
+
+    def cmd_smembers(self, client, key):
+        return sorted(self.store.get(key, set) or ())
+
+    def cmd_sismember(self, client, key, member):
+        return member in (self.store.get(key, set) or ())
+
+    def cmd_scard(self, client, key):
+        return len(self.store.get(key, set) or ())
+
+    # ---- lists ----
+
+    def cmd_rpush(self, client, key, *values):
+        value = self.store.container(key, list)
+        value.extend(values)
+        return len(value)
+
+    def cmd_lpush(self, client, key, *values):
+        value = self.store.container(key, list)
+        value[:0] = reversed(values)
+        return len(value)
+
+    @staticmethod
+    def _slice(length: int, start: bytes, stop: bytes) -> slice:
+        start, stop = int(start), int(stop)
+        if start < 0:
+            start = max(0, length + start)
+        stop = length + stop if stop < 0 else min(stop, length - 1)
+        return slice(start, stop + 1)
+
+    def cmd_lrange(self, client, key, start, stop):
+        value = self.store.get(key, list) or []
+        return value[self._slice(len(value), start, stop)]
+
+    def cmd_ltrim(self, client, key, start, stop):
+        value = self.store.get(key, list)
+        if value is not None:
+            value[:] = value[self._slice(len(value), start, stop)]
+            self.store.touch(key)
+            self.store.drop_if_empty(key)
+        return "OK"
+
+    def cmd_llen(self, client, key):
+        return len(self.store.get(key, list) or [])
+
+    # ---- transactions ----
+
+    def cmd_watch(self, client, *keys):
+        for key in keys:
+            client.watched[key] = self.store.versions.get(key, 0)
+        return "OK"
+
+    def cmd_unwatch(self, client):
+        client.watched.clear()
+        return "OK"
+
+    def cmd_multi(self, client):
+        if client.queued is not None:
+            raise ReplyError("ERR MULTI calls can not be nested")
+        client.queued = []
+        client.dirty = False
+        return "OK"
+
+    def cmd_discard(self, client):
+        if client.queued is None:
+            raise ReplyError("ERR DISCARD without MULTI")
+        client.queued = None
+        client.watched.clear()
+        return "OK"
+
+    def cmd_exec(self, client):
+        if client.queued is None:
+            raise ReplyError("ERR EXEC without MULTI")
+        queued, client.queued = client.queued, None
+        watched, client.watched = client.watched, {}
+        if client.dirty:
+            client.dirty = False
+            raise ReplyError("EXECABORT Transaction discarded because of previous errors.")
+        if any(self.store.versions.get(key, 0) != version for key, version in watched.items()):
+            return None
+        results = []
+        for command in queued:
+            try:
+                results.append(self.call(client, command))
+            except ReplyError as e:
+                results.append(e)
+        return results
+
+    # ---- pub/sub ----
+
+    def cmd_subscribe(self, client, *channels):
+        replies = []
+        for channel in channels:
+            client.subscriptions.add(channel)
+            self.store.channels.setdefault(channel, set()).add(client)
+            replies.append([b"subscribe", channel, len(client.subscriptions)])
+        return Multi(replies)
+
+    def cmd_unsubscribe(self, client, *channels):
+        replies = []
+        for channel in channels or sorted(client.subscriptions):
+            client.subscriptions.discard(channel)
+            self.store.channels.get(channel, set()).discard(client)
+            replies.append([b"unsubscribe", channel, len(client.subscriptions)])
+        return Multi(replies)
+
+    def cmd_publish(self, client, channel, message):
+        subscribers = self.store.channels.get(channel, ())
+        frame = encode([b"message", channel, message])
+        for subscriber in subscribers:
+            subscriber.send(frame)
+        return len(subscribers)
+
+    # ---- dispatch ----
+
+    def call(self, client, command: List[bytes]):
+        handler = self.commands.get(command[0].upper())
+        if handler is None:
+            raise ReplyError(f"ERR unknown command '{command[0].decode(errors='replace')}'")
+        try:
+            return handler(client, *command[1:])
+        except TypeError:
+            raise ReplyError(f"ERR wrong number of arguments for '{command[0].decode().lower()}' command")
+
+    def execute(self, client, command: List[bytes]) -> bytes:
+        name = command[0].upper()
+        if client.queued is not None and name not in (b"EXEC", b"DISCARD", b"MULTI", b"WATCH"):
+            if name not in self.commands:
+                client.dirty = True
+                return encode(ReplyError(f"ERR unknown command '{command[0].decode(errors='replace')}'"))
+            client.queued.append(command)
+            return encode("QUEUED")
+        try:
+            result = self.call(client, command)
+        except ReplyError as e:
+            return encode(e)
+        if isinstance(result, Multi):
+            return b"".join(encode(reply) for reply in result.replies)
+        return encode(result)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = Client(self, writer)
+        try:
+            while True:
+                command = await read_command(reader)
+                if command is None:
+                    break
+                if not command:
+                    continue
+                writer.write(self.execute(client, command))
+                if command[0].upper() == b"QUIT":
+                    break
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in client.subscriptions:
+                self.store.channels.get(channel, set()).discard(client)
+            writer.close()
+
+
+class Multi:
+    """Several top-level replies to one command (SUBSCRIBE with many channels)."""
+
+    def __init__(self, replies):
+        self.replies = replies
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, as typed into telnet / nc
+        return line.split()
+    command = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        length = int(header[1:])
+        command.append((await reader.readexactly(length + 2))[:-2])
+    return command
+
+
+async def serve(host: str, port: int):
+    server = await asyncio.start_server(FakeRedis().handle, host, port)
+    print(f"[REDIS] Fake Redis listening on {host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for a Redis server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Twilio and Fast2SMS HTTP APIs
+
+Lets you exercise the SMS dispatcher (hedging, circuit breakers, latency
+metrics) without real credentials or sending real messages. Each provider's
+latency and failure rate can be set on the command line or changed while
+running via POST /_control.
+
+Usage:
+    python fake_sms_provider.py [--port 9100] [--twilio-delay 0.2] [--twilio-fail-rate 0]
+                                [--fast2sms-delay 0.1] [--fast2sms-fail-rate 0]
+
+Then start simple_app with:
+    DEVELOPMENT_MODE=false
+    TWILIO_ACCOUNT_SID=ACfake TWILIO_AUTH_TOKEN=fake TWILIO_FROM_NUMBER=+10000000000
+    TWILIO_API_BASE=http://127.0.0.1:9100/twilio
+    FAST2SMS_API_KEY=fake FAST2SMS_API_URL=http://127.0.0.1:9100/fast2sms/dev/bulkV2
+
+Change behaviour at runtime, e.g. make Twilio slow:
+    curl -X POST localhost:9100/_control -H 'Content-Type: application/json' \\
+         -d '{"provider": "twilio", "delay": 5}'
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+app = FastAPI(title="Fake SMS providers")
+
+behaviour = {
+    "twilio": {"delay": 0.2, "fail_rate": 0.0},
+    "fast2sms": {"delay": 0.1, "fail_rate": 0.0},
+}
+sent = {"twilio": 0, "fast2sms": 0}
+
+
+class Control(BaseModel):
+    provider: str
+    delay: Optional[float] = None
+    fail_rate: Optional[float] = None
+
+
+async def simulate(provider: str) -> bool:
+    """Sleep for the configured delay and decide whether this request fails."""
+    settings = behaviour[provider]
+    await asyncio.sleep(settings["delay"])
+    return random.random() >= settings["fail_rate"]
+
+
+@app.post("/twilio/2010-04-01/Accounts/{account_sid}/Messages.json")
+async def twilio_send(account_sid: str, request: Request):
+    form = await request.form()
+    if not await simulate("twilio"):
+        return JSONResponse(status_code=503, content={"code": 20503, "message": "Service unavailable (fake)"})
+    sent["twilio"] += 1
+    print(f"[TWILIO] to={form.get('To')} body={form.get('Body')}")
+    return JSONResponse(status_code=201, content={"sid": "SM" + uuid.uuid4().hex, "status": "queued", "to": form.get("To")})
+
+
+@app.post("/fast2sms/dev/bulkV2")
+async def fast2sms_send(request: Request):
+    form = await request.form()
+    if not await simulate("fast2sms"):
+        return JSONResponse(status_code=500, content={"return": False, "message": "Gateway error (fake)"})
+    sent["fast2sms"] += 1
+    print(f"[FAST2SMS] to={form.get('numbers')} message={form.get('message')}")
+    return {"return": True, "request_id": uuid.uuid4().hex, "message": ["SMS sent successfully."]}
+
+
+@app.post("/_control")
+async def control(change: Control):
+    if change.provider not in behaviour:
+        raise HTTPException(status_code=404, detail="Unknown provider")
+    if change.delay is not None:
+        behaviour[change.provider]["delay"] = change.delay
+    if change.fail_rate is not None:
+        behaviour[change.provider]["fail_rate"] = change.fail_rate
+    return {"behaviour": behaviour, "sent": sent}
+
+
+@app.get("/_control")
+async def status():
+    return {"behaviour": behaviour, "sent": sent}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Twilio/Fast2SMS server for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--twilio-delay", type=float, default=0.2, help="seconds before Twilio answers")
+    parser.add_argument("--twilio-fail-rate", type=float, default=0.0, help="fraction of Twilio requests that fail")
+    parser.add_argument("--fast2sms-delay", type=float, default=0.1, help="seconds before Fast2SMS answers")
+    parser.add_argument("--fast2sms-fail-rate", type=float, default=0.0, help="fraction of Fast2SMS requests that fail")
+    args = parser.parse_args()
+
+    behaviour["twilio"].update(delay=args.twilio_delay, fail_rate=args.twilio_fail_rate)
+    behaviour["fast2sms"].update(delay=args.fast2sms_delay, fail_rate=args.fast2sms_fail_rate)
+
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Move base64 avatars out of users.avatar_url into the avatar media store
+
+Avatars uploaded before the media store existed were saved as whole data
+URLs in users.avatar_url. This decodes each one, writes its thumbnails
+under MEDIA_ROOT exactly as a new upload would, and replaces the column
+value with the short "avatars/<sha256>" reference.
+
+Like migrate_booking_types.py it is safe to run against a live database:
+users are walked in rowid order in small batches with a short write
+transaction per batch, and a row is only rewritten if its avatar_url is
+still the data URL that was converted. Avatars that are not valid images
+are reported and left untouched. Run VACUUM afterwards to give the freed
+space back to the filesystem.
+
+Usage:
+    python migrate_avatars.py [--db test_bouncer.db] [--media-root media] [--batch-size 50] [--pause 0.05]
+"""
+import argparse
+import io
+import sqlite3
+import sys
+import time
+
+from fastapi import HTTPException
+
+from app.services.media import create_avatar_store, create_media_store
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+def migrate(conn, avatar_store, batch_size=50, pause=0.05):
+    """Convert every data URL avatar. Returns (converted, skipped)."""
+    last_rowid = 0
+    converted = 0
+    skipped = 0
+
+    while True:
+        rows = conn.execute("""
+            SELECT rowid, id, avatar_url
+            FROM users
+            WHERE rowid > ? AND avatar_url LIKE 'data:%'
+            ORDER BY rowid
+            LIMIT ?
+        """, (last_rowid, batch_size)).fetchall()
+
+        if not rows:
+            break
+
+        changes = []
+        for rowid, user_id, data_url in rows:
+            try:
+                reference = avatar_store.save(avatar_store.decode_data_url(data_url))
+            except HTTPException as e:
+                print(f"   [SKIP] user {user_id}: {e.detail}")
+                skipped += 1
+                continue
+            changes.append((reference, rowid, data_url))
+
+        # Only replace the value we converted, in case the user uploaded a new avatar meanwhile
+        conn.executemany(
+            "UPDATE users SET avatar_url = ? WHERE rowid = ? AND avatar_url = ?",
+            changes,
+        )
+        conn.commit()
+
+        converted += len(changes)
+        last_rowid = rows[-1][0]
+        print(f"   [BATCH] up to rowid {last_rowid}: {len(changes)}/{len(rows)} avatars converted")
+
+        if pause:
+            time.sleep(pause)
+
+    print(f"\n[OK] Converted {converted} avatars, skipped {skipped}")
+    return converted, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move base64 avatars into the media store")
+    parser.add_argument("--db", default="test_bouncer.db", help="SQLite database file (default: test_bouncer.db)")
+    parser.add_argument("--media-root", default=None, help="media directory (default: MEDIA_ROOT or ./media)")
+    parser.add_argument("--batch-size", type=int, default=50, help="users per write transaction")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("MIGRATE AVATARS TO MEDIA STORE")
+    print("=" * 70)
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA busy_timeout = 30000")
+    try:
+        migrate(conn, create_avatar_store(create_media_store(args.media_root)), batch_size=args.batch_size, pause=args.pause)
+    finally:
+        conn.close()
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
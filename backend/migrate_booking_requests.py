@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Prepare an existing bookings table for the booking request router
+
+app/api/bookings.py stores booking requests as Booking rows instead of an
+in-memory list. An open request has no bouncer yet, so bookings.bouncer_id
+must accept NULL, and the router pages through requests with the
+(user_id, created_at, id) and (status, created_at, id) indexes, which
+create_all does not add to a table that already exists. On PostgreSQL the
+booking_status type also gains the statuses simple_app writes ('accepted',
+'see_later').
+
+Works against DATABASE_URL (PostgreSQL or SQLite). SQLite cannot drop a
+NOT NULL constraint in place, so there bookings is rebuilt: a copy of the
+table without the constraint is created, the rows are copied over and the
+copy takes the old table's place, with its indexes and triggers. Rows the
+router stored before it wrote simple_app's format (bare hex ids, 'PENDING',
+fractional-second timestamps) are rewritten in it. It is idempotent.
+
+Usage:
+    python migrate_booking_requests.py
+"""
+import io
+import re
+import sys
+
+from sqlalchemy import inspect, text
+
+from app.core.database import engine
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+INDEXES = {
+    "idx_bookings_user_created": "bookings (user_id, created_at, id)",
+    "idx_bookings_status_created": "bookings (status, created_at, id)",
+}
+
+
+def allow_open_requests():
+    columns = {column["name"]: column for column in inspect(engine).get_columns("bookings")}
+    if columns["bouncer_id"]["nullable"]:
+        print("[OK] bookings.bouncer_id already accepts NULL")
+        return
+    if engine.dialect.name == "sqlite":
+        rebuild_sqlite_bookings()
+    else:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE bookings ALTER COLUMN bouncer_id DROP NOT NULL"))
+    print("[OK] bookings.bouncer_id now accepts NULL")
+
+
+def rebuild_sqlite_bookings():
+    """Recreate bookings without NOT NULL on bouncer_id (https://sqlite.org/lang_altertable.html#otheralter)"""
+    with engine.connect() as conn:
+        foreign_keys = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+        # Must be off while bookings is dropped, and cannot change inside a transaction
+        conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        try:
+            # Explicit BEGIN: sqlite3 would otherwise commit each DDL statement on its own
+            conn.exec_driver_sql("BEGIN")
+            table_sql = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'bookings'"
+            ).scalar()
+            # Indexes and triggers go with the old table; autoindexes have no sql
+            dependents = [row[0] for row in conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master "
+                "WHERE tbl_name = 'bookings' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+            )]
+
+            new_sql, found = re.subn(r"(\bbouncer_id\b[^,]*?)\s+NOT NULL", r"\1", table_sql, count=1)
+            if not found:
+                raise RuntimeError("bookings.bouncer_id definition not found in its CREATE TABLE")
+            new_sql = re.sub(r"^CREATE TABLE\s+\"?bookings\"?", "CREATE TABLE bookings_new", new_sql, count=1)
+
+            conn.exec_driver_sql(new_sql)
+            conn.exec_driver_sql("INSERT INTO bookings_new SELECT * FROM bookings")
+            copied = conn.exec_driver_sql("SELECT COUNT(*) FROM bookings_new").scalar()
+            conn.exec_driver_sql("DROP TABLE bookings")
+            conn.exec_driver_sql("ALTER TABLE bookings_new RENAME TO bookings")
+            for sql in dependents:
+                conn.exec_driver_sql(sql)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql(f"PRAGMA foreign_keys = {int(foreign_keys)}")
+    print(f"[OK] Rebuilt bookings ({copied} rows, {len(dependents)} indexes/triggers)")
+
+
+def normalise_sqlite_rows():
+    """Rewrite router-written bookings rows in the format simple_app stores"""
+    if engine.dialect.name != "sqlite":
+        return  # Native uuid, enum and timestamp columns there
+    with engine.begin() as conn:
+        updated = 0
+        for column in ("id", "user_id", "bouncer_id"):
+            updated += conn.execute(text(f"""
+                UPDATE bookings
+                SET {column} = lower(substr({column}, 1, 8) || '-' || substr({column}, 9, 4) || '-' ||
+                    substr({column}, 13, 4) || '-' || substr({column}, 17, 4) || '-' || substr({column}, 21))
+                WHERE length({column}) = 32 AND {column} NOT LIKE '%-%'
+            """)).rowcount
+        updated += conn.execute(text(
+            "UPDATE bookings SET status = lower(status) WHERE status <> lower(status)"
+        )).rowcount
+        for column in ("created_at", "updated_at"):
+            updated += conn.execute(text(f"""
+                UPDATE bookings SET {column} = substr(replace({column}, 'T', ' '), 1, 19)
+                WHERE length({column}) > 19 OR {column} LIKE '%T%'
+            """)).rowcount
+    print(f"[OK] bookings rows in simple_app's format ({updated} values rewritten)")
+
+
+def add_simple_app_statuses():
+    if engine.dialect.name == "sqlite":
+        return  # Plain text column there
+    with engine.begin() as conn:
+        for value in ("accepted", "see_later"):
+            conn.execute(text(f"ALTER TYPE booking_status ADD VALUE IF NOT EXISTS '{value}'"))
+    print("[OK] booking_status accepts simple_app statuses")
+
+
+def create_indexes():
+    with engine.begin() as conn:
+        for name, target in INDEXES.items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+            print(f"[OK] {name} in place")
+
+
+def main():
+    print("=" * 70)
+    print("MIGRATE BOOKINGS FOR STORED BOOKING REQUESTS")
+    print("=" * 70)
+
+    allow_open_requests()
+    normalise_sqlite_rows()
+    add_simple_app_statuses()
+    create_indexes()
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Backfill bookings.book_type / member_count from special_requirements
+
+Bookings created before these columns existed only carry the booking type
+inside the free-text special_requirements string, e.g.
+"Book Type: group, Member Count: 5". This parses that string and fills in
+the structured columns so the individual/group feeds can use
+idx_bookings_status_type_created.
+
+The migration is safe to run against a live database: rows are walked in
+rowid order in small batches, each batch is its own short write
+transaction, and the script pauses between batches so request handlers
+never wait long for the write lock. It is idempotent and can be stopped
+and re-run at any time; rows that already have book_type are left alone.
+
+Usage:
+    python migrate_booking_types.py [--db test_bouncer.db] [--batch-size 500] [--pause 0.05]
+"""
+import argparse
+import io
+import re
+import sqlite3
+import sys
+import time
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+BOOK_TYPE_RE = re.compile(r"Book Type:\s*(\w+)", re.IGNORECASE)
+MEMBER_COUNT_RE = re.compile(r"Member Count:\s*(\d+)", re.IGNORECASE)
+
+
+def parse_requirements(text):
+    """Return (book_type, member_count) parsed from a special_requirements string."""
+    if not text:
+        return None, None
+    book_type = BOOK_TYPE_RE.search(text)
+    member_count = MEMBER_COUNT_RE.search(text)
+    return (
+        book_type.group(1).lower() if book_type else None,
+        int(member_count.group(1)) if member_count else None,
+    )
+
+
+def ensure_columns(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(bookings)")}
+    if "book_type" not in columns:
+        conn.execute("ALTER TABLE bookings ADD COLUMN book_type TEXT")
+    if "member_count" not in columns:
+        conn.execute("ALTER TABLE bookings ADD COLUMN member_count INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status_type_created ON bookings (status, book_type, created_at, id)")
+    conn.commit()
+
+
+def backfill(conn, batch_size=500, pause=0.05):
+    """Fill book_type/member_count for every row missing them. Returns rows updated."""
+    last_rowid = 0
+    updated = 0
+    scanned = 0
+
+    while True:
+        rows = conn.execute("""
+            SELECT rowid, special_requirements
+            FROM bookings
+            WHERE rowid > ? AND book_type IS NULL
+            ORDER BY rowid
+            LIMIT ?
+        """, (last_rowid, batch_size)).fetchall()
+
+        if not rows:
+            break
+
+        changes = []
+        for rowid, requirements in rows:
+            book_type, member_count = parse_requirements(requirements)
+            if book_type:
+                changes.append((book_type, member_count, rowid))
+
+        # book_type IS NULL is re-checked so rows written by the app since
+        # the SELECT are never overwritten
+        conn.executemany("""
+            UPDATE bookings
+            SET book_type = ?, member_count = COALESCE(member_count, ?)
+            WHERE rowid = ? AND book_type IS NULL
+        """, [(book_type, member_count, rowid) for book_type, member_count, rowid in changes])
+        conn.commit()
+
+        scanned += len(rows)
+        updated += len(changes)
+        last_rowid = rows[-1][0]
+        print(f"   [BATCH] up to rowid {last_rowid}: {len(changes)}/{len(rows)} rows updated")
+
+        if pause:
+            time.sleep(pause)
+
+    print(f"\n[OK] Scanned {scanned} rows without book_type, updated {updated}")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill bookings.book_type and member_count")
+    parser.add_argument("--db", default="test_bouncer.db", help="SQLite database file (default: test_bouncer.db)")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per write transaction")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("BACKFILL BOOKING TYPES")
+    print("=" * 70)
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA busy_timeout = 30000")
+    try:
+        ensure_columns(conn)
+        backfill(conn, batch_size=args.batch_size, pause=args.pause)
+
+        remaining = conn.execute("""
+            SELECT COUNT(*) FROM bookings
+            WHERE book_type IS NULL AND special_requirements LIKE '%Book Type:%'
+        """).fetchone()[0]
+        if remaining:
+            print(f"[WARNING] {remaining} rows mention a book type that could not be parsed")
+    finally:
+        conn.close()
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Add notifications.seq and number existing notifications per user
+
+The realtime notification outbox (app/services/notification_outbox.py)
+orders each user's notifications by a per-user sequence number, which
+clients send back as their last-seen cursor. This adds the column to an
+existing notifications table, numbers the rows that have none in
+created_at order (continuing after the user's highest number), and
+creates the unique (user_id, seq) index.
+
+Works against DATABASE_URL (PostgreSQL or SQLite). It is idempotent: run
+it again and only rows still missing a number are touched. Rows are
+updated in batches with a commit per batch.
+
+Usage:
+    python migrate_notification_seq.py [--batch-size 1000]
+"""
+import argparse
+import io
+import sys
+
+from sqlalchemy import inspect, text
+
+from app.core.database import engine
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+def add_column():
+    columns = {column["name"] for column in inspect(engine).get_columns("notifications")}
+    if "seq" in columns:
+        print("[OK] notifications.seq already exists")
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE notifications ADD COLUMN seq BIGINT"))
+    print("[OK] Added notifications.seq")
+
+
+def number_rows(batch_size):
+    with engine.connect() as conn:
+        next_seq = dict(conn.execute(text(
+            "SELECT user_id, MAX(seq) FROM notifications WHERE seq IS NOT NULL GROUP BY user_id"
+        )).all())
+        rows = conn.execute(text(
+            "SELECT id, user_id FROM notifications WHERE seq IS NULL ORDER BY user_id, created_at, id"
+        )).all()
+
+    updates = []
+    for row_id, user_id in rows:
+        next_seq[user_id] = (next_seq.get(user_id) or 0) + 1
+        updates.append({"id": row_id, "seq": next_seq[user_id]})
+
+    for start in range(0, len(updates), batch_size):
+        batch = updates[start:start + batch_size]
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE notifications SET seq = :seq WHERE id = :id AND seq IS NULL"), batch)
+        print(f"   [BATCH] numbered {start + len(batch)}/{len(updates)} notifications")
+
+    print(f"[OK] Numbered {len(updates)} notifications")
+
+
+def create_index():
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_user_seq ON notifications (user_id, seq)"
+        ))
+    print("[OK] idx_notifications_user_seq in place")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add and backfill notifications.seq")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per write transaction")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("MIGRATE NOTIFICATIONS TO PER-USER SEQUENCE NUMBERS")
+    print("=" * 70)
+
+    add_column()
+    number_rows(args.batch_size)
+    create_index()
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
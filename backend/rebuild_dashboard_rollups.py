@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Recompute the bouncer dashboard rollups (bouncer_monthly_stats) from bookings
+
+The rollup is normally kept up to date by simple_app as bookings are
+created and change status. Run this after bulk edits made directly in the
+database, or to repair the table if it ever drifts. The rebuild runs in a
+single transaction, so the dashboard sees either the old or the new
+figures, never a partially rebuilt table.
+
+Usage:
+    python rebuild_dashboard_rollups.py [--db test_bouncer.db] [--check]
+"""
+import argparse
+import io
+import sqlite3
+import sys
+
+from app.services.booking_rollups import rebuild_rollups
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+def snapshot(conn):
+    return {
+        row[:3]: (row[3], round(row[4], 2), round(row[5], 2))
+        for row in conn.execute("""
+            SELECT bouncer_user_id, month, status, booking_count, revenue, hours
+            FROM bouncer_monthly_stats
+            WHERE booking_count != 0
+        """)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild bouncer dashboard rollups")
+    parser.add_argument("--db", default="test_bouncer.db", help="SQLite database file (default: test_bouncer.db)")
+    parser.add_argument("--check", action="store_true", help="only report drift, leave the table unchanged")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("REBUILD DASHBOARD ROLLUPS")
+    print("=" * 70)
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    conn.execute("PRAGMA busy_timeout = 30000")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        before = snapshot(conn) if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bouncer_monthly_stats'"
+        ).fetchone() else {}
+        rows = rebuild_rollups(conn)
+        after = snapshot(conn)
+
+        drifted = sorted(key for key in before.keys() | after.keys() if before.get(key) != after.get(key))
+        for key in drifted:
+            print(f"   [DRIFT] {key}: {before.get(key)} -> {after.get(key)}")
+
+        if args.check:
+            conn.rollback()
+            print(f"\n[OK] Check only: {len(drifted)} drifted buckets, nothing written")
+        else:
+            conn.commit()
+            print(f"\n[OK] Rebuilt {rows} rollup rows ({len(drifted)} buckets changed)")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print("=" * 70)
+    return 1 if args.check and drifted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
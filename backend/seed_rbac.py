@@ -9,6 +9,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from sqlalchemy.orm import Session
 from app.core.database import engine, SessionLocal
+from app.core.role_cache import bump_rbac_version
 from app.models.user import Role, Permission, RolePermission
 
 def create_permissions(db: Session):
@@ -119,6 +120,10 @@ def main():
         roles = create_roles(db)
         print(f"Created {len(roles)} roles")
 
+        # Running workers reload their role cache within RBAC_CACHE_CHECK_INTERVAL
+        bump_rbac_version(db.connection())
+        db.commit()
+
         print("\nRBAC System Summary:")
         # Simple query to count roles and permissions
         total_roles = db.query(Role).count()
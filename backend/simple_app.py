@@ -2,27 +2,33 @@
 """
 Simple FastAPI app for login testing with OTP password reset and SMS verification
 """
-from fastapi import FastAPI, HTTPException, Form, Header
+from fastapi import FastAPI, HTTPException, Form, Header, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import sqlite3
-from passlib.context import CryptContext
 import jwt
 import random
-import smtplib
-import requests
 import os
 from typing import Optional, Dict
 from pydantic import BaseModel
 import uuid
 from datetime import datetime, timedelta, timezone
 import pytz
-try:
-    from email.mime.text import MimeText
-    from email.mime.multipart import MimeMultipart
-except ImportError:
-    # Fallback for older Python versions
-    from email.mime.text import MIMEText as MimeText
-    from email.mime.multipart import MIMEMultipart as MimeMultipart
+import json
+import asyncio
+from app.core.otp_store import OTP_LOCKED, OTP_MISSING, OTP_VERIFIED, create_otp_store
+from app.core.pagination import clamp_page_size, fetch_limit, keyset_condition, keyset_page, requested_page_size
+from app.core.config import settings
+from app.core.passwords import PasswordHasher
+from app.core.response_cache import VersionedResponseCache, bump_version, current_version, ensure_versions_table, etag_matches
+from app.core.sqlite_pool import AsyncSQLite, create_pool
+from app.core.token_cache import VerifiedTokenCache
+from app.core.uploads import receive_upload
+from app.services.media import create_avatar_store, create_media_store, create_profile_photo_store
+from app.services.mail_queue import MailQueue, SmtpTransport, enqueue_mail, ensure_outbox_table
+from app.services.sms import create_sms_dispatcher
+from app.services.booking_rollups import apply_booking_delta, ensure_rollup_table, rebuild_rollups, summarize
+from app.services.booking_feed import BookingFeed, ensure_feed_table, format_sse, record_booking_change
 
 # Create FastAPI app
 app = FastAPI(title="Simple Login API")
@@ -36,8 +42,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing runs bcrypt on worker processes (see app/core/passwords.py)
+password_hasher = PasswordHasher(
+    rounds=int(os.getenv("PASSWORD_HASH_ROUNDS", "12")),
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "0")) or None,
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "0")) or None,
+)
+
+@app.on_event("startup")
+async def start_password_hasher():
+    await password_hasher.start()
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    password_hasher.shutdown()
+
+# Pooled SQLite connections (see app/core/sqlite_pool.py)
+db_pool = create_pool()
+
+# Queries run on DB threads so a slow one never stalls the event loop
+db = AsyncSQLite(db_pool, read_workers=int(os.getenv("SQLITE_READ_WORKERS", "4")))
+
+async def get_db() -> AsyncSQLite:
+    """FastAPI dependency returning the async SQLite data-access layer"""
+    return db
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    db.shutdown()
 
 # JWT settings
 SECRET_KEY = "test-secret-key-for-development-only"
@@ -45,18 +77,59 @@ ALGORITHM = "HS256"
 
 # Email configuration (for development, we'll simulate email sending)
 EMAIL_CONFIG = {
-    "smtp_server": "smtp.gmail.com",
-    "smtp_port": 587,
-    "sender_email": "bouncer.app.test@gmail.com",  # Replace with your email
-    "sender_password": "your-app-password",        # Replace with your app password
-    "development_mode": True  # Set to False to send real emails
+    "smtp_server": os.getenv("EMAIL_SMTP_SERVER", "smtp.gmail.com"),
+    "smtp_port": int(os.getenv("EMAIL_SMTP_PORT", "587")),
+    "sender_email": os.getenv("EMAIL_SENDER", "bouncer.app.test@gmail.com"),
+    "sender_password": os.getenv("EMAIL_PASSWORD", "your-app-password"),  # Empty to skip SMTP login
+    "starttls": os.getenv("EMAIL_STARTTLS", "true").lower() == "true",
+    "development_mode": os.getenv("EMAIL_DEVELOPMENT_MODE", "true").lower() == "true"  # Set to false to send real emails
 }
 
-# OTP storage (in production, use Redis or database)
-otp_storage = {}
+# Outgoing mail is queued in the mail_outbox table and sent by background
+# workers over reused SMTP sessions (see app/services/mail_queue.py)
+def init_mail_outbox_table():
+    """Create the mail outbox table if it doesn't exist"""
+    conn = db_pool.connection()
+    ensure_outbox_table(conn)
+    conn.commit()
+
+init_mail_outbox_table()
+
+mail_queue = MailQueue(
+    db,
+    lambda: SmtpTransport(
+        EMAIL_CONFIG["smtp_server"],
+        EMAIL_CONFIG["smtp_port"],
+        EMAIL_CONFIG["sender_email"],
+        password=EMAIL_CONFIG["sender_password"],
+        starttls=EMAIL_CONFIG["starttls"],
+    ),
+    workers=int(os.getenv("MAIL_WORKERS", "2")),
+    batch_size=int(os.getenv("MAIL_BATCH_SIZE", "20")),
+    max_attempts=int(os.getenv("MAIL_MAX_ATTEMPTS", "5")),
+)
+
+@app.on_event("startup")
+async def start_mail_queue():
+    if not EMAIL_CONFIG["development_mode"]:
+        await mail_queue.start()
+
+@app.on_event("shutdown")
+async def stop_mail_queue():
+    await mail_queue.stop()
+
+# Email and phone OTPs expire on their own TTL (see app/core/otp_store.py).
+# Kept in process memory unless OTP_STORE_URL points at Redis, which is
+# required when running more than one worker.
+otp_store = create_otp_store()
+
+@app.on_event("startup")
+async def start_otp_store():
+    await otp_store.start()
 
-# SMS/Phone OTP storage
-phone_otp_storage = {}
+@app.on_event("shutdown")
+async def stop_otp_store():
+    await otp_store.close()
 
 # Twilio configuration (for SMS OTP)
 TWILIO_CONFIG = {
@@ -80,6 +153,13 @@ FAST2SMS_CONFIG = {
     "development_mode": os.getenv("DEVELOPMENT_MODE", "true").lower() == "true"
 }
 
+# Async SMS delivery with hedging and per-provider circuit breakers
+sms_dispatcher = create_sms_dispatcher()
+
+@app.on_event("shutdown")
+async def close_sms_dispatcher():
+    await sms_dispatcher.close()
+
 # Pydantic models for OTP requests
 class SendOtpRequest(BaseModel):
     phone_number: str
@@ -93,42 +173,24 @@ def generate_otp():
     """Generate 6-digit OTP"""
     return str(random.randint(100000, 999999))
 
-def store_otp(email: str, otp: str):
-    """Store OTP with expiry time (10 minutes)"""
-    expiry_time = datetime.now(pytz.UTC) + timedelta(minutes=10)
-    otp_storage[email] = {
-        "otp": otp,
-        "expiry": expiry_time,
-        "attempts": 0
-    }
+async def store_otp(email: str, otp: str):
+    """Store OTP with expiry time (OTP_EXPIRY_MINUTES, 10 by default)"""
+    await otp_store.put("email:" + email, otp)
 
-def verify_otp(email: str, otp: str) -> bool:
-    """Verify OTP"""
-    if email not in otp_storage:
-        return False
-
-    stored_data = otp_storage[email]
+async def verify_email_otp(email: str, otp: str) -> bool:
+    """Verify and consume an email OTP (max OTP_MAX_ATTEMPTS wrong guesses)"""
+    result = await otp_store.verify("email:" + email, otp)
+    return result.status == OTP_VERIFIED
 
-    # Check expiry
-    if datetime.now(pytz.UTC) > stored_data["expiry"]:
-        del otp_storage[email]
-        return False
+async def check_otp_rate_limit(subject: str) -> int:
+    """Count an OTP request for subject; returns seconds to wait if over the limit, else 0"""
+    retry_after = await otp_store.hit_rate_limit(subject)
+    if retry_after:
+        print(f"[WARNING] OTP rate limit hit for {subject}, retry in {retry_after}s")
+    return retry_after
 
-    # Check attempts (max 3)
-    if stored_data["attempts"] >= 3:
-        del otp_storage[email]
-        return False
-
-    # Verify OTP
-    if stored_data["otp"] == otp:
-        del otp_storage[email]  # Remove OTP after successful verification
-        return True
-    else:
-        stored_data["attempts"] += 1
-        return False
-
-def send_reset_email(email: str, otp: str):
-    """Send password reset email (simulated for development)"""
+async def send_reset_email(email: str, otp: str):
+    """Queue the password reset email (printed to the console in development)"""
     if EMAIL_CONFIG["development_mode"]:
         # For development, print to console instead of sending real email
         print(f"\n{'='*50}")
@@ -140,13 +202,8 @@ def send_reset_email(email: str, otp: str):
         print(f"{'='*50}\n")
         return True
 
-    # Real email sending code (for production)
+    # Real email is sent by the mail queue workers
     try:
-        msg = MimeMultipart()
-        msg['From'] = EMAIL_CONFIG["sender_email"]
-        msg['To'] = email
-        msg['Subject'] = "Password Reset OTP - Bouncer App"
-
         body = f"""
         <h2>[LOCK] Password Reset Request</h2>
         <p>Hello,</p>
@@ -158,141 +215,24 @@ def send_reset_email(email: str, otp: str):
         <p>Best regards,<br>Bouncer App Team</p>
         """
 
-        msg.attach(MimeText(body, 'html'))
-
-        server = smtplib.SMTP(EMAIL_CONFIG["smtp_server"], EMAIL_CONFIG["smtp_port"])
-        server.starttls()
-        server.login(EMAIL_CONFIG["sender_email"], EMAIL_CONFIG["sender_password"])
-        text = msg.as_string()
-        server.sendmail(EMAIL_CONFIG["sender_email"], email, text)
-        server.quit()
+        await db.run(enqueue_mail, email, "Password Reset OTP - Bouncer App", body, write=True)
+        mail_queue.notify()
 
         return True
     except Exception as e:
-        print(f"Email sending error: {e}")
+        print(f"Email queueing error: {e}")
         return False
 
 # SMS OTP Functions
-def store_phone_otp(phone_number: str, otp: str) -> str:
+async def store_phone_otp(phone_number: str, otp: str) -> str:
     """Store OTP for phone number with expiry time (10 minutes) and return session ID"""
     session_id = str(uuid.uuid4())
-    expiry_time = datetime.now(pytz.UTC) + timedelta(minutes=10)
-
-    phone_otp_storage[session_id] = {
-        "phone_number": phone_number,
-        "otp": otp,
-        "expiry": expiry_time,
-        "attempts": 0,
-        "verified": False
-    }
-
+    await otp_store.put("phone:" + session_id, otp, phone_number=phone_number)
     return session_id
 
-def verify_phone_otp(session_id: str, otp: str) -> bool:
-    """Verify OTP for phone number"""
-    if session_id not in phone_otp_storage:
-        return False
-
-    stored_data = phone_otp_storage[session_id]
-
-    # Check expiry
-    if datetime.now(pytz.UTC) > stored_data["expiry"]:
-        del phone_otp_storage[session_id]
-        return False
-
-    # Check attempts (max 3)
-    if stored_data["attempts"] >= 3:
-        del phone_otp_storage[session_id]
-        return False
-
-    # Verify OTP
-    if stored_data["otp"] == otp:
-        stored_data["verified"] = True
-        return True
-    else:
-        stored_data["attempts"] += 1
-        return False
-
-def send_sms_otp_twilio(phone_number: str, otp: str) -> dict:
-    """Send OTP via SMS using Twilio with proper error handling"""
-    try:
-        print(f"[TWILIO] Attempting to send SMS to +{phone_number}")
-
-        if not all([TWILIO_CONFIG["account_sid"], TWILIO_CONFIG["auth_token"], TWILIO_CONFIG["from_number"]]):
-            error_msg = "Twilio configuration missing. Please set TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, and TWILIO_FROM_NUMBER environment variables."
-            print(f"[TWILIO ERROR] {error_msg}")
-            return {"success": False, "error": error_msg, "provider": "twilio"}
-
-        import twilio.rest
-        from twilio.rest import Client
-        from twilio.base.exceptions import TwilioRestException
-
-        client = Client(TWILIO_CONFIG["account_sid"], TWILIO_CONFIG["auth_token"])
-
-        # Add country code if not present
-        if not phone_number.startswith('+'):
-            phone_number = '+91' + phone_number  # Default to India
-
-        message = client.messages.create(
-            body=f"Bouncer App OTP: {otp}. Valid for 10 minutes. Do not share this code.",
-            from_=TWILIO_CONFIG["from_number"],
-            to=phone_number
-        )
-
-        success_msg = f"SMS sent successfully via Twilio. SID: {message.sid}"
-        print(f"[TWILIO SUCCESS] {success_msg}")
-        return {"success": True, "message": success_msg, "sid": message.sid, "provider": "twilio"}
-
-    except TwilioRestException as e:
-        error_msg = f"Twilio API error: {e}"
-        print(f"[TWILIO ERROR] {error_msg}")
-        return {"success": False, "error": error_msg, "code": e.code, "provider": "twilio"}
-    except Exception as e:
-        error_msg = f"Unexpected Twilio error: {str(e)}"
-        print(f"[TWILIO ERROR] {error_msg}")
-        return {"success": False, "error": error_msg, "provider": "twilio"}
-
-def send_sms_otp_fast2sms(phone_number: str, otp: str) -> dict:
-    """Send OTP via Fast2SMS (India-specific) with proper error handling"""
-    try:
-        print(f"[SEARCH] [FAST2SMS] Attempting to send SMS to {phone_number}")
-
-        if not FAST2SMS_CONFIG["api_key"]:
-            error_msg = "Fast2SMS API key missing. Please set FAST2SMS_API_KEY environment variable."
-            print(f"[ERROR] [FAST2SMS] {error_msg}")
-            return {"success": False, "error": error_msg, "provider": "fast2sms"}
-
-        # Fast2SMS API implementation
-        url = "https://www.fast2sms.com/dev/bulkV2"
-        payload = {
-            "authorization": FAST2SMS_CONFIG["api_key"],
-            "sender_id": FAST2SMS_CONFIG["sender_id"],
-            "message": f"[LOCK] Bouncer App OTP: {otp}. Valid for 10 minutes. Do not share this code.",
-            "language": "english",
-            "route": "v3",
-            "numbers": phone_number,
-        }
-
-        response = requests.post(url, data=payload, timeout=10)
-        response_data = response.json()
-
-        if response.status_code == 200 and response_data.get("return"):
-            success_msg = f"SMS sent successfully via Fast2SMS. Message ID: {response_data.get('message', 'N/A')}"
-            print(f"[SUCCESS] [FAST2SMS] {success_msg}")
-            return {"success": True, "message": success_msg, "response": response_data, "provider": "fast2sms"}
-        else:
-            error_msg = response_data.get("message", "Fast2SMS API error")
-            print(f"[ERROR] [FAST2SMS] {error_msg}")
-            return {"success": False, "error": error_msg, "response": response_data, "provider": "fast2sms"}
-
-    except requests.exceptions.RequestException as e:
-        error_msg = f"Fast2SMS network error: {str(e)}"
-        print(f"[ERROR] [FAST2SMS] {error_msg}")
-        return {"success": False, "error": error_msg, "provider": "fast2sms"}
-    except Exception as e:
-        error_msg = f"Unexpected Fast2SMS error: {str(e)}"
-        print(f"[ERROR] [FAST2SMS] {error_msg}")
-        return {"success": False, "error": error_msg, "provider": "fast2sms"}
+async def verify_phone_otp(session_id: str, otp: str):
+    """Verify OTP for phone number. The session stays valid (marked verified) until it expires"""
+    return await otp_store.verify("phone:" + session_id, otp, consume=False)
 
 def send_sms_otp_development(phone_number: str, otp: str) -> dict:
     """Development mode - print OTP to console"""
@@ -312,43 +252,19 @@ def send_sms_otp_development(phone_number: str, otp: str) -> dict:
         "provider": "development"
     }
 
-def send_sms_otp(phone_number: str, otp: str) -> dict:
-    """Send OTP via SMS with fallback providers"""
+async def send_sms_otp(phone_number: str, otp: str) -> dict:
+    """Send OTP via SMS, hedging across Twilio and Fast2SMS (see app/services/sms.py)"""
     print(f"[SMS] Starting SMS delivery process for +{phone_number}")
 
     # Check if we're in development mode
     if TWILIO_CONFIG["development_mode"]:
         return send_sms_otp_development(phone_number, otp)
 
-    # Try Twilio first
-    twilio_result = send_sms_otp_twilio(phone_number, otp)
-    if twilio_result["success"]:
-        return twilio_result
-
-    print(f"[SMS] Twilio failed, trying Fast2SMS fallback...")
-
-    # Try Fast2SMS as fallback
-    fast2sms_result = send_sms_otp_fast2sms(phone_number, otp)
-    if fast2sms_result["success"]:
-        return fast2sms_result
+    return await sms_dispatcher.send(phone_number, otp)
 
-    # All providers failed
-    error_msg = "All SMS providers failed"
-    print(f"[SMS ERROR] {error_msg}")
-    return {
-        "success": False,
-        "error": error_msg,
-        "twilio_error": twilio_result.get("error"),
-        "fast2sms_error": fast2sms_result.get("error"),
-        "provider": "none"
-    }
-
-def get_user_from_db(email: str):
+async def get_user_from_db(email: str):
     """Get user from database"""
-    conn = sqlite3.connect("test_bouncer.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
+    result = await db.fetchone("""
         SELECT users.id, users.email, users.password_hash, users.first_name,
                users.last_name, users.is_active, roles.name as role_name
         FROM users
@@ -356,9 +272,6 @@ def get_user_from_db(email: str):
         WHERE users.email = ?
     """, (email,))
 
-    result = cursor.fetchone()
-    conn.close()
-
     if result:
         return {
             "id": result[0],
@@ -381,6 +294,38 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Tokens already verified by any endpoint are reused until they expire,
+# so a page firing several API calls only checks the signature once
+token_cache = VerifiedTokenCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")))
+
+def decode_access_token(token: str) -> dict:
+    """Verify a JWT and return its payload, using the verified-token cache"""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.put(token, payload)
+    return payload
+
+async def get_current_user(authorization: Optional[str] = Header(None, alias="Authorization")) -> dict:
+    """FastAPI dependency returning the caller's verified token payload"""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="No authentication token provided")
+
+    token = authorization[7:] if authorization.startswith("Bearer ") else authorization
+
+    try:
+        payload = decode_access_token(token)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
+    except jwt.InvalidTokenError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+
+    user_id = payload.get("sub")
+    if not user_id or not user_id.strip():
+        raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
+
+    return payload
+
 @app.get("/")
 async def root():
     return {"message": "Simple Login API", "status": "running"}
@@ -389,20 +334,31 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/health/sms")
+async def sms_health():
+    """SMS provider circuit states and delivery latency"""
+    return sms_dispatcher.metrics()
+
 @app.post("/api/auth/login")
 async def login(username: str = Form(), password: str = Form()):
     """Simple login endpoint"""
     try:
         # Get user from database
-        user = get_user_from_db(username)
+        user = await get_user_from_db(username)
 
         if not user:
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
         # Verify password
-        if not pwd_context.verify(password, user["password_hash"]):
+        valid, new_hash = await password_hasher.verify_and_update(password, user["password_hash"])
+        if not valid:
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
+        # Upgrade hashes made with an older bcrypt cost while we have the plaintext
+        if new_hash:
+            await db.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, user["id"]))
+            print(f"[AUTH] Rehashed password for {user['email']} at the current bcrypt cost")
+
         # Check if user is active
         if not user["is_active"]:
             raise HTTPException(status_code=401, detail="Account is deactivated")
@@ -442,45 +398,49 @@ async def login(username: str = Form(), password: str = Form()):
         print(f"Login error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-def update_user_password(email: str, new_password: str):
+async def update_user_password(email: str, new_password: str):
     """Update user password in database"""
     try:
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
         # Hash new password
-        hashed_password = pwd_context.hash(new_password)
+        hashed_password = await password_hasher.hash(new_password)
 
         # Update password
-        cursor.execute("""
+        await db.execute("""
             UPDATE users
             SET password_hash = ?
             WHERE email = ?
         """, (hashed_password, email))
 
-        conn.commit()
-        conn.close()
-
         return True
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Password update error: {e}")
         return False
 
-@app.post("/api/auth/send-reset-otp")
+@app.post("/api/auth/send-reset-otp", status_code=202)
 async def send_reset_otp(email: str = Form(...)):
     """Send password reset OTP to user email"""
     try:
         # Check if user exists
-        user = get_user_from_db(email)
+        user = await get_user_from_db(email)
         if not user:
             raise HTTPException(status_code=404, detail="No account found with this email address")
 
+        retry_after = await check_otp_rate_limit("email:" + email)
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many OTP requests. Please try again later.",
+                headers={"Retry-After": str(retry_after)}
+            )
+
         # Generate and store OTP
         otp = generate_otp()
-        store_otp(email, otp)
+        await store_otp(email, otp)
 
-        # Send OTP email
-        email_sent = send_reset_email(email, otp)
+        # Queue OTP email; delivery happens in the background
+        email_sent = await send_reset_email(email, otp)
 
         if not email_sent:
             raise HTTPException(status_code=500, detail="Failed to send OTP email")
@@ -504,12 +464,13 @@ async def register_user(
     first_name: str = Form(...),
     last_name: str = Form(...),
     phone: str = Form(""),
-    user_type: str = Form("user")
+    user_type: str = Form("user"),
+    db: AsyncSQLite = Depends(get_db)
 ):
     """Register a new user"""
     try:
         # Check if user already exists
-        existing_user = get_user_from_db(email)
+        existing_user = await get_user_from_db(email)
         if existing_user:
             raise HTTPException(status_code=400, detail="An account with this email already exists")
 
@@ -526,41 +487,40 @@ async def register_user(
             raise HTTPException(status_code=400, detail="Password must contain at least one number")
 
         # Hash password
-        hashed_password = pwd_context.hash(password)
+        hashed_password = await password_hasher.hash(password)
 
         # Insert new user into database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        # Get the appropriate role ID based on user_type
-        print(f"[BACKEND] Creating user with role: {user_type}")
+        def insert_user(conn):
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT id FROM roles WHERE name = ?", (user_type,))
-        role_result = cursor.fetchone()
+            # Get the appropriate role ID based on user_type
+            print(f"[BACKEND] Creating user with role: {user_type}")
 
-        if not role_result:
-            # Create role if it doesn't exist
-            role_descriptions = {
-                'user': 'Customer booking bouncer services',
-                'bouncer': 'Security professional providing services',
-                'admin': 'System administrator'
-            }
-            description = role_descriptions.get(user_type, 'User role')
-            cursor.execute("INSERT INTO roles (name, description) VALUES (?, ?)", (user_type, description))
             cursor.execute("SELECT id FROM roles WHERE name = ?", (user_type,))
             role_result = cursor.fetchone()
 
-        role_id = role_result[0]
-        print(f"[BACKEND] Assigned role ID: {role_id} for user_type: {user_type}")
+            if not role_result:
+                # Create role if it doesn't exist
+                role_descriptions = {
+                    'user': 'Customer booking bouncer services',
+                    'bouncer': 'Security professional providing services',
+                    'admin': 'System administrator'
+                }
+                description = role_descriptions.get(user_type, 'User role')
+                cursor.execute("INSERT INTO roles (name, description) VALUES (?, ?)", (user_type, description))
+                cursor.execute("SELECT id FROM roles WHERE name = ?", (user_type,))
+                role_result = cursor.fetchone()
+
+            role_id = role_result[0]
+            print(f"[BACKEND] Assigned role ID: {role_id} for user_type: {user_type}")
 
-        # Insert user
-        cursor.execute("""
-            INSERT INTO users (email, password_hash, first_name, last_name, phone, role_id, is_active, is_verified)
-            VALUES (?, ?, ?, ?, ?, ?, 1, 1)
-        """, (email, hashed_password, first_name, last_name, phone, role_id))
+            # Insert user
+            cursor.execute("""
+                INSERT INTO users (email, password_hash, first_name, last_name, phone, role_id, is_active, is_verified)
+                VALUES (?, ?, ?, ?, ?, ?, 1, 1)
+            """, (email, hashed_password, first_name, last_name, phone, role_id))
 
-        conn.commit()
-        conn.close()
+        await db.run(insert_user, write=True)
 
         return {
             "message": "User registered successfully",
@@ -601,11 +561,11 @@ async def verify_reset_otp(
             raise HTTPException(status_code=400, detail="Password must contain at least one number")
 
         # Verify OTP
-        if not verify_otp(email, otp):
+        if not await verify_email_otp(email, otp):
             raise HTTPException(status_code=400, detail="Invalid or expired OTP")
 
         # Update password
-        if not update_user_password(email, new_password):
+        if not await update_user_password(email, new_password):
             raise HTTPException(status_code=500, detail="Failed to update password")
 
         return {
@@ -639,21 +599,28 @@ async def send_otp(request: SendOtpRequest):
             print(f"[API ERROR] {error_msg}: {phone_number}")
             raise HTTPException(status_code=400, detail={"error": error_msg, "code": "INVALID_PHONE_FORMAT"})
 
+        retry_after = await check_otp_rate_limit("phone:" + phone_number)
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail={"error": "Too many OTP requests", "code": "RATE_LIMITED", "retry_after": retry_after},
+                headers={"Retry-After": str(retry_after)}
+            )
+
         # Generate 6-digit OTP
         otp = generate_otp()
         print(f"[API] Generated OTP: {otp} for phone: {phone_number}")
 
         # Store OTP with session ID
-        session_id = store_phone_otp(phone_number, otp)
+        session_id = await store_phone_otp(phone_number, otp)
         print(f"[API] Stored OTP with session ID: {session_id}")
 
         # Send OTP via SMS with enhanced error handling
-        sms_result = send_sms_otp(phone_number, otp)
+        sms_result = await send_sms_otp(phone_number, otp)
 
         if not sms_result["success"]:
             # Clean up OTP storage if SMS failed
-            if session_id in phone_otp_storage:
-                del phone_otp_storage[session_id]
+            await otp_store.delete("phone:" + session_id)
 
             error_detail = {
                 "error": "Failed to send OTP via SMS",
@@ -671,7 +638,7 @@ async def send_otp(request: SendOtpRequest):
             "phone_number": phone_number[-4:] + "****",  # Mask phone number
             "provider": sms_result.get("provider", "development"),
             "details": sms_result.get("message", "OTP sent"),
-            "expires_in": 600  # 10 minutes in seconds
+            "expires_in": int(otp_store.ttl)
         }
 
         print(f"[SUCCESS] [API] OTP sent successfully: {success_response}")
@@ -726,56 +693,40 @@ async def verify_otp(request: VerifyOtpRequest):
             raise HTTPException(status_code=400, detail={"error": error_msg, "code": "INVALID_OTP_FORMAT"})
 
         # Verify OTP
-        is_valid = verify_phone_otp(session_id, otp)
-
-        if not is_valid:
-            # Check if session still exists and get detailed error info
-            if session_id in phone_otp_storage:
-                session_data = phone_otp_storage[session_id]
-                attempts_left = 3 - session_data["attempts"]
-
-                # Check if expired
-                if datetime.now(pytz.UTC) > session_data["expiry"]:
-                    # Clean up expired session
-                    del phone_otp_storage[session_id]
-                    error_detail = {
-                        "error": "OTP has expired",
-                        "code": "OTP_EXPIRED",
-                        "details": "Please request a new OTP"
-                    }
-                    print(f"[ERROR] [API] OTP expired for session: {session_id}")
-                    raise HTTPException(status_code=400, detail=error_detail)
-
-                # Check if max attempts reached
-                if session_data["attempts"] >= 3:
-                    # Clean up session after max attempts
-                    del phone_otp_storage[session_id]
-                    error_detail = {
-                        "error": "Maximum attempts exceeded",
-                        "code": "MAX_ATTEMPTS_EXCEEDED",
-                        "details": "Please request a new OTP",
-                        "attempts_used": 3
-                    }
-                    print(f"[ERROR] [API] Max attempts exceeded for session: {session_id}")
-                    raise HTTPException(status_code=400, detail=error_detail)
-
-                # Invalid OTP with attempts remaining
-                error_detail = {
-                    "error": f"Invalid OTP. {attempts_left} attempts remaining",
-                    "code": "INVALID_OTP",
-                    "attempts_left": attempts_left,
-                    "attempts_used": session_data["attempts"]
-                }
-                print(f"[ERROR] [API] Invalid OTP. Attempts left: {attempts_left}")
-                raise HTTPException(status_code=400, detail=error_detail)
-            else:
-                error_detail = {
-                    "error": "Session expired or invalid",
-                    "code": "SESSION_INVALID",
-                    "details": "Please request a new OTP"
-                }
-                print(f"[ERROR] [API] Session not found: {session_id}")
-                raise HTTPException(status_code=400, detail=error_detail)
+        result = await verify_phone_otp(session_id, otp)
+
+        if result.status == OTP_MISSING:
+            # Never issued, expired (and swept) or locked earlier
+            error_detail = {
+                "error": "Session expired or invalid",
+                "code": "SESSION_INVALID",
+                "details": "Please request a new OTP"
+            }
+            print(f"[ERROR] [API] Session not found: {session_id}")
+            raise HTTPException(status_code=400, detail=error_detail)
+
+        if result.status == OTP_LOCKED:
+            # The store has already dropped the session
+            error_detail = {
+                "error": "Maximum attempts exceeded",
+                "code": "MAX_ATTEMPTS_EXCEEDED",
+                "details": "Please request a new OTP",
+                "attempts_used": result.attempts
+            }
+            print(f"[ERROR] [API] Max attempts exceeded for session: {session_id}")
+            raise HTTPException(status_code=400, detail=error_detail)
+
+        if result.status != OTP_VERIFIED:
+            # Invalid OTP with attempts remaining
+            attempts_left = otp_store.max_attempts - result.attempts
+            error_detail = {
+                "error": f"Invalid OTP. {attempts_left} attempts remaining",
+                "code": "INVALID_OTP",
+                "attempts_left": attempts_left,
+                "attempts_used": result.attempts
+            }
+            print(f"[ERROR] [API] Invalid OTP. Attempts left: {attempts_left}")
+            raise HTTPException(status_code=400, detail=error_detail)
 
         # Success response
         success_response = {
@@ -783,7 +734,7 @@ async def verify_otp(request: VerifyOtpRequest):
             "message": "OTP verified successfully",
             "phone_number": phone_number[-4:] + "****",
             "verified": True,
-            "attempts_used": phone_otp_storage.get(session_id, {}).get("attempts", 0)
+            "attempts_used": result.attempts
         }
 
         print(f"[SUCCESS] [API] OTP verified successfully: {success_response}")
@@ -803,12 +754,47 @@ async def verify_otp(request: VerifyOtpRequest):
             }
         )
 
+# ==================== MEDIA ====================
+
+# Uploaded images are kept as content-addressed thumbnails under MEDIA_ROOT
+# (see app/services/media.py); rows only store "<kind>/<sha256>"
+media_store = create_media_store()
+avatar_store = create_avatar_store(media_store, max_bytes=settings.MAX_FILE_SIZE)
+profile_photo_store = create_profile_photo_store(media_store, max_bytes=settings.MAX_FILE_SIZE)
+thumbnail_stores = {store.kind: store for store in (avatar_store, profile_photo_store)}
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+async def store_uploaded_image(request: Request, store) -> str:
+    """Stream a multipart "file" upload to a temp file and store its thumbnails. Returns the reference"""
+    upload = await receive_upload(request, settings.MAX_FILE_SIZE)
+    try:
+        return await asyncio.to_thread(store.save_file, upload)
+    finally:
+        upload.close()
+
+@app.get("/media/{kind}/{file_name}")
+async def get_media(kind: str, file_name: str, if_none_match: Optional[str] = Header(None, alias="If-None-Match")):
+    """Serve a stored thumbnail. Names are content hashes, so they never change"""
+    store = thumbnail_stores.get(kind)
+    if store is None:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    etag = '"' + file_name.split(".")[0] + '"'
+    headers = {"ETag": etag, "Cache-Control": MEDIA_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    data = await asyncio.to_thread(store.read, file_name)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return Response(content=data, media_type="image/webp", headers=headers)
+
 # ==================== BOUNCER SERVICE PROFILES ====================
 
 # Database schema for service profiles
 def init_service_profiles_table():
     """Create service profiles table if it doesn't exist"""
-    conn = sqlite3.connect("test_bouncer.db")
+    conn = db_pool.connection()
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -831,13 +817,21 @@ def init_service_profiles_table():
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
     """)
+    ensure_versions_table(conn)
 
     conn.commit()
-    conn.close()
 
 # Initialize the table
 init_service_profiles_table()
 
+# The public catalog is served from one pre-serialized body per catalog
+# version. Anything that changes what the catalog shows (profile create,
+# update, delete, bouncer name changes) must bump_version(conn, SERVICE_CATALOG)
+# in its write transaction.
+SERVICE_CATALOG = "service_catalog"
+catalog_cache = VersionedResponseCache(SERVICE_CATALOG)
+CATALOG_CACHE_CONTROL = "public, no-cache"
+
 class ServiceProfileCreate(BaseModel):
     profile_type: str
     name: Optional[str] = None
@@ -859,6 +853,99 @@ class ServiceProfileUpdate(BaseModel):
     members: Optional[list] = None
     is_active: Optional[bool] = None
 
+# ==================== BOOKINGS ====================
+
+def init_bookings_table():
+    """Add the structured booking columns and the indexes behind the booking lists"""
+    conn = db_pool.connection()
+    cursor = conn.cursor()
+
+    # book_type and member_count used to live only inside the free-text
+    # special_requirements string. Older rows get book_type here, classified
+    # the way the individual/group lists used to match them, so they stay
+    # listed; migrate_booking_types.py also fills in their member_count
+    cursor.execute("PRAGMA table_info(bookings)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "book_type" not in columns:
+        cursor.execute("ALTER TABLE bookings ADD COLUMN book_type TEXT")
+    if "member_count" not in columns:
+        cursor.execute("ALTER TABLE bookings ADD COLUMN member_count INTEGER")
+    cursor.execute("""
+        UPDATE bookings
+        SET book_type = CASE
+            WHEN special_requirements LIKE '%Book Type: individual%' THEN 'individual'
+            ELSE 'group'
+        END
+        WHERE book_type IS NULL
+        AND (special_requirements LIKE '%Book Type: individual%'
+             OR special_requirements LIKE '%Book Type: group%')
+    """)
+    if cursor.rowcount > 0:
+        print(f"[BOOKING] Set book_type on {cursor.rowcount} older bookings")
+
+    # Each index matches a list's filter plus its (sort column, id) keyset,
+    # so every page is a single index seek regardless of table size
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status_created ON bookings (status, created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status_updated ON bookings (status, updated_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_user_created ON bookings (user_id, created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status_type_created ON bookings (status, book_type, created_at, id)")
+
+    # Dashboard rollups; seeded from existing bookings the first time
+    if ensure_rollup_table(conn):
+        rebuild_rollups(conn)
+
+    # bookings.user_id is declared UUID (NUMERIC affinity) while users.id is
+    # TEXT, so list queries join on CAST(b.user_id AS TEXT) to keep the
+    # users primary-key index usable instead of scanning users per row
+
+    # Change feed behind /api/bookings/changes
+    ensure_feed_table(conn)
+
+    conn.commit()
+
+init_bookings_table()
+
+# Booking creates and status changes are recorded in booking_changes in the
+# same transaction and pushed to open dashboards over Server-Sent Events
+# (see app/services/booking_feed.py), so dashboards no longer need to poll
+# the booking lists and metrics.
+BOOKING_FEED_RETENTION = int(os.getenv("BOOKING_FEED_RETENTION", "10000"))
+BOOKING_FEED_HEARTBEAT = float(os.getenv("BOOKING_FEED_HEARTBEAT", "15"))
+booking_feed = BookingFeed(
+    db,
+    poll_interval=float(os.getenv("BOOKING_FEED_POLL_INTERVAL", "1")),
+    queue_size=int(os.getenv("BOOKING_FEED_QUEUE_SIZE", "1000")),
+)
+
+@app.on_event("startup")
+async def start_booking_feed():
+    await booking_feed.start()
+
+@app.on_event("shutdown")
+async def stop_booking_feed():
+    await booking_feed.stop()
+
+# With SOCKETIO_MESSAGE_QUEUE set, changes also reach Socket.IO clients of
+# the realtime service (app/services/websocket.py) through the message queue
+if settings.SOCKETIO_MESSAGE_QUEUE:
+    from app.services.websocket import emitter as socketio_emitter, notify_booking_status_change
+
+    @app.on_event("shutdown")
+    async def flush_socketio_emits():
+        await socketio_emitter.stop()
+else:
+    notify_booking_status_change = None
+
+async def publish_booking_change(change: Optional[Dict], changed_by: str):
+    """Push a committed change to subscribers; a failed push never fails the request"""
+    booking_feed.notify()
+    if change is None or notify_booking_status_change is None:
+        return
+    try:
+        await notify_booking_status_change(change["booking_id"], change["old_status"], change["new_status"], changed_by, change=change)
+    except Exception as e:
+        print(f"[FEED ERROR] Socket.IO emit for booking {change['booking_id']} failed: {e}")
+
 class BookingRequestCreate(BaseModel):
     eventName: str
     location: str
@@ -869,35 +956,18 @@ class BookingRequestCreate(BaseModel):
     bookType: str  # 'individual' or 'group'
     memberCount: Optional[int] = None
 
+BOOK_TYPES = ('individual', 'group')
+
 @app.post("/api/bookings/")
-async def create_booking_request(booking: BookingRequestCreate, authorization: Optional[str] = Header(None, alias="Authorization")):
+async def create_booking_request(booking: BookingRequestCreate, current_user: dict = Depends(get_current_user), db: AsyncSQLite = Depends(get_db)):
     """Create a new booking request from user"""
     try:
-        # Get and validate token
-        token = authorization
         print(f"[BOOKING] Creating booking request")
+        user_id = current_user["sub"]
 
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        if token.startswith("Bearer "):
-            token = token[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        # Connect to database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
+        # Only these two show up in the individual/group request lists
+        if booking.bookType not in BOOK_TYPES:
+            raise HTTPException(status_code=400, detail=f"Invalid book type. Must be one of: {', '.join(BOOK_TYPES)}")
 
         # Generate unique ID for booking
         booking_id = str(uuid.uuid4())
@@ -911,7 +981,6 @@ async def create_booking_request(booking: BookingRequestCreate, authorization: O
             # For now, assume 4 hour duration
             end_datetime = start_datetime + timedelta(hours=4)
         except ValueError:
-            conn.close()
             raise HTTPException(status_code=400, detail="Invalid date or time format")
 
         # Calculate total amount (assuming price is per hour and 4 hour duration)
@@ -923,31 +992,36 @@ async def create_booking_request(booking: BookingRequestCreate, authorization: O
         # Using a placeholder bouncer_id for now (will need to be updated when bouncer accepts)
         placeholder_bouncer_id = "00000000-0000-0000-0000-000000000000"
 
-        # Insert booking into database
-        cursor.execute("""
-            INSERT INTO bookings (
-                id, user_id, bouncer_id, event_name, event_description,
-                event_location_address, start_datetime, end_datetime,
-                hourly_rate, total_amount, special_requirements, status,
-                created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        """, (
-            booking_id,
-            user_id,
-            placeholder_bouncer_id,  # Placeholder until bouncer accepts
-            booking.eventName,
-            booking.description or '',
-            booking.location,
-            start_datetime.isoformat(),
-            end_datetime.isoformat(),
-            hourly_rate,
-            total_amount,
-            f"Book Type: {booking.bookType}" + (f", Member Count: {booking.memberCount}" if booking.memberCount else ""),
-            'pending'
-        ))
-
-        conn.commit()
-        conn.close()
+        # Insert booking and count it in the dashboard rollup in one transaction
+        def insert_booking(conn):
+            conn.execute("""
+                INSERT INTO bookings (
+                    id, user_id, bouncer_id, event_name, event_description,
+                    event_location_address, start_datetime, end_datetime,
+                    hourly_rate, total_amount, special_requirements, status,
+                    book_type, member_count, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            """, (
+                booking_id,
+                user_id,
+                placeholder_bouncer_id,  # Placeholder until bouncer accepts
+                booking.eventName,
+                booking.description or '',
+                booking.location,
+                start_datetime.isoformat(),
+                end_datetime.isoformat(),
+                hourly_rate,
+                total_amount,
+                f"Book Type: {booking.bookType}" + (f", Member Count: {booking.memberCount}" if booking.memberCount else ""),
+                'pending',
+                booking.bookType,
+                booking.memberCount
+            ))
+            apply_booking_delta(conn, booking_id, +1)
+            return record_booking_change(conn, booking_id, "created", None, user_id, BOOKING_FEED_RETENTION)
+
+        change = await db.run(insert_booking, write=True)
+        await publish_booking_change(change, user_id)
 
         print(f"[BOOKING] Created booking request {booking_id} for user {user_id}")
 
@@ -965,37 +1039,17 @@ async def create_booking_request(booking: BookingRequestCreate, authorization: O
         raise HTTPException(status_code=500, detail=f"Failed to create booking request: {str(e)}")
 
 @app.get("/api/bookings/user")
-async def get_user_bookings(authorization: Optional[str] = Header(None, alias="Authorization")):
+async def get_user_bookings(limit: Optional[int] = None, cursor: Optional[str] = None, current_user: dict = Depends(get_current_user), db: AsyncSQLite = Depends(get_db)):
     """Get all bookings for the authenticated user"""
     try:
-        # Get and validate token
-        token = authorization
         print(f"[BOOKING] Getting user bookings")
+        user_id = current_user["sub"]
 
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        if token.startswith("Bearer "):
-            token = token[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+        page_size = requested_page_size(limit, cursor)
+        keyset, keyset_params = keyset_condition(cursor, "b.created_at", "b.id")
 
-        # Connect to database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        # Get all bookings for this user
-        cursor.execute("""
+        # Get bookings for this user, newest first (one page if limit or cursor is given)
+        rows = await db.fetchall(f"""
             SELECT
                 b.id, b.bouncer_id, b.event_name, b.event_description,
                 b.event_location_address, b.start_datetime, b.end_datetime,
@@ -1003,11 +1057,14 @@ async def get_user_bookings(authorization: Optional[str] = Header(None, alias="A
                 b.status, b.created_at, b.updated_at
             FROM bookings b
             WHERE b.user_id = ?
-            ORDER BY b.created_at DESC
-        """, (user_id,))
+            {keyset}
+            ORDER BY b.created_at DESC, b.id DESC
+            LIMIT ?
+        """, (user_id, *keyset_params, fetch_limit(page_size)))
+        rows, next_cursor = keyset_page(rows, page_size, sort_index=11)
 
         bookings = []
-        for row in cursor.fetchall():
+        for row in rows:
             booking = {
                 "id": row[0],
                 "bouncer_id": row[1],
@@ -1025,14 +1082,13 @@ async def get_user_bookings(authorization: Optional[str] = Header(None, alias="A
             }
             bookings.append(booking)
 
-        conn.close()
-
         print(f"[BOOKING] Found {len(bookings)} bookings for user {user_id}")
 
         return {
             "success": True,
             "bookings": bookings,
-            "count": len(bookings)
+            "count": len(bookings),
+            "next_cursor": next_cursor
         }
 
     except HTTPException:
@@ -1042,37 +1098,17 @@ async def get_user_bookings(authorization: Optional[str] = Header(None, alias="A
         raise HTTPException(status_code=500, detail=f"Failed to fetch bookings: {str(e)}")
 
 @app.get("/api/bookings/pending")
-async def get_pending_bookings(authorization: Optional[str] = Header(None, alias="Authorization")):
+async def get_pending_bookings(limit: Optional[int] = None, cursor: Optional[str] = None, current_user: dict = Depends(get_current_user), db: AsyncSQLite = Depends(get_db)):
     """Get all pending booking requests (for bouncers to view)"""
     try:
-        # Get and validate token
-        token = authorization
         print(f"[BOOKING] Getting pending booking requests")
+        user_id = current_user["sub"]
 
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        if token.startswith("Bearer "):
-            token = token[7:]
+        page_size = requested_page_size(limit, cursor)
+        keyset, keyset_params = keyset_condition(cursor, "b.created_at", "b.id")
 
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        # Connect to database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        # Get all pending bookings with user information
-        cursor.execute("""
+        # Get pending bookings with user information (one page if limit or cursor is given)
+        rows = await db.fetchall(f"""
             SELECT
                 b.id, b.user_id, b.event_name, b.event_description,
                 b.event_location_address, b.start_datetime, b.end_datetime,
@@ -1080,13 +1116,16 @@ async def get_pending_bookings(authorization: Optional[str] = Header(None, alias
                 b.status, b.created_at,
                 u.first_name, u.last_name, u.email, u.phone
             FROM bookings b
-            LEFT JOIN users u ON b.user_id = u.id
+            LEFT JOIN users u ON u.id = CAST(b.user_id AS TEXT)
             WHERE b.status = 'pending'
-            ORDER BY b.created_at DESC
-        """)
+            {keyset}
+            ORDER BY b.created_at DESC, b.id DESC
+            LIMIT ?
+        """, (*keyset_params, fetch_limit(page_size)))
+        rows, next_cursor = keyset_page(rows, page_size, sort_index=11)
 
         bookings = []
-        for row in cursor.fetchall():
+        for row in rows:
             booking = {
                 "id": row[0],
                 "user_id": row[1],
@@ -1109,8 +1148,6 @@ async def get_pending_bookings(authorization: Optional[str] = Header(None, alias
             }
             bookings.append(booking)
 
-        conn.close()
-
         print(f"[BOOKING] Found {len(bookings)} pending booking requests")
         if bookings:
             print(f"[BOOKING] Sample booking data: {bookings[0]}")
@@ -1118,7 +1155,8 @@ async def get_pending_bookings(authorization: Optional[str] = Header(None, alias
         return {
             "success": True,
             "bookings": bookings,
-            "count": len(bookings)
+            "count": len(bookings),
+            "next_cursor": next_cursor
         }
 
     except HTTPException:
@@ -1128,37 +1166,17 @@ async def get_pending_bookings(authorization: Optional[str] = Header(None, alias
         raise HTTPException(status_code=500, detail=f"Failed to fetch pending bookings: {str(e)}")
 
 @app.get("/api/bookings/see-later")
-async def get_see_later_bookings(authorization: Optional[str] = Header(None, alias="Authorization")):
+async def get_see_later_bookings(limit: Optional[int] = None, cursor: Optional[str] = None, current_user: dict = Depends(get_current_user), db: AsyncSQLite = Depends(get_db)):
     """Get all 'see later' booking requests (for bouncers to review deferred requests)"""
     try:
-        # Get and validate token
-        token = authorization
         print(f"[BOOKING] Getting see later booking requests")
+        user_id = current_user["sub"]
 
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
+        page_size = requested_page_size(limit, cursor)
+        keyset, keyset_params = keyset_condition(cursor, "b.updated_at", "b.id")
 
-        if token.startswith("Bearer "):
-            token = token[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        # Connect to database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        # Get all see_later bookings with user information
-        cursor.execute("""
+        # Get see_later bookings with user information (one page if limit or cursor is given)
+        rows = await db.fetchall(f"""
             SELECT
                 b.id, b.user_id, b.event_name, b.event_description,
                 b.event_location_address, b.start_datetime, b.end_datetime,
@@ -1166,13 +1184,16 @@ async def get_see_later_bookings(authorization: Optional[str] = Header(None, ali
                 b.status, b.created_at, b.updated_at,
                 u.first_name, u.last_name, u.email, u.phone
             FROM bookings b
-            LEFT JOIN users u ON b.user_id = u.id
+            LEFT JOIN users u ON u.id = CAST(b.user_id AS TEXT)
             WHERE b.status = 'see_later'
-            ORDER BY b.updated_at DESC
-        """)
+            {keyset}
+            ORDER BY b.updated_at DESC, b.id DESC
+            LIMIT ?
+        """, (*keyset_params, fetch_limit(page_size)))
+        rows, next_cursor = keyset_page(rows, page_size, sort_index=12)
 
         bookings = []
-        for row in cursor.fetchall():
+        for row in rows:
             booking = {
                 "id": row[0],
                 "user_id": row[1],
@@ -1196,8 +1217,6 @@ async def get_see_later_bookings(authorization: Optional[str] = Header(None, ali
             }
             bookings.append(booking)
 
-        conn.close()
-
         print(f"[BOOKING] Found {len(bookings)} see later booking requests")
         if bookings:
             print(f"[BOOKING] Sample see later booking: {bookings[0]}")
@@ -1205,7 +1224,8 @@ async def get_see_later_bookings(authorization: Optional[str] = Header(None, ali
         return {
             "success": True,
             "bookings": bookings,
-            "count": len(bookings)
+            "count": len(bookings),
+            "next_cursor": next_cursor
         }
 
     except HTTPException:
@@ -1218,60 +1238,47 @@ async def get_see_later_bookings(authorization: Optional[str] = Header(None, ali
 async def update_booking_status(
     booking_id: str,
     status: str,
-    authorization: Optional[str] = Header(None, alias="Authorization")
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSQLite = Depends(get_db)
 ):
     """Update booking status (pending, see_later, accepted, rejected)"""
     try:
-        # Get and validate token
-        token = authorization
         print(f"[BOOKING] Updating booking {booking_id} status to {status}")
-
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        if token.startswith("Bearer "):
-            token = token[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+        user_id = current_user["sub"]
 
         # Validate status
         valid_statuses = ['pending', 'see_later', 'accepted', 'rejected', 'cancelled']
         if status not in valid_statuses:
             raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
 
-        # Connect to database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
+        def apply_status(conn):
+            cursor = conn.cursor()
 
-        # Get current booking status
-        cursor.execute("SELECT status FROM bookings WHERE id = ?", (booking_id,))
-        result = cursor.fetchone()
+            # Get current booking status
+            cursor.execute("SELECT status FROM bookings WHERE id = ?", (booking_id,))
+            result = cursor.fetchone()
 
-        if not result:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Booking not found")
+            if not result:
+                raise HTTPException(status_code=404, detail="Booking not found")
 
-        old_status = result[0]
+            # Same status again: nothing to write, count or publish
+            if result[0] == status:
+                return result[0], None
 
-        # Update booking status
-        cursor.execute("""
-            UPDATE bookings
-            SET status = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (status, booking_id))
+            # Update booking status, moving it between rollup buckets
+            apply_booking_delta(conn, booking_id, -1)
+            cursor.execute("""
+                UPDATE bookings
+                SET status = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (status, booking_id))
+            apply_booking_delta(conn, booking_id, +1)
+
+            return result[0], record_booking_change(conn, booking_id, "status_changed", result[0], user_id, BOOKING_FEED_RETENTION)
 
-        conn.commit()
-        conn.close()
+        old_status, change = await db.run(apply_status, write=True)
+        if change is not None:
+            await publish_booking_change(change, user_id)
 
         print(f"[BOOKING] Updated booking {booking_id} from {old_status} to {status}")
 
@@ -1289,140 +1296,122 @@ async def update_booking_status(
         print(f"[ERROR] Error updating booking status: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update booking status: {str(e)}")
 
-@app.get("/api/bouncer/dashboard/metrics")
-async def get_dashboard_metrics(authorization: Optional[str] = Header(None, alias="Authorization")):
-    """Get comprehensive dashboard metrics for bouncer including active bookings, monthly stats, and ratings"""
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    """Parse a change feed event id from a query parameter or Last-Event-ID header"""
+    if value is None or not value.strip():
+        return None
     try:
-        # Get and validate token
-        token = authorization
-        print(f"[DASHBOARD] Getting dashboard metrics")
-
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        if token.startswith("Bearer "):
-            token = token[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-            user_email = payload.get("email")
-
-            if not user_email or not user_email.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user email")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        # Connect to database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        # Get bouncer's user ID from email
-        cursor.execute("SELECT id FROM users WHERE email = ?", (user_email,))
-        user_result = cursor.fetchone()
-
-        if not user_result:
-            conn.close()
-            raise HTTPException(status_code=404, detail="User not found")
-
-        bouncer_user_id = user_result[0]
-
-        # 1. Get Active Bookings count (accepted or in_progress status)
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM bookings
-            WHERE bouncer_id IN (
-                SELECT id FROM service_profiles WHERE user_id = ?
-            )
-            AND status IN ('accepted', 'in_progress')
-        """, (bouncer_user_id,))
-
-        active_bookings_count = cursor.fetchone()[0] or 0
-
-        # 2. Get This Month Statistics
-        from datetime import datetime
-        current_month = datetime.now().strftime('%Y-%m')
-
-        cursor.execute("""
-            SELECT
-                COUNT(*) as bookings_count,
-                COALESCE(SUM(total_amount), 0) as total_revenue,
-                COALESCE(SUM(
-                    (julianday(end_datetime) - julianday(start_datetime)) * 24
-                ), 0) as total_hours
-            FROM bookings
-            WHERE bouncer_id IN (
-                SELECT id FROM service_profiles WHERE user_id = ?
-            )
-            AND status IN ('completed', 'accepted', 'in_progress')
-            AND strftime('%Y-%m', start_datetime) = ?
-        """, (bouncer_user_id, current_month))
-
-        month_stats = cursor.fetchone()
-        monthly_bookings = month_stats[0] or 0
-        monthly_revenue = float(month_stats[1]) if month_stats[1] else 0.0
-        monthly_hours = round(float(month_stats[2])) if month_stats[2] else 0
-
-        # 3. Get Rating Information
-        # For now, we'll calculate from completed bookings
-        # In future, this should come from a reviews/ratings table
-        cursor.execute("""
-            SELECT COUNT(*) as total_bookings
-            FROM bookings
-            WHERE bouncer_id IN (
-                SELECT id FROM service_profiles WHERE user_id = ?
-            )
-            AND status = 'completed'
-        """, (bouncer_user_id,))
-
-        completed_bookings = cursor.fetchone()[0] or 0
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid event id")
+
+@app.get("/api/bookings/changes")
+async def stream_booking_changes(
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Server-Sent Events stream of booking changes visible to the caller.
+
+    Bouncers and admins receive every booking (the pending and see-later
+    lists are shared); customers receive their own bookings. Each event's id
+    can be sent back as Last-Event-ID (browsers do this on reconnect) or
+    ?last_event_id= to resume without gaps. A 'reset' event means the
+    requested position is no longer retained: reload the lists once.
+    """
+    user_id = current_user["sub"]
+    role = current_user.get("role")
+    # The header wins: it is what a reconnecting EventSource sends
+    resume_from = parse_event_id(last_event_id_header)
+    if resume_from is None:
+        resume_from = parse_event_id(last_event_id)
+
+    print(f"[FEED] User {user_id} ({role}) subscribed from event {resume_from}")
+
+    async def event_stream():
+        yield "retry: 3000\n\n"
+        async for event in booking_feed.subscribe(user_id, role, resume_from, heartbeat=BOOKING_FEED_HEARTBEAT):
+            # Comment frames keep proxies from closing an idle stream
+            yield ": keep-alive\n\n" if event is None else format_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/bookings/changes/since")
+async def get_booking_changes_since(after: Optional[str] = None, limit: int = 100, current_user: dict = Depends(get_current_user)):
+    """Booking changes after an event id, for Socket.IO clients catching up after a reconnect.
+
+    Without `after`, returns no changes and the current position: read it
+    before loading the lists, then resume from it.
+    """
+    try:
+        after_id = parse_event_id(after)
+        if after_id is None:
+            return {"success": True, "changes": [], "next_id": await booking_feed.latest_id(), "reset": False}
 
-        # Default rating calculation (placeholder until reviews system is implemented)
-        # Using a simple metric: completion rate contributes to rating
-        cursor.execute("""
-            SELECT
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed
-            FROM bookings
-            WHERE bouncer_id IN (
-                SELECT id FROM service_profiles WHERE user_id = ?
-            )
-            AND status IN ('completed', 'cancelled', 'rejected')
-        """, (bouncer_user_id,))
+        changes, next_id, reset_from = await booking_feed.changes_since(
+            after_id, current_user["sub"], current_user.get("role"), clamp_page_size(limit)
+        )
+        return {
+            "success": True,
+            "changes": changes,
+            "next_id": next_id,
+            "reset": reset_from is not None
+        }
 
-        rating_data = cursor.fetchone()
-        total_jobs = rating_data[0] or 0
-        completed_jobs = rating_data[1] or 0
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Error fetching booking changes: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch booking changes: {str(e)}")
 
-        # Calculate rating based on completion rate (placeholder)
+@app.get("/api/bouncer/dashboard/metrics")
+async def get_dashboard_metrics(current_user: dict = Depends(get_current_user), db: AsyncSQLite = Depends(get_db)):
+    """Get comprehensive dashboard metrics for bouncer including active bookings, monthly stats, and ratings"""
+    try:
+        print(f"[DASHBOARD] Getting dashboard metrics")
+        user_id = current_user["sub"]
+        user_email = current_user.get("email")
+
+        if not user_email or not user_email.strip():
+            raise HTTPException(status_code=401, detail="Invalid token: missing user email")
+
+        def read_dashboard(conn):
+            # Single indexed read: the user row plus all of the bouncer's
+            # rollup buckets (see app/services/booking_rollups.py)
+            rows = conn.execute("""
+                SELECT u.id, r.month, r.status, r.booking_count, r.revenue, r.hours
+                FROM users u
+                LEFT JOIN bouncer_monthly_stats r
+                    ON r.bouncer_user_id = u.id AND r.booking_count != 0
+                WHERE u.email = ?
+            """, (user_email,)).fetchall()
+
+            if not rows:
+                raise HTTPException(status_code=404, detail="User not found")
+
+            return [row[1:] for row in rows if row[1] is not None]
+
+        rollup = summarize(await db.run(read_dashboard), datetime.now().strftime('%Y-%m'))
+
+        active_bookings_count = rollup["active_bookings"]
+        monthly_bookings = rollup["monthly_bookings"]
+        monthly_revenue = float(rollup["monthly_revenue"])
+        monthly_hours = round(rollup["monthly_hours"])
+        completed_bookings = rollup["completed_bookings"]
+        total_jobs = rollup["finished_jobs"]
+        status_breakdown = rollup["status_breakdown"]
+
+        # Rating placeholder until a reviews system exists: completion rate
+        # over finished jobs, scaled from 3.0 to 5.0
         if total_jobs > 0:
-            completion_rate = completed_jobs / total_jobs
-            average_rating = 3.0 + (completion_rate * 2.0)  # Scale from 3.0 to 5.0
-            average_rating = round(average_rating, 1)
+            average_rating = round(3.0 + (completed_bookings / total_jobs) * 2.0, 1)
         else:
             average_rating = 0.0
 
-        # 4. Get recent activity summary
-        cursor.execute("""
-            SELECT
-                status,
-                COUNT(*) as count
-            FROM bookings
-            WHERE bouncer_id IN (
-                SELECT id FROM service_profiles WHERE user_id = ?
-            )
-            GROUP BY status
-        """, (bouncer_user_id,))
-
-        status_breakdown = {}
-        for row in cursor.fetchall():
-            status_breakdown[row[0]] = row[1]
-
-        conn.close()
-
         metrics = {
             "success": True,
             "active_bookings": {
@@ -1457,52 +1446,36 @@ async def get_dashboard_metrics(authorization: Optional[str] = Header(None, alia
         raise HTTPException(status_code=500, detail=f"Failed to fetch dashboard metrics: {str(e)}")
 
 @app.get("/api/bookings/individual")
-async def get_individual_booking_requests(authorization: Optional[str] = Header(None, alias="Authorization")):
+async def get_individual_booking_requests(limit: Optional[int] = None, cursor: Optional[str] = None, current_user: dict = Depends(get_current_user), db: AsyncSQLite = Depends(get_db)):
     """Get all pending individual booking requests (for bouncers to view)"""
     try:
-        # Get and validate token
-        token = authorization
         print(f"[BOOKING] Getting individual booking requests")
+        user_id = current_user["sub"]
 
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        if token.startswith("Bearer "):
-            token = token[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+        page_size = requested_page_size(limit, cursor)
+        keyset, keyset_params = keyset_condition(cursor, "b.created_at", "b.id")
 
-        # Connect to database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        # Get pending bookings where special_requirements contains "Book Type: individual"
-        cursor.execute("""
+        # Get a page of pending individual bookings (served by idx_bookings_status_type_created)
+        rows = await db.fetchall(f"""
             SELECT
                 b.id, b.user_id, b.event_name, b.event_description,
                 b.event_location_address, b.start_datetime, b.end_datetime,
                 b.hourly_rate, b.total_amount, b.special_requirements,
                 b.status, b.created_at,
-                u.first_name, u.last_name, u.email, u.phone
+                u.first_name, u.last_name, u.email, u.phone,
+                b.book_type, b.member_count
             FROM bookings b
-            LEFT JOIN users u ON b.user_id = u.id
+            LEFT JOIN users u ON u.id = CAST(b.user_id AS TEXT)
             WHERE b.status = 'pending'
-            AND b.special_requirements LIKE '%Book Type: individual%'
-            ORDER BY b.created_at DESC
-        """)
+            AND b.book_type = 'individual'
+            {keyset}
+            ORDER BY b.created_at DESC, b.id DESC
+            LIMIT ?
+        """, (*keyset_params, fetch_limit(page_size)))
+        rows, next_cursor = keyset_page(rows, page_size, sort_index=11)
 
         bookings = []
-        for row in cursor.fetchall():
+        for row in rows:
             booking = {
                 "id": row[0],
                 "user_id": row[1],
@@ -1516,6 +1489,8 @@ async def get_individual_booking_requests(authorization: Optional[str] = Header(
                 "special_requirements": row[9],
                 "status": row[10],
                 "created_at": row[11],
+                "book_type": row[16],
+                "member_count": row[17],
                 "user_info": {
                     "first_name": row[12] if row[12] else "Unknown",
                     "last_name": row[13] if row[13] else "",
@@ -1525,14 +1500,13 @@ async def get_individual_booking_requests(authorization: Optional[str] = Header(
             }
             bookings.append(booking)
 
-        conn.close()
-
         print(f"[BOOKING] Found {len(bookings)} individual booking requests")
 
         return {
             "success": True,
             "bookings": bookings,
             "count": len(bookings),
+            "next_cursor": next_cursor,
             "type": "individual"
         }
 
@@ -1543,52 +1517,36 @@ async def get_individual_booking_requests(authorization: Optional[str] = Header(
         raise HTTPException(status_code=500, detail=f"Failed to fetch individual bookings: {str(e)}")
 
 @app.get("/api/bookings/group")
-async def get_group_booking_requests(authorization: Optional[str] = Header(None, alias="Authorization")):
+async def get_group_booking_requests(limit: Optional[int] = None, cursor: Optional[str] = None, current_user: dict = Depends(get_current_user), db: AsyncSQLite = Depends(get_db)):
     """Get all pending group booking requests (for bouncers to view)"""
     try:
-        # Get and validate token
-        token = authorization
         print(f"[BOOKING] Getting group booking requests")
+        user_id = current_user["sub"]
 
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        if token.startswith("Bearer "):
-            token = token[7:]
+        page_size = requested_page_size(limit, cursor)
+        keyset, keyset_params = keyset_condition(cursor, "b.created_at", "b.id")
 
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        # Connect to database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        # Get pending bookings where special_requirements contains "Book Type: group"
-        cursor.execute("""
+        # Get a page of pending group bookings (served by idx_bookings_status_type_created)
+        rows = await db.fetchall(f"""
             SELECT
                 b.id, b.user_id, b.event_name, b.event_description,
                 b.event_location_address, b.start_datetime, b.end_datetime,
                 b.hourly_rate, b.total_amount, b.special_requirements,
                 b.status, b.created_at,
-                u.first_name, u.last_name, u.email, u.phone
+                u.first_name, u.last_name, u.email, u.phone,
+                b.book_type, b.member_count
             FROM bookings b
-            LEFT JOIN users u ON b.user_id = u.id
+            LEFT JOIN users u ON u.id = CAST(b.user_id AS TEXT)
             WHERE b.status = 'pending'
-            AND b.special_requirements LIKE '%Book Type: group%'
-            ORDER BY b.created_at DESC
-        """)
+            AND b.book_type = 'group'
+            {keyset}
+            ORDER BY b.created_at DESC, b.id DESC
+            LIMIT ?
+        """, (*keyset_params, fetch_limit(page_size)))
+        rows, next_cursor = keyset_page(rows, page_size, sort_index=11)
 
         bookings = []
-        for row in cursor.fetchall():
+        for row in rows:
             booking = {
                 "id": row[0],
                 "user_id": row[1],
@@ -1602,6 +1560,8 @@ async def get_group_booking_requests(authorization: Optional[str] = Header(None,
                 "special_requirements": row[9],
                 "status": row[10],
                 "created_at": row[11],
+                "book_type": row[16],
+                "member_count": row[17],
                 "user_info": {
                     "first_name": row[12] if row[12] else "Unknown",
                     "last_name": row[13] if row[13] else "",
@@ -1611,14 +1571,13 @@ async def get_group_booking_requests(authorization: Optional[str] = Header(None,
             }
             bookings.append(booking)
 
-        conn.close()
-
         print(f"[BOOKING] Found {len(bookings)} group booking requests")
 
         return {
             "success": True,
             "bookings": bookings,
             "count": len(bookings),
+            "next_cursor": next_cursor,
             "type": "group"
         }
 
@@ -1628,133 +1587,11 @@ async def get_group_booking_requests(authorization: Optional[str] = Header(None,
         print(f"[ERROR] Error fetching group bookings: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch group bookings: {str(e)}")
 
-@app.patch("/api/bookings/{booking_id}/status")
-async def update_booking_status(
-    booking_id: str,
-    status: str,
-    authorization: Optional[str] = Header(None, alias="Authorization")
-):
-    """Update booking status (for bouncers to accept/reject)"""
-    try:
-        # Get and validate token
-        token = authorization
-        print(f"[BOOKING] Updating booking {booking_id} status to {status}")
-
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        if token.startswith("Bearer "):
-            token = token[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        # Validate status
-        valid_statuses = ['pending', 'accepted', 'rejected', 'confirmed', 'completed', 'cancelled']
-        if status not in valid_statuses:
-            raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
-
-        # Connect to database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        # Check if booking exists
-        cursor.execute("SELECT id, user_id, status FROM bookings WHERE id = ?", (booking_id,))
-        booking = cursor.fetchone()
-
-        if not booking:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Booking not found")
-
-        # Update booking status and assign bouncer if accepting
-        if status == 'accepted':
-            cursor.execute("""
-                UPDATE bookings
-                SET status = ?, bouncer_id = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (status, user_id, booking_id))
-        else:
-            cursor.execute("""
-                UPDATE bookings
-                SET status = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (status, booking_id))
-
-        conn.commit()
-        conn.close()
-
-        print(f"[BOOKING] Updated booking {booking_id} to status {status}")
-
-        return {
-            "success": True,
-            "message": f"Booking status updated to {status}",
-            "booking_id": booking_id,
-            "status": status
-        }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"[ERROR] Error updating booking status: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to update booking status: {str(e)}")
-
 @app.post("/api/service-profiles")
-async def create_service_profile(profile: ServiceProfileCreate, authorization: Optional[str] = Header(None, alias="Authorization")):
+async def create_service_profile(profile: ServiceProfileCreate, current_user: dict = Depends(get_current_user), db: AsyncSQLite = Depends(get_db)):
     """Create a new service profile for bouncer"""
     try:
-        # Get token from Authorization header
-        token = authorization
-
-        print(f"[AUTH] Received authorization header: {authorization[:50] if authorization else 'None'}...")
-
-        # Verify JWT token
-        if not token:
-            print("[AUTH] No token provided in request")
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        # Remove 'Bearer ' prefix if present
-        if token.startswith("Bearer "):
-            token = token[7:]
-            print(f"[AUTH] Token after removing Bearer prefix: {token[:50]}...")
-
-        try:
-            # Decode and validate token
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-            user_email = payload.get("email")
-            user_role = payload.get("role")
-
-            print(f"[AUTH] Token decoded successfully. User ID: {user_id}, Email: {user_email}, Role: {user_role}")
-
-            if not user_id:
-                print("[AUTH] Token payload missing 'sub' field")
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-            # Additional validation: Ensure user_id is not just whitespace
-            if not user_id.strip():
-                print("[AUTH] Token has empty user ID")
-                raise HTTPException(status_code=401, detail="Invalid token: empty user ID")
-
-            print(f"[AUTH] User ID validated: {user_id}")
-
-        except jwt.ExpiredSignatureError:
-            print("[AUTH] Token has expired")
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            print(f"[AUTH] Invalid token error: {str(e)}")
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-        except Exception as e:
-            print(f"[AUTH] Unexpected token validation error: {str(e)}")
-            raise HTTPException(status_code=401, detail="Token validation failed")
+        user_id = current_user["sub"]
 
         # Validate profile type
         if profile.profile_type not in ['individual', 'group']:
@@ -1773,36 +1610,33 @@ async def create_service_profile(profile: ServiceProfileCreate, authorization: O
         # Convert members list to JSON string if exists
         members_json = None
         if profile.members:
-            import json
             members_json = json.dumps(profile.members)
 
         # Insert profile into database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO service_profiles
-            (id, user_id, profile_type, name, location, phone_number, amount_per_hour,
-             group_name, member_count, members, is_active)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-        """, (
-            profile_id,
-            user_id,
-            profile.profile_type,
-            profile.name,
-            profile.location,
-            profile.phone_number,
-            profile.amount_per_hour,
-            profile.group_name,
-            profile.member_count,
-            members_json
-        ))
+        def insert_profile(conn):
+            conn.execute("""
+                INSERT INTO service_profiles
+                (id, user_id, profile_type, name, location, phone_number, amount_per_hour,
+                 group_name, member_count, members, is_active)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            """, (
+                profile_id,
+                user_id,
+                profile.profile_type,
+                profile.name,
+                profile.location,
+                profile.phone_number,
+                profile.amount_per_hour,
+                profile.group_name,
+                profile.member_count,
+                members_json
+            ))
+            bump_version(conn, SERVICE_CATALOG)
+
+        await db.run(insert_profile, write=True)
 
         print(f"[PROFILE] Successfully inserted profile {profile_id} for user {user_id}")
 
-        conn.commit()
-        conn.close()
-
         return {
             "success": True,
             "message": "Profile saved successfully!",
@@ -1816,123 +1650,120 @@ async def create_service_profile(profile: ServiceProfileCreate, authorization: O
         print(f"Error creating service profile: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create profile: {str(e)}")
 
-@app.get("/api/service-profiles")
-async def get_all_service_profiles():
-    """Get all active service profiles for users to browse"""
-    try:
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        # Get all active profiles with user information
-        # Using LEFT JOIN to include profiles even if user_id is NULL or user doesn't exist
-        cursor.execute("""
-            SELECT
-                sp.id, sp.user_id, sp.profile_type, sp.name, sp.location,
-                sp.phone_number, sp.amount_per_hour, sp.group_name,
-                sp.member_count, sp.members, sp.created_at,
-                u.first_name, u.last_name, u.email
-            FROM service_profiles sp
-            LEFT JOIN users u ON sp.user_id = u.id
-            WHERE sp.is_active = 1
-            ORDER BY sp.created_at DESC
-        """)
-
-        profiles = []
-        for row in cursor.fetchall():
-            import json
-            members = None
-            if row[9]:
-                try:
-                    members = json.loads(row[9])
-                except:
-                    members = None
-
-            profile = {
-                "id": row[0],
-                "user_id": row[1],
-                "profile_type": row[2],
-                "name": row[3],
-                "location": row[4],
-                "phone_number": row[5],
-                "amount_per_hour": row[6],
-                "group_name": row[7],
-                "member_count": row[8],
-                "members": members,
-                "created_at": row[10],
-                "bouncer_first_name": row[11] if row[11] else "Unknown",
-                "bouncer_last_name": row[12] if row[12] else "",
-                "bouncer_email": row[13] if row[13] else "N/A"
-            }
-            profiles.append(profile)
-
-        conn.close()
+def build_service_catalog(conn, base_url: str):
+    """Read and serialize the public catalog. Returns (catalog_version, body)."""
+    # One read transaction so the version and the rows come from the same snapshot
+    conn.execute("BEGIN")
+    version = current_version(conn, SERVICE_CATALOG)
+
+    # Get all active profiles with user information
+    # Using LEFT JOIN to include profiles even if user_id is NULL or user doesn't exist
+    rows = conn.execute("""
+        SELECT
+            sp.id, sp.user_id, sp.profile_type, sp.name, sp.location,
+            sp.phone_number, sp.amount_per_hour, sp.group_name,
+            sp.member_count, sp.members, sp.created_at,
+            u.first_name, u.last_name, u.email,
+            sp.photo_url, sp.group_photo_url
+        FROM service_profiles sp
+        LEFT JOIN users u ON sp.user_id = u.id
+        WHERE sp.is_active = 1
+        ORDER BY sp.created_at DESC
+    """).fetchall()
+
+    individual_profiles = []
+    group_profiles = []
+    for row in rows:
+        members = None
+        if row[9]:
+            try:
+                members = json.loads(row[9])
+            except:
+                members = None
+
+        profile = {
+            "id": row[0],
+            "user_id": row[1],
+            "profile_type": row[2],
+            "name": row[3],
+            "location": row[4],
+            "phone_number": row[5],
+            "amount_per_hour": row[6],
+            "group_name": row[7],
+            "member_count": row[8],
+            "members": members,
+            "created_at": row[10],
+            "bouncer_first_name": row[11] if row[11] else "Unknown",
+            "bouncer_last_name": row[12] if row[12] else "",
+            "bouncer_email": row[13] if row[13] else "N/A",
+            "photo_url": profile_photo_store.urls(row[14], base_url)["512"],
+            "group_photo_url": profile_photo_store.urls(row[15], base_url)["512"]
+        }
 
         # Separate profiles by type
-        individual_profiles = [p for p in profiles if p["profile_type"] == "individual"]
-        group_profiles = [p for p in profiles if p["profile_type"] == "group"]
+        if profile["profile_type"] == "individual":
+            individual_profiles.append(profile)
+        elif profile["profile_type"] == "group":
+            group_profiles.append(profile)
 
-        return {
-            "success": True,
-            "individual_profiles": individual_profiles,
-            "group_profiles": group_profiles,
-            "total_count": len(profiles)
-        }
+    catalog = {
+        "success": True,
+        "individual_profiles": individual_profiles,
+        "group_profiles": group_profiles,
+        "total_count": len(rows)
+    }
+    # Same encoding FastAPI's JSONResponse would produce
+    body = json.dumps(catalog, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    return version, body
+
+@app.get("/api/service-profiles")
+async def get_all_service_profiles(
+    request: Request,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: AsyncSQLite = Depends(get_db)
+):
+    """Get all active service profiles for users to browse"""
+    try:
+        # Photo URLs in the body are absolute, so the body depends on the host
+        base_url = str(request.base_url)
+        version = await db.run(current_version, SERVICE_CATALOG)
+        entry = catalog_cache.get(version, base_url)
+        if entry is None:
+            # Only one request rebuilds after an invalidation; the rest wait for it
+            async with catalog_cache.lock:
+                entry = catalog_cache.get(version, base_url)
+                if entry is None:
+                    version, body = await db.run(build_service_catalog, base_url)
+                    entry = catalog_cache.put(version, body, base_url)
+                    print(f"[CATALOG] Rebuilt service catalog v{entry.version} ({len(entry.body)} bytes)")
+
+        headers = {"ETag": entry.etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+        if etag_matches(if_none_match, entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
 
     except Exception as e:
         print(f"Error fetching service profiles: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch profiles: {str(e)}")
 
 @app.get("/api/service-profiles/my-profiles")
-async def get_my_profiles(token: str = Header(None, alias="Authorization")):
+async def get_my_profiles(request: Request, current_user: dict = Depends(get_current_user), db: AsyncSQLite = Depends(get_db)):
     """Get service profiles for the authenticated bouncer"""
     try:
-        print(f"[AUTH] Getting my profiles. Token received: {token[:50] if token else 'None'}...")
-
-        # Verify JWT token
-        if not token:
-            print("[AUTH] No token provided for my-profiles request")
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        # Remove 'Bearer ' prefix if present
-        if token.startswith("Bearer "):
-            token = token[7:]
-            print(f"[AUTH] Token after removing Bearer: {token[:50]}...")
+        user_id = current_user["sub"]
 
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-            user_email = payload.get("email")
-
-            print(f"[AUTH] My-profiles token decoded. User ID: {user_id}, Email: {user_email}")
-
-            if not user_id:
-                print("[AUTH] Token missing user ID")
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            print("[AUTH] Token expired for my-profiles")
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            print(f"[AUTH] Invalid token for my-profiles: {str(e)}")
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-        except Exception as e:
-            print(f"[AUTH] Token validation error for my-profiles: {str(e)}")
-            raise HTTPException(status_code=401, detail="Token validation failed")
-
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        cursor.execute("""
+        rows = await db.fetchall("""
             SELECT
                 id, profile_type, name, location, phone_number, amount_per_hour,
-                group_name, member_count, members, is_active, created_at
+                group_name, member_count, members, is_active, created_at,
+                photo_url, group_photo_url
             FROM service_profiles
             WHERE user_id = ?
             ORDER BY created_at DESC
         """, (user_id,))
 
         profiles = []
-        for row in cursor.fetchall():
+        for row in rows:
             import json
             members = None
             if row[8]:
@@ -1952,12 +1783,12 @@ async def get_my_profiles(token: str = Header(None, alias="Authorization")):
                 "member_count": row[7],
                 "members": members,
                 "is_active": bool(row[9]),
-                "created_at": row[10]
+                "created_at": row[10],
+                "photo_url": profile_photo_store.urls(row[11], str(request.base_url))["512"],
+                "group_photo_url": profile_photo_store.urls(row[12], str(request.base_url))["512"]
             }
             profiles.append(profile)
 
-        conn.close()
-
         return {
             "success": True,
             "profiles": profiles
@@ -1973,51 +1804,25 @@ async def get_my_profiles(token: str = Header(None, alias="Authorization")):
 async def update_service_profile(
     profile_id: str,
     profile: ServiceProfileUpdate,
-    authorization: Optional[str] = Header(None, alias="Authorization")
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSQLite = Depends(get_db)
 ):
     """Update an existing service profile"""
     try:
-        # Get and validate token
-        token = authorization
         print(f"[UPDATE] Updating profile {profile_id}")
-
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        if token.startswith("Bearer "):
-            token = token[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        # Connect to database
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
+        user_id = current_user["sub"]
 
         # Verify profile belongs to user
-        cursor.execute("""
+        existing_profile = await db.fetchone("""
             SELECT user_id, profile_type, name
             FROM service_profiles
             WHERE id = ?
         """, (profile_id,))
 
-        existing_profile = cursor.fetchone()
-
         if not existing_profile:
-            conn.close()
             raise HTTPException(status_code=404, detail="Profile not found")
 
         if existing_profile[0] != user_id:
-            conn.close()
             raise HTTPException(status_code=403, detail="Not authorized to update this profile")
 
         print(f"[UPDATE] Existing profile: type={existing_profile[1]}, name={existing_profile[2]}")
@@ -2068,7 +1873,6 @@ async def update_service_profile(
         update_fields.append("updated_at = CURRENT_TIMESTAMP")
 
         if not update_fields:
-            conn.close()
             return {"success": True, "message": "No fields to update"}
 
         # Execute update
@@ -2079,14 +1883,15 @@ async def update_service_profile(
         """
         update_values.extend([profile_id, user_id])
 
-        cursor.execute(update_query, tuple(update_values))
-        conn.commit()
+        def save_profile(conn):
+            rows = conn.execute(update_query, tuple(update_values)).rowcount
+            if rows:
+                bump_version(conn, SERVICE_CATALOG)
+            return rows
 
-        rows_affected = cursor.rowcount
+        rows_affected = await db.run(save_profile, write=True)
         print(f"[UPDATE] Updated {rows_affected} row(s)")
 
-        conn.close()
-
         return {
             "success": True,
             "message": "Profile updated successfully!",
@@ -2100,48 +1905,93 @@ async def update_service_profile(
         print(f"[ERROR] Error updating profile: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update profile: {str(e)}")
 
+async def upload_profile_photo(request: Request, profile_id: str, column: str, user_id: str, db: AsyncSQLite) -> dict:
+    """Store an uploaded photo and point column of the user's profile at it"""
+    existing_profile = await db.fetchone("SELECT user_id FROM service_profiles WHERE id = ?", (profile_id,))
+    if not existing_profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if existing_profile[0] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this profile")
+
+    reference = await store_uploaded_image(request, profile_photo_store)
+    print(f"[PHOTO] Stored {column} for profile {profile_id} as {reference}")
+
+    def save_photo(conn):
+        rows = conn.execute(f"""
+            UPDATE service_profiles
+            SET {column} = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND user_id = ?
+        """, (reference, profile_id, user_id)).rowcount
+        if rows:
+            bump_version(conn, SERVICE_CATALOG)
+        return rows
+
+    await db.run(save_photo, write=True)
+
+    urls = profile_photo_store.urls(reference, str(request.base_url))
+    return {
+        "success": True,
+        "message": "Photo uploaded successfully",
+        "profile_id": profile_id,
+        "photoUrl": urls["512"],
+        "photoThumbnailUrl": urls["128"]
+    }
+
+@app.post("/api/service-profiles/{profile_id}/photo")
+async def upload_service_profile_photo(
+    request: Request,
+    profile_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSQLite = Depends(get_db)
+):
+    """Upload the photo of a service profile as a multipart/form-data file in field "file" """
+    try:
+        return await upload_profile_photo(request, profile_id, "photo_url", current_user["sub"], db)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Upload profile photo error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to upload photo: {str(e)}")
+
+@app.post("/api/service-profiles/{profile_id}/group-photo")
+async def upload_service_profile_group_photo(
+    request: Request,
+    profile_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSQLite = Depends(get_db)
+):
+    """Upload the group photo of a service profile as a multipart/form-data file in field "file" """
+    try:
+        return await upload_profile_photo(request, profile_id, "group_photo_url", current_user["sub"], db)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Upload group photo error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to upload group photo: {str(e)}")
+
 @app.delete("/api/service-profiles/{profile_id}")
 async def delete_service_profile(
     profile_id: str,
-    authorization: Optional[str] = Header(None, alias="Authorization")
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSQLite = Depends(get_db)
 ):
     """Delete (deactivate) a service profile"""
     try:
-        # Get and validate token
-        token = authorization
         print(f"[DELETE] Deleting profile {profile_id}")
-
-        if not token:
-            raise HTTPException(status_code=401, detail="No authentication token provided")
-
-        if token.startswith("Bearer "):
-            token = token[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+        user_id = current_user["sub"]
 
         # Soft delete - just set is_active to 0
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            UPDATE service_profiles
-            SET is_active = 0, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ? AND user_id = ?
-        """, (profile_id, user_id))
-
-        rows_affected = cursor.rowcount
-        conn.commit()
-        conn.close()
+        def deactivate_profile(conn):
+            rows = conn.execute("""
+                UPDATE service_profiles
+                SET is_active = 0, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND user_id = ?
+            """, (profile_id, user_id)).rowcount
+            if rows:
+                bump_version(conn, SERVICE_CATALOG)
+            return rows
+
+        rows_affected = await db.run(deactivate_profile, write=True)
 
         if rows_affected == 0:
             raise HTTPException(status_code=404, detail="Profile not found or not authorized")
@@ -2163,32 +2013,13 @@ async def delete_service_profile(
 # ==================== USER PROFILE ENDPOINTS ====================
 
 @app.get("/api/user/profile")
-async def get_user_profile(authorization: Optional[str] = Header(None)):
+async def get_user_profile(request: Request, current_user: dict = Depends(get_current_user), db: AsyncSQLite = Depends(get_db)):
     """Get complete user profile including personal info, stats, and bookings"""
     try:
-        # Extract and verify token
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-
-        token = authorization[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
+        user_id = current_user["sub"]
 
         # Get user basic info
-        cursor.execute("""
+        user_row = await db.fetchone("""
             SELECT u.id, u.email, u.first_name, u.last_name, u.phone, u.avatar_url,
                    u.is_active, u.is_verified, u.created_at, u.last_login, r.name as role_name
             FROM users u
@@ -2196,31 +2027,25 @@ async def get_user_profile(authorization: Optional[str] = Header(None)):
             WHERE u.id = ?
         """, (user_id,))
 
-        user_row = cursor.fetchone()
-
         if not user_row:
-            conn.close()
             print(f"[ERROR] User not found in database for user_id: {user_id}")
             raise HTTPException(status_code=404, detail=f"User not found. Please ensure you're logged in with a valid account.")
 
         # Get user profile additional info (create if doesn't exist)
-        cursor.execute("""
+        profile_row = await db.fetchone("""
             SELECT bio, location_address, location_lat, location_lng,
                    emergency_contact_name, emergency_contact_phone
             FROM user_profiles
             WHERE user_id = ?
         """, (user_id,))
 
-        profile_row = cursor.fetchone()
-
         # If profile doesn't exist, create an empty one
         if not profile_row:
             try:
-                cursor.execute("""
+                await db.execute("""
                     INSERT INTO user_profiles (id, user_id, bio, location_address, emergency_contact_name, emergency_contact_phone)
                     VALUES (?, ?, '', '', '', '')
                 """, (str(uuid.uuid4()), user_id))
-                conn.commit()
                 print(f"[INFO] Created new profile for user: {user_id}")
                 profile_row = ('', '', None, None, '', '')
             except Exception as profile_error:
@@ -2228,7 +2053,7 @@ async def get_user_profile(authorization: Optional[str] = Header(None)):
                 profile_row = ('', '', None, None, '', '')
 
         # Get booking stats
-        cursor.execute("""
+        stats_row = await db.fetchone("""
             SELECT
                 COUNT(*) as total_bookings,
                 SUM(CASE WHEN status = 'accepted' THEN 1 ELSE 0 END) as accepted_bookings,
@@ -2238,9 +2063,7 @@ async def get_user_profile(authorization: Optional[str] = Header(None)):
             WHERE user_id = ?
         """, (user_id,))
 
-        stats_row = cursor.fetchone()
-
-        conn.close()
+        avatar_urls = avatar_store.urls(user_row[5], str(request.base_url))
 
         return {
             "success": True,
@@ -2250,7 +2073,8 @@ async def get_user_profile(authorization: Optional[str] = Header(None)):
                 "firstName": user_row[2],
                 "lastName": user_row[3],
                 "phone": user_row[4] or "",
-                "avatarUrl": user_row[5] or "",
+                "avatarUrl": avatar_urls["256"],
+                "avatarThumbnailUrl": avatar_urls["64"],
                 "isActive": bool(user_row[6]),
                 "isVerified": bool(user_row[7]),
                 "createdAt": user_row[8],
@@ -2282,7 +2106,7 @@ async def get_user_profile(authorization: Optional[str] = Header(None)):
 
 @app.put("/api/user/profile")
 async def update_user_profile(
-    authorization: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
     first_name: str = Form(None),
     last_name: str = Form(None),
     phone: str = Form(None),
@@ -2292,108 +2116,96 @@ async def update_user_profile(
     location_lng: Optional[float] = Form(None),
     emergency_contact_name: str = Form(None),
     emergency_contact_phone: str = Form(None),
+    db: AsyncSQLite = Depends(get_db)
 ):
     """Update user profile information"""
     try:
-        # Extract and verify token
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-
-        token = authorization[7:]
+        user_id = current_user["sub"]
 
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
-
-        # Update user basic info
-        update_fields = []
-        update_values = []
-
-        if first_name is not None:
-            update_fields.append("first_name = ?")
-            update_values.append(first_name)
-
-        if last_name is not None:
-            update_fields.append("last_name = ?")
-            update_values.append(last_name)
-
-        if phone is not None:
-            update_fields.append("phone = ?")
-            update_values.append(phone)
-
-        if update_fields:
-            update_values.append(user_id)
-            cursor.execute(f"""
-                UPDATE users
-                SET {', '.join(update_fields)}, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, update_values)
-
-        # Check if user profile exists
-        cursor.execute("SELECT id FROM user_profiles WHERE user_id = ?", (user_id,))
-        profile_exists = cursor.fetchone()
-
-        # Update or create user profile
-        if profile_exists:
-            profile_update_fields = []
-            profile_update_values = []
+        def save_profile(conn):
+            cursor = conn.cursor()
 
-            if bio is not None:
-                profile_update_fields.append("bio = ?")
-                profile_update_values.append(bio)
+            # Update user basic info
+            update_fields = []
+            update_values = []
 
-            if location_address is not None:
-                profile_update_fields.append("location_address = ?")
-                profile_update_values.append(location_address)
+            if first_name is not None:
+                update_fields.append("first_name = ?")
+                update_values.append(first_name)
 
-            if location_lat is not None:
-                profile_update_fields.append("location_lat = ?")
-                profile_update_values.append(location_lat)
+            if last_name is not None:
+                update_fields.append("last_name = ?")
+                update_values.append(last_name)
 
-            if location_lng is not None:
-                profile_update_fields.append("location_lng = ?")
-                profile_update_values.append(location_lng)
+            if phone is not None:
+                update_fields.append("phone = ?")
+                update_values.append(phone)
 
-            if emergency_contact_name is not None:
-                profile_update_fields.append("emergency_contact_name = ?")
-                profile_update_values.append(emergency_contact_name)
-
-            if emergency_contact_phone is not None:
-                profile_update_fields.append("emergency_contact_phone = ?")
-                profile_update_values.append(emergency_contact_phone)
-
-            if profile_update_fields:
-                profile_update_values.append(user_id)
+            if update_fields:
+                update_values.append(user_id)
                 cursor.execute(f"""
-                    UPDATE user_profiles
-                    SET {', '.join(profile_update_fields)}, updated_at = CURRENT_TIMESTAMP
-                    WHERE user_id = ?
-                """, profile_update_values)
-        else:
-            # Create new profile
-            profile_id = str(uuid.uuid4())
-            cursor.execute("""
-                INSERT INTO user_profiles
-                (id, user_id, bio, location_address, location_lat, location_lng,
-                 emergency_contact_name, emergency_contact_phone)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (profile_id, user_id, bio or "", location_address or "",
-                  location_lat, location_lng, emergency_contact_name or "",
-                  emergency_contact_phone or ""))
+                    UPDATE users
+                    SET {', '.join(update_fields)}, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, update_values)
+
+                # The public catalog shows bouncer names
+                if first_name is not None or last_name is not None:
+                    bump_version(conn, SERVICE_CATALOG)
+
+            # Check if user profile exists
+            cursor.execute("SELECT id FROM user_profiles WHERE user_id = ?", (user_id,))
+            profile_exists = cursor.fetchone()
+
+            # Update or create user profile
+            if profile_exists:
+                profile_update_fields = []
+                profile_update_values = []
+
+                if bio is not None:
+                    profile_update_fields.append("bio = ?")
+                    profile_update_values.append(bio)
+
+                if location_address is not None:
+                    profile_update_fields.append("location_address = ?")
+                    profile_update_values.append(location_address)
+
+                if location_lat is not None:
+                    profile_update_fields.append("location_lat = ?")
+                    profile_update_values.append(location_lat)
+
+                if location_lng is not None:
+                    profile_update_fields.append("location_lng = ?")
+                    profile_update_values.append(location_lng)
+
+                if emergency_contact_name is not None:
+                    profile_update_fields.append("emergency_contact_name = ?")
+                    profile_update_values.append(emergency_contact_name)
+
+                if emergency_contact_phone is not None:
+                    profile_update_fields.append("emergency_contact_phone = ?")
+                    profile_update_values.append(emergency_contact_phone)
+
+                if profile_update_fields:
+                    profile_update_values.append(user_id)
+                    cursor.execute(f"""
+                        UPDATE user_profiles
+                        SET {', '.join(profile_update_fields)}, updated_at = CURRENT_TIMESTAMP
+                        WHERE user_id = ?
+                    """, profile_update_values)
+            else:
+                # Create new profile
+                profile_id = str(uuid.uuid4())
+                cursor.execute("""
+                    INSERT INTO user_profiles
+                    (id, user_id, bio, location_address, location_lat, location_lng,
+                     emergency_contact_name, emergency_contact_phone)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (profile_id, user_id, bio or "", location_address or "",
+                      location_lat, location_lng, emergency_contact_name or "",
+                      emergency_contact_phone or ""))
 
-        conn.commit()
-        conn.close()
+        await db.run(save_profile, write=True)
 
         return {
             "success": True,
@@ -2409,33 +2221,17 @@ async def update_user_profile(
 
 @app.get("/api/user/bookings")
 async def get_user_bookings(
-    authorization: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
     status: Optional[str] = None,
-    limit: int = 50,
-    offset: int = 0
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSQLite = Depends(get_db)
 ):
     """Get user's booking history with optional filters"""
     try:
-        # Extract and verify token
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-
-        token = authorization[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
+        user_id = current_user["sub"]
+        page_size = requested_page_size(limit, cursor)
+        keyset, keyset_params = keyset_condition(cursor, "b.created_at", "b.id")
 
         # Build query with optional status filter
         # Note: Database schema uses start_datetime, end_datetime, total_amount (not event_date, event_time, budget)
@@ -2457,13 +2253,12 @@ async def get_user_bookings(
             query += " AND b.status = ?"
             params.append(status)
 
-        query += " ORDER BY b.created_at DESC LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
-
-        cursor.execute(query, params)
-        bookings = cursor.fetchall()
+        # Keyset pagination: resume after the cursor instead of skipping OFFSET rows
+        query += f" {keyset} ORDER BY b.created_at DESC, b.id DESC LIMIT ?"
+        params.extend([*keyset_params, fetch_limit(page_size)])
 
-        conn.close()
+        bookings = await db.fetchall(query, params)
+        bookings, next_cursor = keyset_page(bookings, page_size, sort_index=7)
 
         return {
             "success": True,
@@ -2481,7 +2276,8 @@ async def get_user_bookings(
                 }
                 for booking in bookings
             ],
-            "total": len(bookings)
+            "total": len(bookings),
+            "next_cursor": next_cursor
         }
 
     except HTTPException:
@@ -2493,10 +2289,11 @@ async def get_user_bookings(
 
 @app.post("/api/user/change-password")
 async def change_password(
-    authorization: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
     current_password: str = Form(...),
     new_password: str = Form(...),
-    confirm_password: str = Form(...)
+    confirm_password: str = Form(...),
+    db: AsyncSQLite = Depends(get_db)
 ):
     """Change user password"""
     try:
@@ -2515,51 +2312,26 @@ async def change_password(
         if not any(c.isdigit() for c in new_password):
             raise HTTPException(status_code=400, detail="Password must contain at least one number")
 
-        # Extract and verify token
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-
-        token = authorization[7:]
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
-
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
+        user_id = current_user["sub"]
 
         # Get current password hash
-        cursor.execute("SELECT password_hash FROM users WHERE id = ?", (user_id,))
-        result = cursor.fetchone()
+        result = await db.fetchone("SELECT password_hash FROM users WHERE id = ?", (user_id,))
 
         if not result:
-            conn.close()
             raise HTTPException(status_code=404, detail="User not found")
 
         # Verify current password
-        if not pwd_context.verify(current_password, result[0]):
-            conn.close()
+        if not await password_hasher.verify(current_password, result[0]):
             raise HTTPException(status_code=400, detail="Current password is incorrect")
 
         # Update to new password
-        new_password_hash = pwd_context.hash(new_password)
-        cursor.execute("""
+        new_password_hash = await password_hasher.hash(new_password)
+        await db.execute("""
             UPDATE users
             SET password_hash = ?, updated_at = CURRENT_TIMESTAMP
             WHERE id = ?
         """, (new_password_hash, user_id))
 
-        conn.commit()
-        conn.close()
-
         return {
             "success": True,
             "message": "Password changed successfully"
@@ -2574,47 +2346,70 @@ async def change_password(
 
 @app.post("/api/user/upload-avatar")
 async def upload_avatar(
-    authorization: Optional[str] = Header(None),
-    avatar_data: str = Form(...)
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    avatar_data: str = Form(...),
+    db: AsyncSQLite = Depends(get_db)
 ):
     """Upload user avatar (base64 encoded image)"""
     try:
-        # Extract and verify token
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
+        user_id = current_user["sub"]
 
-        token = authorization[7:]
+        # Decode, hash and thumbnail off the event loop; only the short
+        # reference (avatars/<sha256>) goes into the users row
+        def decode_and_save():
+            image_data = avatar_store.decode_data_url(avatar_data)
+            return len(image_data), avatar_store.save(image_data)
 
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            user_id = payload.get("sub")
+        size, reference = await asyncio.to_thread(decode_and_save)
+        print(f"[AVATAR] Stored {size} byte upload as {reference}")
 
-            if not user_id or not user_id.strip():
-                raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
+        await db.execute("""
+            UPDATE users
+            SET avatar_url = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (reference, user_id))
 
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired. Please log in again.")
-        except jwt.InvalidTokenError as e:
-            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+        urls = avatar_store.urls(reference, str(request.base_url))
+        return {
+            "success": True,
+            "message": "Avatar uploaded successfully",
+            "avatarUrl": urls["256"],
+            "avatarThumbnailUrl": urls["64"]
+        }
 
-        # For now, we'll just store the base64 data URL
-        # In production, you'd want to upload to cloud storage (S3, Cloudinary, etc.)
-        conn = sqlite3.connect("test_bouncer.db")
-        cursor = conn.cursor()
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Upload avatar error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to upload avatar: {str(e)}")
 
-        cursor.execute("""
+@app.post("/api/user/avatar")
+async def upload_avatar_file(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSQLite = Depends(get_db)
+):
+    """Upload user avatar as a multipart/form-data file in field "file" """
+    try:
+        user_id = current_user["sub"]
+
+        # Streamed to a spooled temp file, so large photos never sit in memory whole
+        reference = await store_uploaded_image(request, avatar_store)
+        print(f"[AVATAR] Stored streamed upload as {reference}")
+
+        await db.execute("""
             UPDATE users
             SET avatar_url = ?, updated_at = CURRENT_TIMESTAMP
             WHERE id = ?
-        """, (avatar_data, user_id))
-
-        conn.commit()
-        conn.close()
+        """, (reference, user_id))
 
+        urls = avatar_store.urls(reference, str(request.base_url))
         return {
             "success": True,
             "message": "Avatar uploaded successfully",
-            "avatarUrl": avatar_data
+            "avatarUrl": urls["256"],
+            "avatarThumbnailUrl": urls["64"]
         }
 
     except HTTPException:
@@ -2623,7 +2418,6 @@ async def upload_avatar(
         print(f"[ERROR] Upload avatar error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to upload avatar: {str(e)}")
 
-
 if __name__ == "__main__":
     import uvicorn
     print("Starting simple login server...")
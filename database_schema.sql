@@ -94,7 +94,7 @@ CREATE TABLE bouncer_availability (
 );
 
 -- Booking statuses
-CREATE TYPE booking_status AS ENUM ('pending', 'confirmed', 'in_progress', 'completed', 'cancelled', 'rejected');
+CREATE TYPE booking_status AS ENUM ('pending', 'confirmed', 'in_progress', 'completed', 'cancelled', 'rejected', 'accepted', 'see_later');
 
 -- Bookings table
 CREATE TABLE bookings (
@@ -243,6 +243,10 @@ CREATE INDEX idx_bookings_user_id ON bookings(user_id);
 CREATE INDEX idx_bookings_bouncer_id ON bookings(bouncer_id);
 CREATE INDEX idx_bookings_status ON bookings(status);
 CREATE INDEX idx_bookings_start_datetime ON bookings(start_datetime);
+-- Keyset pagination for the booking lists: filter column, then (sort column, id)
+CREATE INDEX idx_bookings_status_created ON bookings(status, created_at, id);
+CREATE INDEX idx_bookings_status_updated ON bookings(status, updated_at, id);
+CREATE INDEX idx_bookings_user_created ON bookings(user_id, created_at, id);
 CREATE INDEX idx_bouncer_profiles_user_id ON bouncer_profiles(user_id);
 CREATE INDEX idx_bouncer_profiles_is_available ON bouncer_profiles(is_available);
 CREATE INDEX idx_notifications_user_id ON notifications(user_id);